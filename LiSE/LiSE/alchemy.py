@@ -27,8 +27,9 @@ from collections import OrderedDict
 from functools import partial
 from json import dumps
 
-from sqlalchemy import (Table, Column, ForeignKeyConstraint, select, bindparam,
-						func, and_, or_, INT, TEXT, BOOLEAN, FLOAT, BINARY)
+from sqlalchemy import (Table, Column, ForeignKeyConstraint, Index, select,
+						bindparam, func, and_, or_, INT, TEXT, BOOLEAN, FLOAT,
+						BINARY)
 from sqlalchemy import MetaData
 from sqlalchemy.sql.ddl import CreateTable, CreateIndex
 
@@ -331,7 +332,12 @@ def tables_for_meta(meta):
 
 
 def indices_for_table_dict(table):
-	return {}
+	r = alchemy.indices_for_table_dict(table)
+	things = table['things']
+	r['things'] = Index('things_window_idx', things.c.character,
+						things.c.branch, things.c.turn, things.c.tick,
+						things.c.location)
+	return r
 
 
 def queries(table):
@@ -399,21 +405,18 @@ def queries(table):
 	things_to_end_clause = and_(
 		things.c.character == bindparam('character'),
 		things.c.branch == bindparam('branch'),
-		or_(
-			things.c.turn > bindparam('turn_from_a'),
-			and_(things.c.turn == bindparam('turn_from_b'),
-					things.c.tick >= bindparam('tick_from'))))
+		things.c.turn >= bindparam('turn_from_a'),
+		or_(things.c.turn > bindparam('turn_from_b'),
+			things.c.tick >= bindparam('tick_from')))
 	r['load_things_tick_to_end'] = select(
 		things.c.thing, things.c.turn, things.c.tick,
 		things.c.location).where(things_to_end_clause)
 	r['load_things_tick_to_tick'] = select(
 		things.c.thing, things.c.turn, things.c.tick, things.c.location).where(
 			and_(
-				things_to_end_clause,
-				or_(
-					things.c.turn < bindparam('turn_to_a'),
-					and_(things.c.turn == bindparam('turn_to_b'),
-							things.c.tick <= bindparam('tick_to')))))
+				things_to_end_clause, things.c.turn <= bindparam('turn_to_a'),
+				or_(things.c.turn < bindparam('turn_to_b'),
+					things.c.tick <= bindparam('tick_to'))))
 
 	for handledtab in ('character_rules_handled', 'unit_rules_handled',
 						'character_thing_rules_handled',
@@ -424,6 +427,9 @@ def queries(table):
 		r['del_{}_turn'.format(handledtab)] = ht.delete().where(
 			and_(ht.c.branch == bindparam('branch'),
 					ht.c.turn == bindparam('turn')))
+		r['del_{}_before'.format(handledtab)] = ht.delete().where(
+			and_(ht.c.branch == bindparam('branch'),
+					ht.c.turn < bindparam('turn')))
 
 	branches = table['branches']
 
@@ -447,7 +453,7 @@ def gather_sql(meta):
 		r['create_' + t.name] = CreateTable(t)
 		r['truncate_' + t.name] = t.delete()
 	for (tab, idx) in index.items():
-		r['index_' + tab] = CreateIndex(idx)
+		r['index_' + tab] = CreateIndex(idx, if_not_exists=True)
 	r.update(query)
 
 	return r
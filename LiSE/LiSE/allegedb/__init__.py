@@ -14,18 +14,20 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """The main interface to the allegedb ORM"""
 
+from concurrent.futures import Future
 from contextlib import ContextDecorator, contextmanager
+from bisect import bisect_left, bisect_right
 from functools import wraps
 import gc
 from queue import Queue
-from threading import RLock, Thread
+from threading import RLock, Thread, local
 from typing import (Callable, Dict, Any, Union, Tuple, Optional, List,
-					Iterator, FrozenSet)
+					Iterator, Iterable, FrozenSet, Set)
 
 from blinker import Signal
 import networkx as nx
 
-from .window import update_window, update_backward_window
+from .window import update_window, update_backward_window, KeyframeIndex
 from .cache import HistoricKeyError
 from .graph import (DiGraph, Node, Edge, GraphsMapping)
 from .query import (QueryEngine, TimeError, NodeRowType, EdgeRowType,
@@ -419,6 +421,77 @@ class ORM:
 		yield
 		self._forward = False
 
+	@contextmanager
+	def coalescing(self):
+		"""A context manager for when you set the same keys over and over.
+
+		Setting a graph, node, or edge's key a second time in the block
+		replaces the value the first set stored, rather than storing a new
+		one at a new tick. Only the final value gets journaled, sent to
+		the database, or reported in deltas.
+
+		"""
+		if self._coalescing is not None:
+			yield
+			return
+		self._coalescing = {}
+		try:
+			yield
+		finally:
+			self._coalescing = None
+
+	@contextmanager
+	def _recording_reads(self):
+		"""Collect what gets read from the caches in this thread
+
+		Yields a set of pairs of a cache and what was read from it,
+		which is the entity and key for a value, or ``'keys'`` and the
+		entity for the keys it has. Only records while
+		``_tracking_reads`` is on.
+
+		"""
+		tracker = self._read_tracker
+		tracker.reads = reads = set()
+		try:
+			yield reads
+		finally:
+			tracker.reads = None
+
+	def _note_read(self, cache, *what):
+		reads = getattr(self._read_tracker, 'reads', None)
+		if reads is not None:
+			reads.add((cache, ) + what)
+
+	def _changes_since(self, branch: str, turn: int,
+						tick: int) -> Optional[Set[tuple]]:
+		"""Return what's changed in the branch since the given time
+
+		In the same shape as what :meth:`_recording_reads` collects,
+		so that you can tell if some reads might come out different now.
+		Return ``None`` if the time is not in the past of the present
+		branch.
+
+		"""
+		branch_now, turn_now, tick_now = self._btt()
+		if branch != branch_now or (turn, tick) > (turn_now, tick_now):
+			return None
+		where_cached = self._where_cached
+		turn_end = self._turn_end
+		changed = set()
+		for r in range(turn, turn_now + 1):
+			start = tick + 1 if r == turn else 0
+			end = tick_now if r == turn_now else turn_end[branch, r]
+			for t in range(start, end + 1):
+				for cache in where_cached.get((branch, r, t), ()):
+					try:
+						setting = cache.settings[branch][r][t]
+					except KeyError:
+						continue
+					changed.add((cache, setting[:-1]))
+					for i in range(len(setting) - 1):
+						changed.add((cache, 'keys', setting[:i]))
+		return changed
+
 	@contextmanager
 	def batch(self):
 		"""A context manager for when you're creating lots of state.
@@ -815,7 +888,9 @@ class ORM:
 					connect_args: dict = None,
 					main_branch=None,
 					cache_arranger=False,
-					enforce_end_of_time=False):
+					enforce_end_of_time=False,
+					lazy=False,
+					preload: Iterable[Key] = ()):
 		"""Make a SQLAlchemy engine and begin a transaction
 
 		:arg dbstring: rfc1738 URL for a database connection.
@@ -823,12 +898,20 @@ class ORM:
 		:arg connect_args: Dictionary of
 		keyword arguments to be used for the database connection.
 
+		:arg lazy: If ``True``, don't load a graph's history until
+		it's first looked up in ``self.graph``.
+
+		:arg preload: Graphs to load at startup anyway, when ``lazy``.
+
 		"""
 		self.world_lock = RLock()
 		connect_args = connect_args or {}
 		self._planning = False
 		self._forward = False
 		self._no_kc = False
+		self._coalescing: Optional[dict] = None
+		self._tracking_reads = False
+		self._read_tracker = local()
 		self._enforce_end_of_time = enforce_end_of_time
 		# in case this is the first startup
 		self._obranch = main_branch or 'trunk'
@@ -867,11 +950,21 @@ class ORM:
 			self._branches[branch] = (parent, parent_turn, parent_tick,
 										end_turn, end_tick)
 			self._upd_branch_parentage(parent, branch)
+		# The latest time in each branch that anything, plans included,
+		# had been stored at when I started up
+		self._stored_ends = {
+			branch: (end_turn, end_tick)
+			for (branch, (_, _, _, end_turn,
+							end_tick)) in self._branches.items()
+		}
 		for (branch, turn, end_tick, plan_end_tick) in self.query.turns_dump():
 			self._turn_end[branch, turn] = end_tick
 			self._turn_end_plan[branch, turn] = plan_end_tick
 			self._branch_end_plan[branch] = max(
 				(self._branch_end_plan[branch], turn))
+			self._stored_ends[branch] = max(
+				(self._stored_ends.get(branch, (0, 0)), (turn, end_tick),
+					(turn, plan_end_tick)))
 		if main_branch not in self._branches:
 			self._branches[main_branch] = None, 0, 0, 0, 0
 		self._new_keyframes = []
@@ -904,10 +997,11 @@ class ORM:
 		self._load_graphs()
 		assert hasattr(self, 'graph')
 		self._keyframes_list = []
-		self._keyframes_dict = {}
-		self._keyframes_times = set()
+		self._keyframes_times = KeyframeIndex()
 		self._loaded: Dict[str, Tuple[int, int, int, int]] = {
 		}  # branch: (turn_from, tick_from, turn_to, tick_to)
+		self._graphs_loaded: Optional[Set[Key]] = set(
+			preload) if lazy else None
 		self._init_load()
 		self.cache_arrange_queue = Queue()
 		self._cache_arrange_thread = Thread(target=self._arrange_cache_loop,
@@ -964,18 +1058,9 @@ class ORM:
 
 	def _init_load(self) -> None:
 		keyframes_list = self._keyframes_list
-		keyframes_dict = self._keyframes_dict
 		keyframes_times = self._keyframes_times
 		for graph, branch, turn, tick in self.query.keyframes_list():
 			keyframes_list.append((graph, branch, turn, tick))
-			if branch not in keyframes_dict:
-				keyframes_dict[branch] = {turn: {tick}}
-			else:
-				keyframes_dict_branch = keyframes_dict[branch]
-				if turn not in keyframes_dict_branch:
-					keyframes_dict_branch[turn] = {tick}
-				else:
-					keyframes_dict_branch[turn].add(tick)
 			keyframes_times.add((branch, turn, tick))
 		self.load_at(*self._btt())
 
@@ -1004,7 +1089,6 @@ class ORM:
 	def _snap_keyframe_de_novo(self, branch: str, turn: int,
 								tick: int) -> None:
 		kfl = self._keyframes_list
-		kfd = self._keyframes_dict
 		kfs = self._keyframes_times
 		nkfs = self._new_keyframes
 		was = self._btt()
@@ -1018,18 +1102,6 @@ class ORM:
 			nkfs.append((graphn, branch, turn, tick, nodes, edges, val))
 			kfl.append((graphn, branch, turn, tick))
 			kfs.add((branch, turn, tick))
-			if branch not in kfd:
-				kfd[branch] = {
-					turn: {
-						tick,
-					}
-				}
-			elif turn not in kfd[branch]:
-				kfd[branch][turn] = {
-					tick,
-				}
-			else:
-				kfd[branch][turn].add(tick)
 		self._set_btt(*was)
 
 	def _snap_keyframe_de_novo_graph(self, graph: Key, branch: str, turn: int,
@@ -1107,22 +1179,9 @@ class ORM:
 		assert then[0] == now[0]
 		whens = [now]
 		kfl = self._keyframes_list
-		kfd = self._keyframes_dict
 		kfs = self._keyframes_times
 		kfs.add(now)
 		branch, turn, tick = now
-		if branch not in kfd:
-			kfd[branch] = {
-				turn: {
-					tick,
-				}
-			}
-		elif turn not in kfd[branch]:
-			kfd[branch][turn] = {
-				tick,
-			}
-		else:
-			kfd[branch][turn].add(tick)
 		nkfs = self._new_keyframes
 		nodes_keyframe = {}
 		node_val_keyframe = {}
@@ -1169,7 +1228,7 @@ class ORM:
 					edge_val_keyframe[graph][orig] = {dest: val}
 			else:
 				edge_val_keyframe[graph] = {orig: {dest: val}}
-		for graph in self.graph.keys():
+		for graph in self._graphs_to_load():
 			try:
 				nodes_keyframe[graph] = self._nodes_cache.keyframe[
 					graph,
@@ -1313,32 +1372,29 @@ class ORM:
 				kfl.append((graph, *when))
 
 	def _recurse_delta_keyframes(self, time_from):
-		"""Make keyframes until we have one in the current branch"""
-		kfd = self._keyframes_dict
-		if time_from[0] in kfd:
-			# could probably avoid these sorts by restructuring kfd
-			for turn in sorted(kfd[time_from[0]].keys(), reverse=True):
-				if turn <= time_from[1]:
-					for tick in sorted(kfd[time_from[0]][turn], reverse=True):
-						if time_from[2] <= tick:
-							return time_from[0], turn, tick
-		parent, turn_from, tick_from, turn_to, tick_to = self._branches[
-			time_from[0]]
+		"""Make keyframes until we have one in the current branch
+
+		Return the time of the latest keyframe at or before ``time_from``
+		in its branch. If there wasn't one, that's a new one aliased from
+		the parent branch, at the time the branch started.
+
+		"""
+		branch, turn, tick = time_from
+		kf = self._keyframes_times.latest(branch, turn, tick)
+		if kf is not None:
+			return (branch, *kf)
+		parent, turn_from, tick_from, _, _ = self._branches[branch]
 		if parent is None:
 			self._snap_keyframe_de_novo(*time_from)
 			return time_from
-		else:
-			(parent, turn_from, tick_from) = self._recurse_delta_keyframes(
-				(parent, turn_from, tick_from))
-			if (parent, time_from[1],
-				time_from[2]) not in self._keyframes_times:
-				self._snap_keyframe_from_delta(
-					(parent, turn_from, tick_from),
-					(parent, time_from[1], time_from[2]),
-					self.get_delta(parent, turn_from, tick_from, time_from[1],
-									time_from[2]))
-			self._alias_kf(parent, time_from[0], turn_from, tick_from)
-		return time_from[0], turn_from, tick_from
+		parent_kf = self._recurse_delta_keyframes(
+			(parent, turn_from, tick_from))
+		if parent_kf != (parent, turn_from, tick_from):
+			self._snap_keyframe_from_delta(
+				parent_kf, (parent, turn_from, tick_from),
+				self.get_delta(*parent_kf, turn_from, tick_from))
+		self._alias_kf(parent, branch, turn_from, tick_from)
+		return branch, turn_from, tick_from
 
 	@world_locked
 	def snap_keyframe(self) -> None:
@@ -1348,36 +1404,71 @@ class ORM:
 		performant.
 
 		The keyframe will be saved to the database at the next call to
-		``flush``.
+		``flush``. It gets compressed in the meantime, in a background
+		thread.
 
 		"""
 		branch, turn, tick = self._btt()
 		if (branch, turn, tick) in self._keyframes_times:
 			return
-		kfd = self._keyframes_dict
-		the_kf: Optional[Tuple[str, int, int]] = None
-		if branch in kfd:
-			# I could probably avoid sorting these by using windowdicts
-			for trn in sorted(kfd[branch].keys(), reverse=True):
-				if trn < turn:
-					the_kf = (branch, trn, max(kfd[branch][trn]))
-					break
-				elif trn == turn:
-					for tck in sorted(kfd[branch][trn], reverse=True):
-						if tck <= tick:
-							the_kf = (branch, trn, tck)
-							break
-				if the_kf is not None:
-					break
-		if the_kf is None:
+		the_kf: Optional[Tuple[str, int, int]]
+		latest = self._keyframes_times.latest(branch, turn, tick)
+		carried = self._graphs_to_carry(branch, latest)
+		if carried is None:
+			# Keyframes cover every graph, so they'd better all be in memory
+			self._load_all_graphs()
+		if latest is not None:
+			the_kf = (branch, *latest)
+			if carried:
+				self._carry_keyframes(carried, the_kf, (branch, turn, tick))
+		else:
 			parent, _, _, turn_to, tick_to = self._branches[branch]
 			if parent is None:
-				return self._snap_keyframe_de_novo(branch, turn, tick)
+				self._snap_keyframe_de_novo(branch, turn, tick)
+				self._hand_off_keyframes()
+				return
 			the_kf = self._recurse_delta_keyframes((branch, turn, tick))
 		self._snap_keyframe_from_delta(the_kf, (branch, turn, tick),
 										self.get_delta(*the_kf, turn, tick))
 		if the_kf[0] != branch:
 			self._alias_kf(the_kf[0], branch, turn, tick)
+		self._hand_off_keyframes()
+
+	def _graphs_to_carry(
+			self, branch: str,
+			latest: Optional[Tuple[int, int]]) -> Optional[List[Key]]:
+		"""Return the graphs I haven't loaded, if their keyframes at
+		``latest`` in ``branch`` are still good, else ``None``
+
+		They are if nothing had been stored in the branch after
+		``latest`` when I started up, because I load a graph before
+		changing it.
+
+		"""
+		graphs_loaded = self._graphs_loaded
+		if graphs_loaded is None:
+			return []
+		unloaded = [graph for graph in self.graph if graph not in graphs_loaded]
+		if not unloaded:
+			return []
+		if latest is None or latest < self._stored_ends.get(branch, (0, 0)):
+			return
+		return unloaded
+
+	def _carry_keyframes(self, graphs: List[Key], then: Tuple[str, int, int],
+							now: Tuple[str, int, int]) -> None:
+		"""Copy the keyframes of graphs I haven't loaded from ``then`` to
+		``now`` in the database, without loading them"""
+		self.query.keyframes_copy_many(
+			[(graph, *then, *now) for graph in graphs])
+		kfl = self._keyframes_list
+		for graph in graphs:
+			kfl.append((graph, *now))
+
+	def _hand_off_keyframes(self) -> None:
+		if self._new_keyframes:
+			self.query.keyframes_insert_many(self._new_keyframes)
+			self._new_keyframes = []
 
 	def _build_loading_windows(
 			self, branch_from: str, turn_from: int, tick_from: int,
@@ -1420,68 +1511,31 @@ class ORM:
 	def _build_keyframe_window_new(
 		self, branch: str, turn: int, tick: int
 	) -> Tuple[Optional[Tuple[str, int, int]], Optional[Tuple[str, int, int]]]:
-		branch_now = branch
-		turn_now = turn
-		tick_now = tick
-		latest_past_keyframe: Optional[Tuple[str, int, int]] = None
+		"""Find the keyframes nearest to the given time
+
+		Return a pair of the latest keyframe at or before the time, and
+		the earliest one after it, in the given branch. If there's no
+		keyframe in the past of the given branch, use the latest keyframe
+		in the nearest ancestor branch that has any.
+
+		"""
+		kfs = self._keyframes_times
+		branches = self._branches
 		earliest_future_keyframe: Optional[Tuple[str, int, int]] = None
-		branch_parents = self._branch_parents
-		for (branch, turn, tick) in self._keyframes_times:
-			# Figure out the latest keyframe that is earlier than the present
-			# moment, and the earliest keyframe that is later than the
-			# present moment, for each graph. Can I avoid iterating over the
-			# entire keyframes table, somehow?
-			if branch == branch_now:
-				if turn < turn_now:
-					if latest_past_keyframe:
-						(late_branch, late_turn,
-							late_tick) = latest_past_keyframe
-						if late_branch != branch or late_turn < turn or (
-							late_turn == turn and late_tick < tick):
-							latest_past_keyframe = (branch, turn, tick)
-					else:
-						latest_past_keyframe = (branch, turn, tick)
-				elif turn > turn_now:
-					if earliest_future_keyframe:
-						(early_branch, early_turn,
-							early_tick) = earliest_future_keyframe
-						if early_branch != branch or early_turn > turn or (
-							early_turn == turn and early_tick > tick):
-							earliest_future_keyframe = (branch, turn, tick)
-					else:
-						earliest_future_keyframe = (branch, turn, tick)
-				elif tick < tick_now:
-					if latest_past_keyframe:
-						(late_branch, late_turn,
-							late_tick) = latest_past_keyframe
-						if late_branch != branch or late_turn < turn or (
-							late_turn == turn and late_tick < tick):
-							latest_past_keyframe = (branch, turn, tick)
-					else:
-						latest_past_keyframe = (branch, turn, tick)
-				elif tick > tick_now:
-					if earliest_future_keyframe:
-						(early_branch, early_turn,
-							early_tick) = earliest_future_keyframe
-						if early_branch != branch or early_turn > turn or (
-							early_turn == turn and early_tick > tick):
-							earliest_future_keyframe = (branch, turn, tick)
-					else:
-						earliest_future_keyframe = (branch, turn, tick)
-				else:
-					latest_past_keyframe = (branch, turn, tick)
-			elif branch in branch_parents[branch_now]:
-				if latest_past_keyframe:
-					(late_branch, late_turn, late_tick) = latest_past_keyframe
-					if branch == late_branch:
-						if turn > late_turn or (turn == late_turn
-												and tick > late_tick):
-							latest_past_keyframe = (branch, turn, tick)
-					elif late_branch in branch_parents[branch]:
-						latest_past_keyframe = (branch, turn, tick)
-				else:
-					latest_past_keyframe = (branch, turn, tick)
-		return latest_past_keyframe, earliest_future_keyframe
+		after = kfs.earliest_after(branch, turn, tick)
+		if after is not None:
+			earliest_future_keyframe = (branch, *after)
+		before = kfs.latest(branch, turn, tick)
+		if before is not None:
+			return (branch, *before), earliest_future_keyframe
+		while branch in branches:
+			branch = branches[branch][0]
+			if branch is None:
+				break
+			times = kfs.times(branch)
+			if times:
+				return (branch, *times[-1]), earliest_future_keyframe
+		return None, earliest_future_keyframe
 
 	@world_locked
 	def load_at(
@@ -1532,7 +1586,8 @@ class ORM:
 		updload = self._updload
 		updload(branch_now, turn_now, tick_now)
 
-		if latest_past_keyframe is None:  # happens in very short games
+		if latest_past_keyframe is None and self._graphs_loaded is None:
+			# happens in very short games
 
 			for (graph, node, branch, turn, tick,
 					ex) in self.query.nodes_dump():
@@ -1565,7 +1620,6 @@ class ORM:
 				self._edge_val_cache.load(edgevalrows)
 			return (None, None, {}, noderows, edgerows, graphvalrows,
 					nodevalrows, edgevalrows)
-		past_branch, past_turn, past_tick = latest_past_keyframe
 		keyframed = {}
 
 		def load_windows(graph, windows):
@@ -1597,8 +1651,23 @@ class ORM:
 										turn, tick, value))
 					updload(branch, turn, tick)
 
+		if latest_past_keyframe is None:
+			# Lazy loading can't use the whole-table dumps. Load everything
+			# in each branch instead, but only for the graphs wanted so far.
+			windows = [(branch, 0, 0, None, None) for branch in self._branches]
+			for graph in self._graphs_to_load():
+				load_windows(graph, windows)
+			with self.batch():
+				self._nodes_cache.load(noderows)
+				self._edges_cache.load(edgerows)
+				self._graph_val_cache.load(graphvalrows)
+				self._node_val_cache.load(nodevalrows)
+				self._edge_val_cache.load(edgevalrows)
+			return (None, None, {}, noderows, edgerows, graphvalrows,
+					nodevalrows, edgevalrows)
+		past_branch, past_turn, past_tick = latest_past_keyframe
 		snap_keyframe = self._snap_keyframe_de_novo_graph
-		for graph in self.graph:
+		for graph in self._graphs_to_load():
 			stuff = keyframed[graph] = get_keyframe(graph, past_branch,
 													past_turn, past_tick)
 			updload(past_branch, past_turn, past_tick)
@@ -1656,14 +1725,107 @@ class ORM:
 		return (latest_past_keyframe, earliest_future_keyframe, keyframed,
 				noderows, edgerows, graphvalrows, nodevalrows, edgevalrows)
 
+	def _graphs_to_load(self) -> Iterator[Key]:
+		"""Iterate over the graphs whose history I keep in memory
+
+		That's all of them, unless I'm loading lazily.
+
+		"""
+		graphs_loaded = self._graphs_loaded
+		if graphs_loaded is None:
+			yield from self.graph
+			return
+		for graph in self.graph:
+			if graph in graphs_loaded:
+				yield graph
+
+	@world_locked
+	def _load_graph(self, graph: Key) -> None:
+		"""Load the history of a graph I've been lazy about
+
+		It gets the same keyframes and windows of time that every other
+		graph has loaded already.
+
+		"""
+		graphs_loaded = self._graphs_loaded
+		if graphs_loaded is None or graph in graphs_loaded:
+			return
+		graphs_loaded.add(graph)
+		kfs = self._keyframes_times
+		if not kfs:
+			self._load_graph_windows(
+				graph,
+				[(branch, 0, 0, None, None) for branch in self._branches])
+			return
+		get_keyframe = self.query.get_keyframe
+		snap_keyframe = self._snap_keyframe_de_novo_graph
+		windows = []
+		for branch, (turn_from, tick_from, turn_to,
+						tick_to) in self._loaded.items():
+			for turn, tick in kfs.times(branch):
+				if (turn_from, tick_from) <= (turn, tick) <= (turn_to,
+																tick_to):
+					stuff = get_keyframe(graph, branch, turn, tick)
+					if stuff is not None:
+						snap_keyframe(graph, branch, turn, tick, *stuff)
+			windows.append((branch, turn_from, tick_from, turn_to, tick_to))
+		self._load_graph_windows(graph, windows)
+
+	def _load_graph_windows(
+			self, graph: Key, windows: List[Tuple[str, int, int, Optional[int],
+													Optional[int]]]) -> None:
+		"""Load one graph's history in the given windows of time
+
+		A window ending in ``None`` goes to the end of its branch.
+
+		"""
+		q = self.query
+		updload = self._updload
+		noderows = []
+		edgerows = []
+		graphvalrows = []
+		nodevalrows = []
+		edgevalrows = []
+		for window in windows:
+			for (_, node, branch, turn, tick,
+					ex) in q.load_nodes(graph, *window):
+				noderows.append((graph, node, branch, turn, tick, ex or None))
+				updload(branch, turn, tick)
+			for (_, orig, dest, idx, branch, turn, tick,
+					ex) in q.load_edges(graph, *window):
+				edgerows.append(
+					(graph, orig, dest, idx, branch, turn, tick, ex or None))
+				updload(branch, turn, tick)
+			for row in q.load_graph_val(graph, *window):
+				graphvalrows.append(row)
+				updload(*row[2:5])
+			for row in q.load_node_val(graph, *window):
+				nodevalrows.append(row)
+				updload(*row[3:6])
+			for row in q.load_edge_val(graph, *window):
+				edgevalrows.append(row)
+				updload(*row[5:8])
+		with self.batch():
+			self._nodes_cache.load(noderows)
+			self._edges_cache.load(edgerows)
+			self._graph_val_cache.load(graphvalrows)
+			self._node_val_cache.load(nodevalrows)
+			self._edge_val_cache.load(edgevalrows)
+
+	def _load_all_graphs(self) -> None:
+		if self._graphs_loaded is None:
+			return
+		for graph in list(self.graph):
+			self._load_graph(graph)
+
 	@world_locked
 	def unload(self) -> None:
 		"""Remove everything from memory that can be removed."""
 		# find the slices of time that need to stay loaded
 		branch, turn, tick = self._btt()
 		iter_parent_btt = self._iter_parent_btt
-		kfd = self._keyframes_dict
-		if not kfd:
+		kfs = self._keyframes_times
+		if not kfs:
 			return
 		loaded = self._loaded
 		to_keep = {}
@@ -1674,26 +1836,21 @@ class ORM:
 			if past_branch not in loaded:
 				continue  # nothing happened in this branch i guess
 			early_turn, early_tick, late_turn, late_tick = loaded[past_branch]
-			if past_branch in kfd:
-				for kfturn, kfticks in kfd[past_branch].items():
-					# this can't possibly perform very well.
-					# Maybe I need another loadedness dict that gives the two
-					# keyframes I am between and gets upkept upon time travel
-					for kftick in kfticks:
-						if (early_turn, early_tick) <= (kfturn, kftick) <= (
-							late_turn, late_tick):
-							if (kfturn < turn or
-								(kfturn == turn and kftick < tick)) and (
-									kfturn > early_turn or
-									(kfturn == early_turn
-										and kftick > early_tick)):
-								early_turn, early_tick = kfturn, kftick
-							elif (kfturn > turn or
-									(kfturn == turn and kftick >= tick)) and (
-										kfturn < late_turn or
-										(kfturn == late_turn
-											and kftick < late_tick)):
-								late_turn, late_tick = kfturn, kftick
+			times = kfs.times(past_branch)
+			if times:
+				# Narrow the loaded window to the keyframes on either side
+				# of the present, among those inside the window.
+				now_idx = bisect_left(times, (turn, tick))
+				before_idx = min(
+					(now_idx, bisect_right(times, (late_turn, late_tick))))
+				if before_idx and times[before_idx - 1] > (early_turn,
+															early_tick):
+					early_turn, early_tick = times[before_idx - 1]
+				after_idx = bisect_left(
+					times, max(((turn, tick), (early_turn, early_tick))))
+				if after_idx < len(times) and times[after_idx] < (late_turn,
+																	late_tick):
+					late_turn, late_tick = times[after_idx]
 				assert (early_turn, early_tick) <= (past_turn, past_tick) <= (
 					late_turn, late_tick
 				), "Unloading failed due to an invalid cache state"
@@ -1818,7 +1975,7 @@ class ORM:
 			# been finalized.
 			self.query.new_branch(v, curbranch, curturn, curtick)
 			self._branches[v] = curbranch, curturn, curtick, curturn, curtick
-			self._upd_branch_parentage(v, curbranch)
+			self._upd_branch_parentage(curbranch, v)
 			self._branch_end_plan[v] = curturn
 			self._turn_end_plan[v,
 								curturn] = self._turn_end[v, curturn] = curtick
@@ -2114,6 +2271,127 @@ class ORM:
 		self._otick = tick
 		return branch, turn, tick
 
+	@world_locked
+	def _nbtts(self, n: int) -> Tuple[str, int, int]:
+		"""Claim the next ``n`` ticks at once
+
+		Return branch, turn, and the first of the ticks. The last is
+		where time ends up.
+
+		"""
+		if self._planning:
+			branch, turn, tick = self._nbtt()
+			for _ in range(n - 1):
+				self._nbtt()
+			return branch, turn, tick
+		branch, turn, tick = self._nbtt()
+		end = tick + n - 1
+		if end == tick:
+			return branch, turn, tick
+		turn_end_plan, turn_end, branches = (self._turn_end_plan,
+												self._turn_end, self._branches)
+		if end > turn_end_plan[branch, turn]:
+			turn_end_plan[branch, turn] = end
+		if end > turn_end[branch, turn]:
+			turn_end[branch, turn] = end
+		parent, turn_start, tick_start, turn_end_, tick_end = branches[branch]
+		if (turn, end) > (turn_end_, tick_end):
+			branches[branch] = parent, turn_start, tick_start, turn, end
+		self._updload(branch, turn, end)
+		self._otick = end
+		return branch, turn, tick
+
+	@world_locked
+	def _add_nodes_edges_from(self, graph: Key, nodes: Iterable[Tuple[Key,
+																		dict]],
+								edges: Iterable[Tuple[Key, Key, dict]]) -> None:
+		"""Create lots of nodes and edges, with their stats, all at once
+
+		``nodes`` are pairs of a node name and a dict of its stats.
+		``edges`` are triples of origin, destination, and stats; any
+		nodes they need that don't exist yet get created too.
+
+		Each change still gets its own tick, but the ticks are claimed
+		together, the keycache is left to rebuild itself when next
+		needed, and the database gets the lot in one ``executemany``
+		per table.
+
+		"""
+		node_exists = self._node_exists
+		edge_exists = self._edge_exists
+		node_rows = []
+		node_val_rows = []
+		edge_rows = []
+		edge_val_rows = []
+		new_nodes = set()
+		new_edges = set()
+
+		def add_node(node):
+			if node in new_nodes or node_exists(graph, node):
+				return
+			if node is None:
+				raise ValueError("None cannot be a node")
+			new_nodes.add(node)
+			node_rows.append([graph, node])
+
+		def check_stats(stats):
+			if None in stats.values():
+				raise ValueError(
+					"allegedb uses None to indicate that a key's been deleted")
+
+		for node, stats in nodes:
+			check_stats(stats)
+			add_node(node)
+			for k, v in stats.items():
+				node_val_rows.append([graph, node, k, v])
+		for orig, dest, stats in edges:
+			check_stats(stats)
+			add_node(orig)
+			add_node(dest)
+			if (orig, dest) not in new_edges and not edge_exists(
+				graph, orig, dest):
+				new_edges.add((orig, dest))
+				edge_rows.append([graph, orig, dest, 0])
+			for k, v in stats.items():
+				edge_val_rows.append([graph, orig, dest, 0, k, v])
+		n = len(node_rows) + len(node_val_rows) + len(edge_rows) + len(
+			edge_val_rows)
+		if not n:
+			return
+		branch, turn, tick = self._nbtts(n)
+		for row in node_rows:
+			row.extend((branch, turn, tick, True))
+			tick += 1
+		for row in node_val_rows:
+			row[-1:-1] = (branch, turn, tick)
+			tick += 1
+		for row in edge_rows:
+			row.extend((branch, turn, tick, True))
+			tick += 1
+		for row in edge_val_rows:
+			row[-1:-1] = (branch, turn, tick)
+			tick += 1
+		planning = self._planning
+		no_kc = self._no_kc
+		self._no_kc = True
+		try:
+			for rows, cache in ((node_rows, self._nodes_cache),
+								(node_val_rows, self._node_val_cache),
+								(edge_rows, self._edges_cache),
+								(edge_val_rows, self._edge_val_cache)):
+				store = cache.store
+				for row in rows:
+					store(*row, planning=planning, loading=True, contra=True)
+		finally:
+			self._no_kc = no_kc
+		if self._coalescing:
+			# earlier writes might have been superseded
+			self._coalescing.clear()
+		self.query.insert_many(nodes=list(map(tuple, node_rows)),
+								node_val=list(map(tuple, node_val_rows)),
+								edges=list(map(tuple, edge_rows)),
+								edge_val=list(map(tuple, edge_val_rows)))
+
 	def flush(self) -> None:
 		"""Write pending changes to disk.
 
@@ -2131,9 +2409,7 @@ class ORM:
 			self.query.plans_insert_many(self._plans_uncommitted)
 		if self._plan_ticks_uncommitted:
 			self.query.plan_ticks_insert_many(self._plan_ticks_uncommitted)
-		if self._new_keyframes:
-			self.query.keyframes_insert_many(self._new_keyframes)
-			self._new_keyframes = []
+		self._hand_off_keyframes()
 		self.query.flush()
 		self._plans_uncommitted = []
 		self._plan_ticks_uncommitted = []
@@ -2151,13 +2427,16 @@ class ORM:
 		self.query.globl["main_branch"] = self.branch = branch
 
 	@world_locked
-	def commit(self, unload=True) -> None:
+	def commit(self, unload=True) -> Future:
 		"""Write the state of all graphs and commit the transaction.
 
 		Also saves the current branch, turn, and tick.
 
 		Call with ``unload=False`` if you want to keep the written state in memory.
 
+		Return a ``Future`` that will be done when the database is.
+		If writing failed, the ``Future`` holds the exception.
+
 		"""
 		self.query.globl['branch'] = self._obranch
 		self.query.globl['turn'] = self._oturn
@@ -2168,9 +2447,10 @@ class ORM:
 			set_branch(branch, parent, turn_start, tick_start, turn_end,
 						tick_end)
 		self.flush()
-		self.query.commit()
+		fut = self.query.commit()
 		if unload:
 			self.unload()
+		return fut
 
 	def close(self) -> None:
 		"""Write changes to database and close the connection"""
@@ -2178,8 +2458,10 @@ class ORM:
 			self.cache_arrange_queue.put('shutdown')
 		if self._cache_arrange_thread.is_alive():
 			self._cache_arrange_thread.join()
-		self.commit()
-		self.query.close()
+		try:
+			self.commit().result()
+		finally:
+			self.query.close()
 
 	def _nudge_loaded(self, branch: str, turn: int, tick: int) -> None:
 		loaded = self._loaded
@@ -2201,6 +2483,11 @@ class ORM:
 			data: Union[Graph, nx.Graph, dict, KeyframeTuple] = None) -> None:
 		if name in self.illegal_graph_names:
 			raise GraphNameError("Illegal name")
+		if self._graphs_loaded is not None:
+			if name in self._graph_objs:
+				self._load_graph(name)
+			else:
+				self._graphs_loaded.add(name)
 		branch, turn, tick = self._btt()
 		try:
 			self._graph_cache.retrieve(name, branch, turn, tick)
@@ -2243,24 +2530,21 @@ class ORM:
 													*data)
 				self._new_keyframes.append((name, branch, turn, tick) +
 											tuple(data))
-			if branch in self._keyframes_dict:
-				if turn in self._keyframes_dict[branch]:
-					self._keyframes_dict[branch][turn].add(tick)
-				else:
-					self._keyframes_dict[branch][turn] = {tick}
-			else:
-				self._keyframes_dict[branch] = {turn: {tick}}
+			self._keyframes_list.append((name, branch, turn, tick))
+			self._keyframes_times.add((branch, turn, tick))
 			graphmap = self.graph
 			others = set(graphmap)
 			others.discard(name)
 			branch, turn, tick = self._btt()
 			snapp = self._snap_keyframe_de_novo_graph
 			kfl = self._keyframes_list
-			kfd = self._keyframes_dict
 			kfs = self._keyframes_times
 			kfs.add((branch, turn, tick))
 			nkfs = self._new_keyframes
-			already_keyframed = {nkf[:4] for nkf in self._new_keyframes}
+			already_keyframed = {
+				kf
+				for kf in kfl if kf[1:] == (branch, turn, tick)
+			}
 			for graphn in others:
 				if (graphn, branch, turn, tick) in already_keyframed:
 					continue
@@ -2271,18 +2555,6 @@ class ORM:
 				snapp(graphn, branch, turn, tick, nodes, edges, val)
 				nkfs.append((graphn, branch, turn, tick, nodes, edges, val))
 				kfl.append((graphn, branch, turn, tick))
-				if branch not in kfd:
-					kfd[branch] = {
-						turn: {
-							tick,
-						}
-					}
-				elif turn not in kfd[branch]:
-					kfd[branch][turn] = {
-						tick,
-					}
-				else:
-					kfd[branch][turn].add(tick)
 
 	def new_digraph(self, name: Key, data: dict = None, **attr) -> DiGraph:
 		"""Return a new instance of type DiGraph, initialized with the given
@@ -25,10 +25,11 @@ from sqlalchemy import (
 	BOOLEAN,
 	MetaData,
 	ForeignKey,
+	Index,
 	select,
 	func,
 )
-from sqlalchemy.sql import bindparam, and_, or_
+from sqlalchemy.sql import Select, bindparam, and_, or_
 
 BaseColumn = Column
 Column = partial(BaseColumn, nullable=False)
@@ -184,27 +185,46 @@ def tables_for_meta(meta):
 
 
 def indices_for_table_dict(table):
-	return {}
+	"""Return indices for loading windows of time from the big tables
+
+	Each starts with the columns that the ``load_*_tick_to_end`` and
+	``load_*_tick_to_tick`` queries filter on. Then it has the non-key
+	columns they select, so that they can get everything from the index.
+
+	"""
+	windowed = {
+		'graph_val': ('value', ),
+		'nodes': ('extant', ),
+		'edges': ('extant', ),
+		'node_val': ('value', ),
+		'edge_val': ('value', )
+	}
+	return {
+		tab: Index(tab + '_window_idx', table[tab].c.graph,
+					table[tab].c.branch, table[tab].c.turn,
+					table[tab].c.tick,
+					*(table[tab].c[col] for col in cols))
+		for (tab, cols) in windowed.items()
+	}
 
 
 def queries_for_table_dict(table):
 
+	# The turn comparisons come first, outside of any OR, so that the
+	# database can seek to the start of the window in the index.
 	def tick_to_end_clause(tab):
 		return and_(
 			tab.c.graph == bindparam('graph'),
 			tab.c.branch == bindparam('branch'),
-			or_(
-				tab.c.turn > bindparam('turn_from_a'),
-				and_(tab.c.turn == bindparam('turn_from_b'),
-						tab.c.tick >= bindparam('tick_from'))))
+			tab.c.turn >= bindparam('turn_from_a'),
+			or_(tab.c.turn > bindparam('turn_from_b'),
+				tab.c.tick >= bindparam('tick_from')))
 
 	def tick_to_tick_clause(tab):
 		return and_(
-			tick_to_end_clause(tab),
-			or_(
-				tab.c.turn < bindparam('turn_to_a'),
-				and_(tab.c.turn == bindparam('turn_to_b'),
-						tab.c.tick <= bindparam('tick_to'))))
+			tick_to_end_clause(tab), tab.c.turn <= bindparam('turn_to_a'),
+			or_(tab.c.turn < bindparam('turn_to_b'),
+				tab.c.tick <= bindparam('tick_to')))
 
 	r = {
 		'global_get':
@@ -356,6 +376,24 @@ def queries_for_table_dict(table):
 				table['graph_val'].c.tick, table['graph_val'].c.value).where(
 					tick_to_tick_clause(table['graph_val']))
 	}
+	kf = table['keyframes']
+	r['keyframes_copy'] = kf.insert().from_select(
+		['graph', 'branch', 'turn', 'tick', 'nodes', 'edges', 'graph_val'],
+		select(kf.c.graph, bindparam('branch_to', type_=TEXT),
+				bindparam('turn_to', type_=INT),
+				bindparam('tick_to', type_=INT), kf.c.nodes, kf.c.edges,
+				kf.c.graph_val).where(
+					and_(kf.c.graph == bindparam('graph'),
+							kf.c.branch == bindparam('branch'),
+							kf.c.turn == bindparam('turn'),
+							kf.c.tick == bindparam('tick'))))
+	for section in ('nodes', 'edges', 'graph_val'):
+		r['get_keyframe_' + section] = select(
+			table['keyframes'].c[section]).where(
+				and_(table['keyframes'].c.graph == bindparam('graph'),
+						table['keyframes'].c.branch == bindparam('branch'),
+						table['keyframes'].c.turn == bindparam('turn'),
+						table['keyframes'].c.tick == bindparam('tick')))
 	for t in table.values():
 		key = list(t.primary_key)
 		if 'branch' in t.columns and 'turn' in t.columns and 'tick' in t.columns:
@@ -388,12 +426,47 @@ def gather_sql(meta):
 		r['create_' + t.name] = CreateTable(t)
 		r['truncate_' + t.name] = t.delete()
 	for (tab, idx) in index.items():
-		r['index_' + tab] = CreateIndex(idx)
+		r['index_' + tab] = CreateIndex(idx, if_not_exists=True)
 	r.update(query)
 
 	return r
 
 
+def explain_query_plans(engine, sql=None):
+	"""Return SQLite's query plan for each select statement
+
+	``sql`` is a dictionary like the one :func:`gather_sql` returns,
+	and by default is just that. Every parameter is bound to ``None``.
+
+	Return a dictionary mapping the names of the statements to lists of
+	the ``detail`` strings in their plans.
+
+	"""
+	if sql is None:
+		sql = gather_sql(MetaData())
+	r = {}
+	with engine.connect() as conn:
+		cursor = conn.connection.cursor()
+		for (k, v) in sql.items():
+			if not isinstance(v, Select):
+				continue
+			compiled = v.compile(dialect=engine.dialect)
+			cursor.execute('EXPLAIN QUERY PLAN ' + compiled.string,
+							[None] * len(compiled.positiontup or ()))
+			r[k] = [row[-1] for row in cursor.fetchall()]
+	return r
+
+
+def full_scans(plans):
+	"""Return the names of statements whose plans scan a whole table
+
+	``plans`` is the output of :func:`explain_query_plans`.
+
+	"""
+	return sorted(k for (k, details) in plans.items()
+					if any(detail.startswith('SCAN ') for detail in details))
+
+
 def compile_sql(dialect, meta):
 	return {
 		k: v.compile(dialect=dialect)
@@ -402,6 +475,14 @@ def compile_sql(dialect, meta):
 
 
 if __name__ == '__main__':
+	import sys
+	if len(sys.argv) > 1:
+		# report which statements scan whole tables in the given database
+		from sqlalchemy import create_engine
+		plans = explain_query_plans(create_engine('sqlite:///' +
+													sys.argv[1]))
+		print(dumps({k: plans[k] for k in full_scans(plans)}, indent=4))
+		sys.exit()
 	from sqlalchemy.dialects.sqlite.pysqlite import SQLiteDialect_pysqlite
 
 	out = dict((k, str(v)) for (
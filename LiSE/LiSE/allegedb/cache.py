@@ -17,9 +17,10 @@
 from typing import Tuple, Hashable, Optional
 
 from .window import WindowDict, HistoricKeyError, FuturistWindowDict, \
- TurnDict, SettingsTurnDict
+ TurnDict, SettingsTurnDict, ArrayWindowDict, ArrayFuturistWindowDict, \
+ ArrayTurnDict, ArraySettingsTurnDict
 from collections import OrderedDict, defaultdict, deque
-from threading import RLock
+from threading import Lock, RLock
 
 
 class NotInKeyframeError(KeyError):
@@ -182,18 +183,141 @@ def lru_append(kc, lru, kckey, maxsize):
 	lru[kckey] = True
 
 
+SHALLOWEST_MAXSIZE = 65536
+_MISSING = object()
+
+
+class HintCache:
+	"""A bounded, least-recently-used store for retrieval hints.
+
+	Keys are the ``args`` tuples that :meth:`Cache._base_retrieve` takes,
+	ending in ``(key, branch, turn, tick)``. The first element is usually
+	the character, so I keep secondary indexes by that and by branch,
+	letting you forget everything about either without a full scan.
+
+	``hits`` and ``misses`` count lookups with :meth:`get`.
+
+	"""
+	__slots__ = ('maxsize', 'hits', 'misses', '_data', '_by_entity',
+					'_by_branch', '_lock')
+
+	def __init__(self, maxsize: Optional[int] = SHALLOWEST_MAXSIZE):
+		self.maxsize = maxsize
+		self.hits = 0
+		self.misses = 0
+		self._data = OrderedDict()
+		self._by_entity = {}
+		self._by_branch = {}
+		self._lock = Lock()
+
+	def __contains__(self, k):
+		return k in self._data
+
+	def __len__(self):
+		return len(self._data)
+
+	def __iter__(self):
+		return iter(list(self._data))
+
+	def __getitem__(self, k):
+		ret = self.get(k, _MISSING)
+		if ret is _MISSING:
+			raise KeyError(k)
+		return ret
+
+	def get(self, k, default=None):
+		"""Return the hint for ``k`` and mark it recently used"""
+		data = self._data
+		try:
+			ret = data[k]
+		except KeyError:
+			self.misses += 1
+			return default
+		self.hits += 1
+		try:
+			data.move_to_end(k)
+		except KeyError:  # evicted by another thread just now
+			pass
+		return ret
+
+	def __setitem__(self, k, v):
+		with self._lock:
+			data = self._data
+			if k in data:
+				data[k] = v
+				data.move_to_end(k)
+				return
+			maxsize = self.maxsize
+			if maxsize is not None:
+				while data and len(data) >= maxsize:
+					self._unindex(data.popitem(last=False)[0])
+			data[k] = v
+			by_entity = self._by_entity
+			if k[0] in by_entity:
+				by_entity[k[0]].add(k)
+			else:
+				by_entity[k[0]] = {k}
+			by_branch = self._by_branch
+			if k[-3] in by_branch:
+				by_branch[k[-3]].add(k)
+			else:
+				by_branch[k[-3]] = {k}
+
+	def __delitem__(self, k):
+		with self._lock:
+			del self._data[k]
+			self._unindex(k)
+
+	def _unindex(self, k):
+		for index, idx in ((self._by_entity, k[0]), (self._by_branch, k[-3])):
+			if idx in index:
+				keys = index[idx]
+				keys.discard(k)
+				if not keys:
+					del index[idx]
+
+	def clear(self):
+		"""Forget all hints, but not the hit and miss counts"""
+		with self._lock:
+			self._data.clear()
+			self._by_entity.clear()
+			self._by_branch.clear()
+
+	def remove_entity(self, entity: Hashable):
+		"""Forget all hints whose first element is ``entity``"""
+		with self._lock:
+			data = self._data
+			for k in self._by_entity.pop(entity, ()):
+				if k in data:
+					del data[k]
+				self._unindex(k)
+
+	def remove_branch(self, branch: str):
+		"""Forget all hints about the given branch"""
+		with self._lock:
+			data = self._data
+			for k in self._by_branch.pop(branch, ()):
+				if k in data:
+					del data[k]
+				self._unindex(k)
+
+
 class Cache:
 	"""A data store that's useful for tracking graph revisions."""
+	shallowest_maxsize = SHALLOWEST_MAXSIZE
+	"""How many retrieval hints to keep; ``None`` for no limit"""
 	__slots__ = ('db', 'parents', 'keys', 'keycache', 'branches', 'shallowest',
 					'settings', 'presettings', 'time_entity', '_kc_lru',
 					'_store_stuff', '_remove_stuff', '_truncate_stuff',
 					'setdb', 'deldb', 'keyframe', 'name',
-					'_store_journal_stuff', '_lock')
+					'_store_journal_stuff', '_lock', 'writes')
 
 	def __init__(self, db, kfkvs=None):
 		super().__init__()
 		self.db = db
-		self.parents = StructuredDefaultDict(3, SettingsTurnDict)
+		self.writes = 0
+		"""How many times :meth:`store` has been called"""
+		self.parents = StructuredDefaultDict(3, ArraySettingsTurnDict)
 		"""Entity data keyed by the entities' parents.
 
 		An entity's parent is what it's contained in. When speaking of a node,
@@ -204,7 +328,7 @@ class Cache:
 		Deeper layers of this cache are keyed by branch and revision.
 
 		"""
-		self.keys = StructuredDefaultDict(2, SettingsTurnDict)
+		self.keys = StructuredDefaultDict(2, ArraySettingsTurnDict)
 		"""Cache of entity data keyed by the entities themselves.
 
 		That means the whole tuple identifying the entity is the
@@ -214,23 +338,23 @@ class Cache:
 		Deeper layers of this cache are keyed by branch, turn, and tick.
 
 		"""
-		self.keycache = PickyDefaultDict(SettingsTurnDict)
+		self.keycache = PickyDefaultDict(ArraySettingsTurnDict)
 		"""Keys an entity has at a given turn and tick."""
-		self.branches = StructuredDefaultDict(1, SettingsTurnDict)
+		self.branches = StructuredDefaultDict(1, ArraySettingsTurnDict)
 		"""A less structured alternative to ``keys``.
 
 		For when you already know the entity and the key within it,
 		but still need to iterate through history to find the value.
 
 		"""
-		self.keyframe = StructuredDefaultDict(1, SettingsTurnDict,
+		self.keyframe = StructuredDefaultDict(1, ArraySettingsTurnDict,
 												**(kfkvs or {}))
 		"""Key-value dictionaries representing my state at a given time"""
-		self.shallowest = OrderedDict()
-		"""A dictionary for plain, unstructured hinting."""
-		self.settings = PickyDefaultDict(SettingsTurnDict)
+		self.shallowest = HintCache(self.shallowest_maxsize)
+		"""A bounded mapping for plain, unstructured hinting."""
+		self.settings = PickyDefaultDict(ArraySettingsTurnDict)
 		"""All the ``entity[key] = value`` settings on some turn"""
-		self.presettings = PickyDefaultDict(SettingsTurnDict)
+		self.presettings = PickyDefaultDict(ArraySettingsTurnDict)
 		"""The values prior to ``entity[key] = value`` settings on some turn"""
 		self.time_entity = {}
 		self._kc_lru = OrderedDict()
@@ -265,7 +389,7 @@ class Cache:
 			else:
 				kfgb[turn] = {tick: keyframe}
 		else:
-			d = SettingsTurnDict()
+			d = ArraySettingsTurnDict()
 			d[turn] = {tick: keyframe}
 			kfg[branch] = d
 
@@ -275,23 +399,46 @@ class Cache:
 		But it doesn't need to all be from the same branch, as long as
 		each branch is chronological of itself.
 
+		I store rows as they arrive, except those of a branch whose
+		parent hasn't been stored yet, which wait for it. So if all
+		the rows of each branch come together, as they do from the
+		``*_dump`` queries, the data may be a stream that's never all
+		in memory at once.
+
 		"""
-		branches = defaultdict(list)
-		for row in data:
-			branches[row[-4]].append(row)
 		db = self.db
 		# Make keycaches and valcaches. Must be done chronologically
 		# to make forwarding work.
 		childbranch = db._childbranch
-		branch2do = deque(['trunk'])
-
 		store = self.store
-		while branch2do:
-			branch = branch2do.popleft()
-			for row in branches[branch]:
+		waiting = defaultdict(list)
+		done = set()
+		branch = None
+
+		def finish(branch):
+			branch2do = deque([branch])
+			while branch2do:
+				branch = branch2do.popleft()
+				done.add(branch)
+				for row in waiting.pop(branch, ()):
+					store(*row, planning=False, loading=True)
+				if branch in childbranch:
+					branch2do.extend(childbranch[branch])
+
+		for row in data:
+			if row[-4] != branch:
+				if branch in done:
+					finish(branch)
+				branch = row[-4]
+				if branch == 'trunk' or (branch in db._branches
+											and db._branches[branch][0]
+											in done):
+					done.add(branch)
+			if branch in done:
 				store(*row, planning=False, loading=True)
-			if branch in childbranch:
-				branch2do.extend(childbranch[branch])
+			else:
+				waiting[branch].append(row)
+		finish('trunk')
 
 	def _valcache_lookup(self, cache: dict, branch: str, turn: int, tick: int):
 		"""Return the value at the given time in ``cache``"""
@@ -357,7 +504,7 @@ class Cache:
 							ret = frozenset()
 						# assert ret == get_adds_dels(
 						# keys[parentity], branch, turn, tick)[0]  # slow
-						new_turn_kc = WindowDict()
+						new_turn_kc = ArrayWindowDict()
 						new_turn_kc[tick] = ret
 						keycache2[turn] = new_turn_kc
 						return ret
@@ -405,7 +552,7 @@ class Cache:
 				else:
 					keycache2[turn] = {tick: ret}
 			else:
-				kcc = SettingsTurnDict()
+				kcc = ArraySettingsTurnDict()
 				kcc[turn] = {tick: ret}
 				keycache[keycache_key] = kcc
 			return ret
@@ -545,6 +692,7 @@ class Cache:
 			self_iter_future_contradictions, db_branches, db_turn_end,
 			self_store_journal, self_time_entity, db_where_cached, keycache,
 			db, update_keycache) = self._store_stuff
+		self.writes += 1
 		if planning is None:
 			planning = db._planning
 		if forward is None:
@@ -591,7 +739,7 @@ class Cache:
 					self_iter_future_contradictions(entity, key, turns, branch,
 													turn, tick, value))
 				if contras:
-					self.shallowest = OrderedDict()
+					self.shallowest.clear()
 				for contra_turn, contra_tick in contras:
 					if (
 						branch, contra_turn, contra_tick
@@ -617,7 +765,7 @@ class Cache:
 				the_turn.truncate(tick)
 				the_turn[tick] = value
 			else:
-				new = FuturistWindowDict()
+				new = ArrayFuturistWindowDict()
 				new[tick] = value
 				turns[turn] = new
 			self_time_entity[branch, turn, tick] = parent, entity, key
@@ -636,6 +784,34 @@ class Cache:
 			if not db._no_kc:
 				update_keycache(*args, forward=forward)
 
+	def overwrite(self, *args):
+		"""Replace the value I have for a key at an existing time
+
+		Takes the same arguments as :meth:`store`. Unlike that method,
+		this doesn't record a new change: the journal keeps the value
+		from before the time, and only the value after changes. So only
+		use it on the latest time a key was set.
+
+		"""
+		lock = self._store_stuff[0]
+		entity, key, branch, turn, tick, value = args[-6:]
+		parent = args[:-6]
+		db = self.db
+		with lock:
+			the_turn = self.branches[parent + (entity, key)][branch][turn]
+			the_turn.truncate(tick)
+			the_turn[tick] = value
+			self.settings[branch][turn][tick] = parent + (entity, key, value)
+			shallowest = self.shallowest
+			hint = parent + (entity, key, branch, turn)
+			for later in range(
+				tick,
+				max((db._turn_end[branch, turn],
+						db._turn_end_plan[branch, turn])) + 1):
+				if hint + (later, ) in shallowest:
+					del shallowest[hint + (later, )]
+			shallowest[hint + (tick, )] = value
+
 	def remove_character(self, character):
 		(lock, time_entity, parents, branches, keys, settings, presettings,
 			remove_keycache, keycache) = self._remove_stuff
@@ -644,10 +820,8 @@ class Cache:
 												key)) in time_entity.items()
 					if (parent and parent[0] == character) or (
 						not parent and entity == character)}
-		todel_shallow = {k for k in self.shallowest if k[0] == character}
 		with lock:
-			for k in todel_shallow:
-				del self.shallowest[k]
+			self.shallowest.remove_entity(character)
 			for (branch, turn, tick, parent, entity, key) in todel:
 				self._remove_btt_parentikey(branch, turn, tick, parent, entity,
 											key)
@@ -659,17 +833,11 @@ class Cache:
 					for ((branc, turn, tick), (parent, entity,
 												key)) in time_entity.items()
 					if branc == branch}
-		todel_shallow = {k for k in self.shallowest if k[-2] == branch}
 		with lock:
-			for k in todel_shallow:
-				del self.shallowest[k]
+			self.shallowest.remove_branch(branch)
 			for branc, turn, tick, parent, entity, key in todel:
 				self._remove_btt_parentikey(branc, turn, tick, parent, entity,
 											key)
-				if (*parent, entity, key, branc, turn,
-					tick) in self.shallowest:
-					del self.shallowest[(*parent, entity, key, branc, turn,
-											tick)]
 
 	def _remove_btt_parentikey(self, branch, turn, tick, parent, entity, key):
 		(_, time_entity, parents, branches, keys, settings, presettings,
@@ -786,7 +954,7 @@ class Cache:
 			if not pbranhc:
 				del settings[branch]
 				del presettings[branch]
-			self.shallowest = OrderedDict()
+			self.shallowest.clear()
 			remove_keycache(parent + (entity, branch), turn, tick)
 
 	def _remove_keycache(self, entity_branch: tuple, turn: int, tick: int):
@@ -839,15 +1007,15 @@ class Cache:
 					truncate_branhc(branches[branch])
 			truncate_branhc(settings[branch])
 			truncate_branhc(presettings[branch])
-			self.shallowest = OrderedDict()
+			self.shallowest.clear()
 			for entity_branch in keycache:
 				if entity_branch[-1] == branch:
 					truncate_branhc(keycache[entity_branch])
 
 	@staticmethod
 	def _iter_future_contradictions(entity: Hashable, key: Hashable,
-									turns: WindowDict, branch: str, turn: int,
-									tick: int, value):
+									turns: ArrayWindowDict, branch: str,
+									turn: int, tick: int, value):
 		"""Iterate over contradicted ``(turn, tick)`` if applicable"""
 		# assumes that all future entries are in the plan
 		if not turns:
@@ -911,9 +1079,13 @@ class Cache:
 		use outside try-blocks, which have some performance overhead.
 
 		"""
+		if self.db._tracking_reads:
+			self.db._note_read(self, args[:-3])
 		shallowest = self.shallowest
-		if retrieve_hint and args in shallowest:
-			return shallowest[args]
+		if retrieve_hint:
+			ret = shallowest.get(args, _MISSING)
+			if ret is not _MISSING:
+				return ret
 		entity: tuple = args[:-4]
 		key: Hashable
 		branch: str
@@ -1079,6 +1251,8 @@ class Cache:
 		turn: int
 		tick: int
 		branch, turn, tick = args[-3:]
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', entity)
 		if self.db._no_kc:
 			yield from self._get_adds_dels(entity, branch, turn, tick)[0]
 			return
@@ -1103,6 +1277,8 @@ class Cache:
 		turn: int
 		tick: int
 		branch, turn, tick = args[-3:]
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', entity)
 		if self.db._no_kc:
 			return len(self._get_adds_dels(entity, branch, turn, tick)[0])
 		return len(
@@ -1203,9 +1379,9 @@ class EdgesCache(Cache):
 							'gettest': gettest,
 							'settest': settest
 						})
-		self.destcache = PickyDefaultDict(SettingsTurnDict)
-		self.origcache = PickyDefaultDict(SettingsTurnDict)
-		self.predecessors = StructuredDefaultDict(3, TurnDict)
+		self.destcache = PickyDefaultDict(ArraySettingsTurnDict)
+		self.origcache = PickyDefaultDict(ArraySettingsTurnDict)
+		self.predecessors = StructuredDefaultDict(3, ArrayTurnDict)
 		self._origcache_lru = OrderedDict()
 		self._destcache_lru = OrderedDict()
 		self._get_destcache_stuff: Tuple[PickyDefaultDict, OrderedDict,
@@ -1415,6 +1591,8 @@ class EdgesCache(Cache):
 						*,
 						forward=None):
 		"""Iterate over successors of a given origin node at a given time."""
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', (graph, orig))
 		if self.db._no_kc:
 			yield from self._adds_dels_successors((graph, orig), branch, turn,
 													tick)[0]
@@ -1437,6 +1615,8 @@ class EdgesCache(Cache):
 							*,
 							forward: bool = None):
 		"""Iterate over predecessors to a destination node at a given time."""
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', (graph, ))
 		if self.db._no_kc:
 			yield from self._adds_dels_predecessors((graph, dest), branch,
 													turn, tick)[0]
@@ -1461,6 +1641,8 @@ class EdgesCache(Cache):
 		"""Return the number of successors to an origin node at a given time.
 
 		"""
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', (graph, orig))
 		if self.db._no_kc:
 			return len(
 				self._adds_dels_successors((graph, orig), branch, turn,
@@ -1486,6 +1668,8 @@ class EdgesCache(Cache):
 		"""Return the number of predecessors from a destination node at a time.
 
 		"""
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', (graph, ))
 		if self.db._no_kc:
 			return len(
 				self._adds_dels_predecessors((graph, dest), branch, turn,
@@ -1515,6 +1699,8 @@ class EdgesCache(Cache):
 		a particular edge.
 
 		"""
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', (graph, orig))
 		if forward is None:
 			forward = self.db._forward
 		return dest in self._get_destcache(graph,
@@ -1539,6 +1725,8 @@ class EdgesCache(Cache):
 		a particular edge.
 
 		"""
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', (graph, ))
 		if forward is None:
 			forward = self.db._forward
 		return orig in self._get_origcache(graph,
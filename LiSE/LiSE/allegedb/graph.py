@@ -18,7 +18,7 @@ from abc import ABC
 import networkx
 from networkx.exception import NetworkXError
 from collections import defaultdict
-from collections.abc import MutableMapping
+from collections.abc import Mapping, MutableMapping
 from .wrap import MutableMappingUnwrapper
 
 
@@ -126,15 +126,47 @@ class AbstractEntityMapping(AllegedMapping, ABC):
 		if value is None:
 			raise ValueError(
 				"allegedb uses None to indicate that a key's been deleted")
+		coalescing = self.db._coalescing
+		if coalescing is not None and not self.db._planning:
+			if self._set_coalesced(coalescing, key, value):
+				return
 		branch, turn, tick = self.db._nbtt()
 		try:
-			if self._get_cache(key, branch, turn, tick) != value:
-				self._set_cache(key, branch, turn, tick, value)
+			if self._get_cache(key, branch, turn, tick) == value:
+				self._set_db(key, branch, turn, tick, value)
+				if coalescing is not None:
+					# the database is ahead of the cache for this key now
+					coalescing.pop(self._set_cache_stuff + (key, ), None)
+				return
 		except KeyError:
-			self._set_cache(key, branch, turn, tick, value)
+			pass
+		self._set_cache(key, branch, turn, tick, value)
 		self._set_db(key, branch, turn, tick, value)
+		if coalescing is not None and not self.db._planning:
+			coalescing[self._set_cache_stuff + (key, )] = (branch, turn, tick)
+
+	def _set_coalesced(self, coalescing, key, value):
+		"""Replace the value I set the key to earlier, if I can
+
+		Return whether I did.
+
+		"""
+		try:
+			branch, turn, tick = coalescing[self._set_cache_stuff + (key, )]
+		except KeyError:
+			return False
+		if (branch, turn) != self.db._btt()[:2]:
+			return False
+		if not self.db.query.overwrite_pending(branch, turn, tick, value):
+			return False
+		store, *entity = self._set_cache_stuff
+		store.__self__.overwrite(*entity, key, branch, turn, tick, value)
+		return True
 
 	def __delitem__(self, key):
+		coalescing = self.db._coalescing
+		if coalescing is not None:
+			coalescing.pop(self._set_cache_stuff + (key, ), None)
 		branch, turn, tick = self.db._nbtt()
 		self._del_cache(key, branch, turn, tick)
 		self._del_db(key, branch, turn, tick)
@@ -942,7 +974,7 @@ class DiGraph(networkx.DiGraph):
 		self.succ[u][v] = datadict
 
 	def add_edges_from(self, ebunch, attr_dict=None, **attr):
-		"""Version of add_edges_from that only writes to the database once"""
+		"""Version of add_edges_from that writes everything at once"""
 		if attr_dict is None:
 			attr_dict = attr
 		else:
@@ -950,6 +982,7 @@ class DiGraph(networkx.DiGraph):
 				attr_dict.update(attr)
 			except AttributeError:
 				raise NetworkXError("The attr_dict argument must be a dict.")
+		edges = []
 		for e in ebunch:
 			ne = len(e)
 			if ne == 3:
@@ -961,16 +994,29 @@ class DiGraph(networkx.DiGraph):
 			else:
 				raise NetworkXError(
 					"Edge tupse {} must be a 2-tuple or 3-tuple.".format(e))
-			if u not in self.node:
-				self.node[u] = {}
-			if v not in self.node:
-				self.node[v] = {}
-			datadict = self.adj.get(u, {}).get(v, {})
-			datadict.update(attr_dict)
+			datadict = dict(attr_dict)
 			datadict.update(dd)
-			self.succ[u][v] = datadict
-			assert (u in self.succ)
-			assert (v in self.succ[u])
+			edges.append((u, v, datadict))
+		self.db._add_nodes_edges_from(self.name, (), edges)
+
+	def add_nodes_from(self, nodes_for_adding, **attr):
+		"""Version of add_nodes_from that writes everything at once
+
+		Like in networkx, the nodes may be names, or pairs of a name and
+		a dict of stats.
+
+		"""
+		nodes = []
+		for n in nodes_for_adding:
+			if isinstance(n, tuple) and len(n) == 2 and isinstance(
+				n[1], Mapping):
+				n, ndict = n
+				newdict = dict(attr)
+				newdict.update(ndict)
+				nodes.append((n, newdict))
+			else:
+				nodes.append((n, attr))
+		self.db._add_nodes_edges_from(self.name, nodes, ())
 
 	def clear(self):
 		"""Remove all nodes and edges from the graph.
@@ -1023,6 +1069,9 @@ class GraphsMapping(MutableMapping):
 	def __getitem__(self, item):
 		if not self.orm._has_graph(item):
 			raise KeyError(f"No such graph: {item}", item)
+		graphs_loaded = self.orm._graphs_loaded
+		if graphs_loaded is not None and item not in graphs_loaded:
+			self.orm._load_graph(item)
 		return self.orm._graph_objs[item]
 
 	def __setitem__(self, key, value):
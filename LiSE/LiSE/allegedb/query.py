@@ -17,18 +17,26 @@ code that's more to do with the queries than with the data per se
 doesn't pollute the other files so much.
 
 """
+from concurrent.futures import Future
 from threading import Thread, Lock
 from time import monotonic
+import struct
+import zlib
 from typing import Tuple, Any, Iterator, Hashable
 from queue import Queue
 import os
-from collections.abc import MutableMapping
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+
+import sqlite3
 
 from sqlalchemy.sql import Select
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, event, MetaData
 from sqlalchemy.engine.base import Engine
-from sqlalchemy.exc import ArgumentError, IntegrityError, OperationalError
-from sqlalchemy.pool import NullPool
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import (ArgumentError, DBAPIError, IntegrityError,
+							OperationalError)
+from sqlalchemy.pool import NullPool, QueuePool
 
 from . import wrap
 from .wrap import DictWrapper, SetWrapper, ListWrapper
@@ -42,10 +50,203 @@ NodeValRowType = Tuple[Hashable, Hashable, Hashable, str, int, int, Any]
 EdgeValRowType = Tuple[Hashable, Hashable, Hashable, int, str, int, int, Any]
 
 
+KEYFRAME_MAGIC = b'\x00KFC1'
+KEYFRAME_DELTA_MAGIC = b'\x00KFD1'
+KEYFRAME_SECTION_DEPTH = {'nodes': 2, 'edges': 3, 'graph_val': 1}
+
+
 class TimeError(ValueError):
 	"""Exception class for problems with the time model"""
 
 
+def _flatten_section(section: dict, depth: int, prefix=()):
+	if depth == 1:
+		yield prefix, section
+		return
+	for k, v in section.items():
+		yield from _flatten_section(v, depth - 1, prefix + (k, ))
+
+
+def pack_keyframe_section(pack, section: dict, depth: int,
+							chunk_size: int = 4096) -> bytes:
+	"""Encode one section of a keyframe in compressed, columnar chunks
+
+	``depth`` is how deeply the section's dictionaries nest: 1 for
+	graph stats, 2 for nodes, 3 for edges. Each chunk holds up to
+	``chunk_size`` entities as parallel lists -- one for each level of
+	the entities' names, then how many keys each has, then the keys,
+	then the values -- packed with ``pack`` and compressed separately,
+	so that they can be unpacked one at a time.
+
+	"""
+	chunks = []
+	entities = list(_flatten_section(section, depth))
+	is_text = False
+	for i in range(0, max((len(entities), 1)), chunk_size):
+		columns = [[] for _ in range(depth + 2)]
+		names = columns[:depth - 1]
+		counts, keys, values = columns[depth - 1:]
+		for entity, stats in entities[i:i + chunk_size]:
+			for name, col in zip(entity, names):
+				col.append(name)
+			counts.append(len(stats))
+			keys.extend(stats.keys())
+			values.extend(stats.values())
+		packed = pack(columns)
+		if isinstance(packed, str):
+			packed = packed.encode('utf-8')
+			is_text = True
+		chunks.append(zlib.compress(packed))
+	return b''.join((KEYFRAME_MAGIC,
+						struct.pack('<BBI', depth, is_text, len(chunks)),
+						struct.pack(f'<{len(chunks)}I',
+									*map(len, chunks)), *chunks))
+
+
+def iter_keyframe_chunks(unpack, data: bytes):
+	"""Decode the chunks of a keyframe section one at a time
+
+	Yield pairs of an entity's names, as a tuple, and its stats.
+
+	"""
+	depth, is_text, n = struct.unpack_from('<BBI', data, len(KEYFRAME_MAGIC))
+	start = len(KEYFRAME_MAGIC) + struct.calcsize('<BBI')
+	lengths = struct.unpack_from(f'<{n}I', data, start)
+	start += struct.calcsize(f'<{n}I')
+	for length in lengths:
+		packed = zlib.decompress(data[start:start + length])
+		start += length
+		columns = unpack(packed.decode('utf-8') if is_text else packed)
+		names = columns[:depth - 1]
+		counts, keys, values = columns[depth - 1:]
+		i = 0
+		for j, count in enumerate(counts):
+			yield tuple(col[j] for col in names), dict(
+				zip(keys[i:i + count], values[i:i + count]))
+			i += count
+
+
+def unpack_keyframe_section(unpack, data):
+	"""Decode a section of a keyframe, in either storage format
+
+	Not for delta keyframes; see :func:`unpack_keyframe_delta`.
+
+	"""
+	if not (isinstance(data, bytes) and data.startswith(KEYFRAME_MAGIC)):
+		return unpack(data)
+	ret = {}
+	for entity, stats in iter_keyframe_chunks(unpack, data):
+		if not entity:
+			ret.update(stats)
+			continue
+		d = ret
+		for name in entity[:-1]:
+			d = d.setdefault(name, {})
+		d[entity[-1]] = stats
+	return ret
+
+
+def is_keyframe_delta(data) -> bool:
+	return isinstance(data, bytes) and data.startswith(KEYFRAME_DELTA_MAGIC)
+
+
+def _copy_section(section: dict, depth: int) -> dict:
+	if depth == 1:
+		return dict(section)
+	return {k: _copy_section(v, depth - 1) for (k, v) in section.items()}
+
+
+def flat_keyframe_section(section: dict, depth: int) -> dict:
+	"""Copy a keyframe section into a dict keyed by entity name tuples"""
+	return {
+		entity: dict(stats)
+		for (entity, stats) in _flatten_section(section, depth)
+	}
+
+
+def pack_keyframe_delta(pack, base: Tuple[str, int, int], old: dict,
+						new: dict, depth: int,
+						chunk_size: int = 4096) -> bytes:
+	"""Encode how a section of a keyframe differs from an earlier one
+
+	``base`` is the ``(branch, turn, tick)`` of the keyframe of the same
+	graph that ``old`` came from. ``old`` is in the form returned by
+	:func:`flat_keyframe_section`, and will be emptied of everything
+	but the removed entities. Only entities whose stats changed are
+	stored, along with the names of entities that were removed.
+
+	"""
+	old_flat = old
+	changed = {}
+	for entity, stats in _flatten_section(new, depth):
+		if old_flat.pop(entity, None) != stats:
+			d = changed
+			for name in entity[:-1]:
+				d = d.setdefault(name, {})
+			d[entity[-1]] = stats
+	head = pack([*base, list(old_flat)])
+	is_text = isinstance(head, str)
+	if is_text:
+		head = head.encode('utf-8')
+	return b''.join(
+		(KEYFRAME_DELTA_MAGIC, struct.pack('<BI', is_text, len(head)), head,
+			pack_keyframe_section(pack, changed, depth, chunk_size)))
+
+
+def _unpack_keyframe_delta_head(unpack, data: bytes):
+	start = len(KEYFRAME_DELTA_MAGIC)
+	is_text, head_len = struct.unpack_from('<BI', data, start)
+	start += struct.calcsize('<BI')
+	head = data[start:start + head_len]
+	branch, turn, tick, removed = unpack(
+		head.decode('utf-8') if is_text else head)
+	return (branch, turn, tick), removed, start + head_len
+
+
+def keyframe_delta_base(unpack, data: bytes) -> Tuple[str, int, int]:
+	"""Return the ``(branch, turn, tick)`` a delta keyframe is based on
+
+	Without decoding the rest of it.
+
+	"""
+	return _unpack_keyframe_delta_head(unpack, data)[0]
+
+
+def unpack_keyframe_delta(unpack, data: bytes):
+	"""Decode a delta made by :func:`pack_keyframe_delta`
+
+	Return a triple of the base keyframe's ``(branch, turn, tick)``,
+	a list of removed entities, and a section of changed entities.
+
+	"""
+	base, removed, start = _unpack_keyframe_delta_head(unpack, data)
+	changed = unpack_keyframe_section(unpack, data[start:])
+	return base, removed, changed
+
+
+def apply_keyframe_delta(section: dict, removed: list, changed: dict,
+							depth: int) -> dict:
+	"""Change a keyframe section in place, and return it"""
+	for entity in removed:
+		parents = []
+		d = section
+		for name in entity[:-1]:
+			parents.append((d, name))
+			d = d[name]
+		del d[entity[-1]]
+		# don't leave behind a parent that held only the removed entity
+		for parent, name in reversed(parents):
+			if parent[name]:
+				break
+			del parent[name]
+	for entity, stats in _flatten_section(changed, depth):
+		d = section
+		for name in entity[:-1]:
+			d = d.setdefault(name, {})
+		d[entity[-1]] = stats
+	return section
+
+
 class GlobalKeyValueStore(MutableMapping):
 	"""A dict-like object that keeps its contents in a table.
 
@@ -87,8 +288,68 @@ class GlobalKeyValueStore(MutableMapping):
 		self.qe.global_del(k)
 
 
+def _bind_processors(statement):
+	"""Return a dict of the bind processors of a compiled statement
+
+	That's private to SQLAlchemy, so return ``None`` if it's not there,
+	and the statement will be run with ``connection.execute``.
+
+	"""
+	procs = getattr(statement, '_bind_processors', None)
+	if isinstance(procs, Mapping):
+		return procs
+
+
+class WorkQueue(Queue):
+	"""Queue of instructions for a :class:`ConnectionHolder`
+
+	Counts how many of them might write to the database, so that
+	:class:`QueryEngine` can tell when everything's been committed.
+
+	"""
+
+	def _init(self, maxsize):
+		super()._init(maxsize)
+		self.reads = frozenset()
+		self.writes = 0
+		self.committed = 0
+		self.committed_ends = {}
+
+	def _put(self, item):
+		if isinstance(item, tuple):
+			cmd = item[1] if item[0] == 'silent' else item[0]
+			if cmd == 'commit':
+				item[1].writes = self.writes
+			elif cmd in ('one', 'many') and (item[2] if item[0] == 'silent'
+												else item[1]) in self.reads:
+				pass
+			elif cmd not in ('echo', 'stream'):
+				self.writes += 1
+		elif item == 'initdb':
+			self.writes += 1
+		super()._put(item)
+
+	@property
+	def clean(self) -> bool:
+		"""Whether everything written so far has been committed"""
+		return self.committed == self.writes
+
+
 class ConnectionHolder:
 	strings: dict
+	sqlite_pragmas = {
+		'journal_mode': 'wal',
+		'synchronous': 'normal',
+		'temp_store': 'memory'
+	}
+	"""Pragmas to set on every SQLite connection
+
+	Write-ahead logging lets readers work alongside the writer, and
+	makes ``synchronous = normal`` safe against corruption.
+
+	"""
+	sqlite_cached_statements = 512
+	"""How many prepared statements each SQLite connection should keep"""
 
 	def __init__(self,
 					dbstring,
@@ -107,6 +368,9 @@ class ConnectionHolder:
 		self.inq = inq
 		self.outq = outq
 		self.tables = tables
+		# first exception from a silent instruction, to be raised by the
+		# next flush or set on the next commit's future
+		self.error = None
 		if gather is not None:
 			self.gather = gather
 
@@ -128,15 +392,25 @@ class ConnectionHolder:
 			self.engine = dbstring
 		else:
 			try:
-				self.engine = create_engine(dbstring,
-											connect_args=connect_args,
-											poolclass=NullPool)
+				url = make_url(dbstring)
 			except ArgumentError:
-				self.engine = create_engine('sqlite:///' + dbstring,
-											connect_args=connect_args,
-											poolclass=NullPool)
+				url = make_url('sqlite:///' + dbstring)
+			if url.get_backend_name() == 'sqlite':
+				connect_args = {
+					'cached_statements': self.sqlite_cached_statements,
+					**(connect_args or {})
+				}
+			self.engine = create_engine(url,
+										connect_args=connect_args,
+										poolclass=NullPool)
+		if self.engine.dialect.name == 'sqlite':
+			event.listen(self.engine, 'connect', self._set_sqlite_pragmas)
 		self.meta = MetaData()
 		self.sql = gather_sql(self.meta)
+		self._compiled_cache = {}
+		if hasattr(self.inq, 'reads'):
+			self.inq.reads = frozenset(k for (k, v) in self.sql.items()
+										if isinstance(v, Select))
 		self.connection = self.engine.connect()
 		self.transaction = self.connection.begin()
 		while True:
@@ -148,8 +422,22 @@ class ConnectionHolder:
 				self.engine.dispose()
 				self.existence_lock.release()
 				return
-			if inst == 'commit':
-				self.commit()
+			if isinstance(inst, tuple) and inst[0] == 'commit':
+				fut = inst[1]
+				try:
+					self.commit()
+				except Exception as ex:
+					fut.set_exception(ex)
+				else:
+					if hasattr(fut, 'writes'):
+						self.inq.committed = fut.writes
+					if hasattr(fut, 'ends'):
+						self.inq.committed_ends = fut.ends
+					if self.error is not None:
+						ex, self.error = self.error, None
+						fut.set_exception(ex)
+					else:
+						fut.set_result(None)
 				continue
 			if inst == 'initdb':
 				self.outq.put(self.initdb())
@@ -168,7 +456,9 @@ class ConnectionHolder:
 				try:
 					res = self.call_one(inst[1], *inst[2])
 					if not silent:
-						if hasattr(res, 'returns_rows'):
+						if res is None:
+							self.outq.put(None)
+						elif hasattr(res, 'returns_rows'):
 							if res.returns_rows:
 								o = list(res)
 								self.outq.put(o)
@@ -180,13 +470,23 @@ class ConnectionHolder:
 				except Exception as ex:
 					if not silent:
 						self.outq.put(ex)
+					elif self.error is None:
+						self.error = ex
+			elif inst[0] == 'stream':
+				self.stream(*inst[1:])
 			elif inst[0] != 'many':
 				raise ValueError(f"Invalid instruction: {inst[0]}")
 			else:
 				try:
-					res = self.call_many(inst[1], inst[2])
+					if len(inst) > 3:
+						res = self.call_many(inst[1], list(map(inst[3],
+																inst[2])))
+					else:
+						res = self.call_many(inst[1], inst[2])
 					if not silent:
-						if hasattr(res, 'returns_rows'):
+						if res is None:
+							self.outq.put(None)
+						elif hasattr(res, 'returns_rows'):
 							if res.returns_rows:
 								self.outq.put(list(res))
 							else:
@@ -197,9 +497,76 @@ class ConnectionHolder:
 				except Exception as ex:
 					if not silent:
 						self.outq.put(ex)
+					elif self.error is None:
+						self.error = ex
 
-	def call_one(self, k, *largs):
+	def _set_sqlite_pragmas(self, dbapi_connection, connection_record):
+		cursor = dbapi_connection.cursor()
+		for pragma, value in self.sqlite_pragmas.items():
+			cursor.execute(f'PRAGMA {pragma} = {value}')
+		cursor.close()
+
+	def _compiled(self, k):
+		"""Return the compiled statement for the query ``k``, and how to
+		run it through the DBAPI directly, if I can
+
+		The latter is a pair of the SQL string and a list of
+		``(column index, bind processor)`` pairs, or ``None``.
+
+		"""
+		try:
+			return self._compiled_cache[k]
+		except KeyError:
+			pass
 		statement = self.sql[k].compile(dialect=self.engine.dialect)
+		raw = None
+		procs = _bind_processors(statement)
+		if (self.engine.dialect.name == 'sqlite'
+			and (getattr(statement, 'isinsert', False)
+					or getattr(statement, 'isupdate', False)
+					or getattr(statement, 'isdelete', False))
+			and getattr(statement, 'positiontup', None)
+			and self.engine.dialect.paramstyle == 'qmark'
+			and procs is not None):
+			raw = (statement.string, [(i, procs[name])
+										for (i, name) in enumerate(
+											statement.positiontup)
+										if procs.get(name) is not None])
+		self._compiled_cache[k] = statement, raw
+		return statement, raw
+
+	def _raw_execute(self, statement, sql, procs, largs, many):
+		if procs:
+			if many:
+				largs = list(map(list, largs))
+				for larg in largs:
+					for i, proc in procs:
+						larg[i] = proc(larg[i])
+			else:
+				largs = list(largs)
+				for i, proc in procs:
+					largs[i] = proc(largs[i])
+		cursor = self.connection.connection.cursor()
+		try:
+			if many:
+				cursor.executemany(sql, largs)
+			else:
+				cursor.execute(sql, largs)
+		except sqlite3.Error as ex:
+			raise DBAPIError.instance(sql,
+										largs,
+										ex,
+										sqlite3.Error,
+										dialect=self.engine.dialect,
+										ismulti=many) from ex
+		finally:
+			cursor.close()
+
+	def call_one(self, k, *largs):
+		statement, raw = self._compiled(k)
+		if raw is not None:
+			self._raw_execute(statement, *raw, largs, False)
+			return
 		if hasattr(statement, 'positiontup'):
 			return self.connection.execute(
 				statement, dict(zip(statement.positiontup, largs)))
@@ -208,10 +575,33 @@ class ConnectionHolder:
 		return self.connection.execute(self.sql[k])
 
 	def call_many(self, k, largs):
-		statement = self.sql[k].compile(dialect=self.engine.dialect)
-		return self.connection.execute(
-			statement,
-			[dict(zip(statement.positiontup, larg)) for larg in largs])
+		statement, raw = self._compiled(k)
+		if raw is None:
+			return self.connection.execute(
+				statement,
+				[dict(zip(statement.positiontup, larg)) for larg in largs])
+		self._raw_execute(statement, *raw, largs, True)
+
+	def stream(self, k, largs, outq, chunk_size):
+		"""Put the results of a query into ``outq`` a chunk at a time
+
+		Then put ``None``. If something goes wrong, put the exception
+		before that.
+
+		"""
+		try:
+			statement, _ = self._compiled(k)
+			res = self.connection.execution_options(
+				stream_results=True).execute(
+					statement, dict(zip(statement.positiontup, largs)))
+			while True:
+				chunk = res.fetchmany(chunk_size)
+				if not chunk:
+					break
+				outq.put(chunk)
+		except Exception as ex:
+			outq.put(ex)
+		outq.put(None)
 
 	def initdb(self):
 		"""Create tables and indices as needed."""
@@ -224,12 +614,58 @@ class ConnectionHolder:
 				pass
 			except Exception as ex:
 				return ex
+		self.init_indices()
 		self.commit()
 
+	def init_indices(self):
+		"""Create any indices that are missing and whose tables exist"""
+		for k in self.sql:
+			if k.startswith('index_'):
+				try:
+					self.call_one(k)
+				except OperationalError:
+					pass
+
 
 class QueryEngine(object):
 	flush_edges_t = 0
 	holder_cls = ConnectionHolder
+	keyframe_chunk_size = 4096
+	"""How many entities to compress together in stored keyframes"""
+	flush_queue_size = 64
+	"""How many batches of work the database thread may fall behind by
+
+	When it's this far behind, ``flush`` waits for it to catch up.
+
+	"""
+	reader_connections = 4
+	"""How many read-only connections to keep for historical queries
+
+	They only get used for SQLite databases in files, in write-ahead
+	logging mode. Queries about a window of time that had been written
+	when last committed may use them while other writes are pending;
+	other queries only when everything has been committed. Otherwise,
+	the one connection that does the writing runs the queries too.
+	Set to 0 to always use that one.
+
+	"""
+	stream_chunk_size = 1024
+	"""How many rows at a time to fetch in ``call_stream``"""
+	keyframe_delta_chain = 8
+	"""How many keyframes of a graph in a row may be stored as deltas
+
+	Each is stored as the difference from the keyframe of the same graph
+	stored before it. After this many, I store a complete one again.
+	Set to 0 to always store complete keyframes.
+
+	"""
+	keyframe_delta_bases = 16
+	"""How many graphs' latest keyframes to keep, to make deltas from
+
+	The least recently keyframed graphs get dropped first. The next
+	keyframe of a graph I've dropped gets stored complete.
+
+	"""
 	tables = ('global', 'branches', 'turns', 'graphs', 'keyframes',
 				'graph_val', 'nodes', 'node_val', 'edges', 'edge_val', 'plans',
 				'plan_ticks', 'universals')
@@ -241,7 +677,7 @@ class QueryEngine(object):
 					unpack=None,
 					gather=None):
 		dbstring = dbstring or 'sqlite:///:memory:'
-		self._inq = Queue()
+		self._inq = WorkQueue(self.flush_queue_size)
 		self._outq = Queue()
 		self._holder = self.holder_cls(dbstring, connect_args, self._inq,
 										self._outq, self.tables, gather)
@@ -257,8 +693,76 @@ class QueryEngine(object):
 		self._nodes2set = []
 		self._edges2set = []
 		self._btts = set()
+		self._keyframe_bases = OrderedDict()
+		self._keyframes_packed = []
+		self._keyframe_packing_error = None
+		self._keyframe_packq = Queue()
 		self._t = Thread(target=self._holder.run, daemon=True)
 		self._t.start()
+		self._keyframe_packer = Thread(target=self._pack_keyframes_forever,
+										daemon=True)
+		self._keyframe_packer.start()
+		self._readers = None
+		self._readers_lock = Lock()
+		self._branch_ends = {}
+
+	def _get_readers(self):
+		"""Return an engine with a pool of read-only connections, if it's
+		safe to read from one now, else ``None``
+
+		"""
+		if not self._inq.clean:
+			return
+		return self._reader_engine()
+
+	def _reader_engine(self):
+		"""Return an engine with a pool of read-only connections, if this
+		database can have one, else ``None``
+
+		"""
+		if not self.reader_connections:
+			return
+		if self._readers is not None:
+			return self._readers or None
+		with self._readers_lock:
+			if self._readers is not None:
+				return self._readers or None
+			holder = self._holder
+			engine = getattr(holder, 'engine', None)
+			if engine is None:
+				return
+			url = engine.url
+			if (engine.dialect.name != 'sqlite' or url.database
+				in (None, '', ':memory:') or 'mode=memory' in str(url)
+				or holder.sqlite_pragmas.get('journal_mode') != 'wal'):
+				self._readers = False
+				return
+			readers = create_engine(url,
+									connect_args={
+										'check_same_thread':
+										False,
+										'cached_statements':
+										holder.sqlite_cached_statements
+									},
+									poolclass=QueuePool,
+									pool_size=self.reader_connections,
+									max_overflow=0)
+
+			def query_only(dbapi_connection, connection_record):
+				cursor = dbapi_connection.cursor()
+				cursor.execute('PRAGMA query_only = 1')
+				cursor.close()
+
+			event.listen(readers, 'connect', query_only)
+			self._readers = readers
+			return readers
+
+	def _read_one(self, readers, string, args):
+		statement, _ = self._holder._compiled(string)
+		with readers.connect() as conn:
+			return list(
+				conn.execute(statement, dict(zip(statement.positiontup,
+													args))))
 
 	def echo(self, string):
 		self._inq.put(('echo', string))
@@ -266,6 +770,10 @@ class QueryEngine(object):
 
 	def call_one(self, string, *args, **kwargs):
 		__doc__ = ConnectionHolder.call_one.__doc__
+		if string in self._inq.reads:
+			readers = self._get_readers()
+			if readers is not None:
+				return self._read_one(readers, string, args)
 		with self._holder.lock:
 			self._inq.put(('one', string, args, kwargs))
 			ret = self._outq.get()
@@ -273,6 +781,49 @@ class QueryEngine(object):
 			raise ret
 		return ret
 
+	def call_window(self, string, branch, turn_to, tick_to, *args):
+		"""Run a read-only query about a window of time in ``branch``,
+		ending at ``turn_to``, ``tick_to``
+
+		If the whole window had been written when last committed, a
+		read-only connection runs the query, even while later writes are
+		pending. Otherwise, I commit first.
+
+		"""
+		readers = self._reader_engine()
+		if readers is None:
+			return self.call_one(string, *args)
+		inq = self._inq
+		if not inq.clean and not (branch in inq.committed_ends and
+									(turn_to, tick_to)
+									< inq.committed_ends[branch]):
+			self.commit().result()
+		return self._read_one(readers, string, args)
+
+	def call_stream(self, string, *args):
+		"""Yield the rows of a query as they're fetched, a chunk at a time
+
+		The database thread waits for me to use up one chunk before
+		fetching more than the next, so that not too many rows are in
+		memory at once.
+
+		"""
+		chunks = Queue(2)
+		self._inq.put(
+			('stream', string, args, chunks, self.stream_chunk_size))
+		chunk = ()
+		try:
+			while True:
+				chunk = chunks.get()
+				if chunk is None:
+					return
+				if isinstance(chunk, Exception):
+					raise chunk
+				yield from chunk
+		finally:
+			while chunk is not None:
+				chunk = chunks.get()
+
 	def call_many(self, string, args):
 		__doc__ = ConnectionHolder.call_many.__doc__
 		with self._holder.lock:
@@ -285,8 +836,12 @@ class QueryEngine(object):
 	def execute(self, stmt):
 		if not isinstance(stmt, Select):
 			raise TypeError("Only select statements should be executed")
+		self.flush()
+		readers = self._get_readers()
+		if readers is not None:
+			with readers.connect() as conn:
+				return conn.execute(stmt).fetchall()
 		with self._holder.lock:
-			self.flush()
 			self._inq.put(stmt)
 			return self._outq.get()
 
@@ -295,27 +850,163 @@ class QueryEngine(object):
 		graph = self.pack(graph)
 		return self.call_one('graphs_insert', graph, branch, turn, tick, typ)
 
+	def _pack_keyframe(self, graph, branch, turn, tick, nodes, edges,
+						graph_val):
+		pack = self.pack
+		chunk_size = self.keyframe_chunk_size
+		bases = self._keyframe_bases
+		if graph in bases and bases[graph][0] < self.keyframe_delta_chain:
+			(chain, base, base_nodes, base_edges,
+				base_graph_val) = bases[graph]
+			ret = (pack_keyframe_delta(pack, base, base_nodes, nodes, 2,
+										chunk_size),
+					pack_keyframe_delta(pack, base, base_edges, edges, 3,
+										chunk_size),
+					pack_keyframe_section(pack, graph_val, 1, chunk_size))
+			chain += 1
+		else:
+			ret = (pack_keyframe_section(pack, nodes, 2, chunk_size),
+					pack_keyframe_section(pack, edges, 3, chunk_size),
+					pack_keyframe_section(pack, graph_val, 1, chunk_size))
+			chain = 0
+		bases.pop(graph, None)
+		if self.keyframe_delta_chain and self.keyframe_delta_bases:
+			while len(bases) >= self.keyframe_delta_bases:
+				bases.popitem(False)
+			bases[graph] = (chain, (branch, turn, tick),
+							flat_keyframe_section(nodes, 2),
+							flat_keyframe_section(edges, 3), graph_val)
+		return ret
+
+	def _pack_keyframes_forever(self):
+		packq = self._keyframe_packq
+		packed = self._keyframes_packed
+		pack = self.pack
+		pack_keyframe = self._pack_keyframe
+		while True:
+			kf = packq.get()
+			if kf is None:
+				packq.task_done()
+				return
+			graph, branch, turn, tick, nodes, edges, graph_val = kf
+			try:
+				packed.append((pack(graph), branch, turn, tick,
+								*pack_keyframe(graph, branch, turn, tick,
+												nodes, edges, graph_val)))
+			except Exception as ex:
+				self._keyframe_packing_error = ex
+			packq.task_done()
+
 	def keyframes_insert(self, graph, branch, turn, tick, nodes, edges,
 							graph_val):
-		graph, nodes, edges, graph_val = map(
-			self.pack, (graph, nodes, edges, graph_val))
-		return self.call_one('keyframes_insert', graph, branch, turn, tick,
-								nodes, edges, graph_val)
+		"""Save a keyframe at the next ``flush``
+
+		I copy it right away, but compress it in a background thread.
+
+		"""
+		self._keyframe_packq.put(
+			(graph, branch, turn, tick, _copy_section(nodes, 2),
+				_copy_section(edges, 3), dict(graph_val)))
 
 	def keyframes_insert_many(self, many):
+		"""Save keyframes at the next ``flush``
+
+		I copy them right away, but compress them in a background thread.
+
+		"""
+		put = self._keyframe_packq.put
+		for (graph, branch, turn, tick, nodes, edges, graph_val) in many:
+			put((graph, branch, turn, tick, _copy_section(nodes, 2),
+					_copy_section(edges, 3), dict(graph_val)))
+
+	def keyframes_copy_many(self, many):
+		"""Copy keyframes of graphs to later times, as they're stored
+
+		``many`` is an iterable of tuples of a graph's name, the time of
+		its keyframe, and the time to copy it to.
+
+		"""
 		pack = self.pack
-		return self.call_many('keyframes_insert', [
-			(pack(graph), branch, turn, tick, pack(nodes), pack(edges),
-				pack(graph_val))
-			for (graph, branch, turn, tick, nodes, edges, graph_val) in many
-		])
+		self._inq.put(('silent', 'many', 'keyframes_copy',
+						[(branch_to, turn_to, tick_to, pack(graph), branch,
+							turn, tick)
+							for (graph, branch, turn, tick, branch_to, turn_to,
+									tick_to) in many]))
+
+	def _flush_keyframes(self):
+		self._keyframe_packq.join()
+		if self._keyframe_packing_error is not None:
+			ex = self._keyframe_packing_error
+			self._keyframe_packing_error = None
+			raise ex
+		packed = self._keyframes_packed
+		if packed:
+			self._inq.put(('silent', 'many', 'keyframes_insert', packed[:]))
+			packed.clear()
+
+	def _resolve_keyframe_section(self, graph, section, data):
+		if not is_keyframe_delta(data):
+			return unpack_keyframe_section(self.unpack, data)
+		base, removed, changed = unpack_keyframe_delta(self.unpack, data)
+		return apply_keyframe_delta(
+			self.get_keyframe_section(graph, *base, section), removed,
+			changed, KEYFRAME_SECTION_DEPTH[section])
 
 	def keyframes_dump(self):
+		"""Iterate over every keyframe, with its deltas resolved
+
+		Each section gets decoded once, and is kept around only until the
+		last delta based on it has been resolved.
+
+		"""
 		unpack = self.unpack
-		for (graph, branch, turn, tick, nodes, edges,
-				graph_val) in self.call_one('keyframes_dump'):
-			yield unpack(graph), branch, turn, tick, unpack(nodes), unpack(
-				edges), unpack(graph_val)
+		sections = ('nodes', 'edges', 'graph_val')
+		raw = {}
+		# how many more times each section will be wanted: once to yield,
+		# and once for each delta based on it
+		uses = {}
+		for (graph, branch, turn, tick, *data) in self.call_one(
+			'keyframes_dump'):
+			kf = (unpack(graph), branch, turn, tick)
+			raw[kf] = dict(zip(sections, data))
+			for section, datum in zip(sections, data):
+				key = kf + (section, )
+				uses[key] = uses.get(key, 0) + 1
+				if is_keyframe_delta(datum):
+					base_key = (kf[0], *keyframe_delta_base(unpack, datum),
+								section)
+					uses[base_key] = uses.get(base_key, 0) + 1
+		memo = {}
+
+		def resolve(kf, section):
+			key = kf + (section, )
+			depth = KEYFRAME_SECTION_DEPTH[section]
+			if key in memo:
+				ret = memo[key]
+			else:
+				datum = raw[kf][section]
+				if is_keyframe_delta(datum):
+					base, removed, changed = unpack_keyframe_delta(
+						unpack, datum)
+					base_kf = (kf[0], *base)
+					if base_kf in raw:
+						base_section = resolve(base_kf, section)
+					else:
+						base_section = self.get_keyframe_section(
+							*base_kf, section)
+					ret = apply_keyframe_delta(base_section, removed,
+												changed, depth)
+				else:
+					ret = unpack_keyframe_section(unpack, datum)
+			uses[key] -= 1
+			if uses[key]:
+				memo[key] = ret
+				return _copy_section(ret, depth)
+			memo.pop(key, None)
+			return ret
+
+		for kf in raw:
+			yield kf + tuple(resolve(kf, section) for section in sections)
 
 	def keyframes_list(self):
 		unpack = self.unpack
@@ -323,13 +1014,29 @@ class QueryEngine(object):
 			yield unpack(graph), branch, turn, tick
 
 	def get_keyframe(self, graph, branch, turn, tick):
-		unpack = self.unpack
 		stuff = self.call_one('get_keyframe', self.pack(graph), branch, turn,
 								tick)
 		if not stuff:
 			return
 		nodes, edges, graph_val = stuff[0]
-		return unpack(nodes), unpack(edges), unpack(graph_val)
+		resolve = self._resolve_keyframe_section
+		return (resolve(graph, 'nodes', nodes), resolve(graph, 'edges', edges),
+				resolve(graph, 'graph_val', graph_val))
+
+	def get_keyframe_section(self, graph, branch, turn, tick, section):
+		"""Get only one of the sections of a keyframe
+
+		``section`` is ``'nodes'``, ``'edges'``, or ``'graph_val'``.
+		Return ``None`` if there's no such keyframe.
+
+		"""
+		if section not in KEYFRAME_SECTION_DEPTH:
+			raise ValueError(f"Not a keyframe section: {section}")
+		stuff = self.call_one('get_keyframe_' + section, self.pack(graph),
+								branch, turn, tick)
+		if not stuff:
+			return
+		return self._resolve_keyframe_section(graph, section, stuff[0][0])
 
 	def graph_type(self, graph):
 		"""What type of graph is this?"""
@@ -411,6 +1118,7 @@ class QueryEngine(object):
 
 	def set_branch(self, branch, parent, parent_turn, parent_tick, end_turn,
 					end_tick):
+		self._branch_ends[branch] = (end_turn, end_tick)
 		try:
 			self.call_one('branches_insert', branch, parent, parent_turn,
 							parent_tick, end_turn, end_tick)
@@ -468,9 +1176,10 @@ class QueryEngine(object):
 			it = self.call_one('load_graph_val_tick_to_end', pack(graph),
 								branch, turn_from, turn_from, tick_from)
 		else:
-			it = self.call_one('load_graph_val_tick_to_tick', pack(graph),
-								branch, turn_from, turn_from, tick_from,
-								turn_to, turn_to, tick_to)
+			it = self.call_window('load_graph_val_tick_to_tick', branch,
+									turn_to, tick_to, pack(graph), branch,
+									turn_from, turn_from, tick_from, turn_to,
+									turn_to, tick_to)
 		for (key, turn, tick, value) in it:
 			yield graph, unpack(key), branch, turn, tick, unpack(value)
 
@@ -492,6 +1201,25 @@ class QueryEngine(object):
 		self._btts.add((branch, turn, tick))
 		self._graphvals2set.append((graph, key, branch, turn, tick, value))
 
+	def overwrite_pending(self, branch, turn, tick, value):
+		"""Replace the value of a graph, node, or edge stat not yet flushed
+
+		Return whether there was a pending row for that time.
+
+		"""
+		for rows in (self._nodevals2set, self._edgevals2set,
+						self._graphvals2set):
+			for i in range(len(rows) - 1, -1, -1):
+				row = rows[i]
+				if row[-4] != branch:
+					continue
+				if row[-3:-1] == (turn, tick):
+					rows[i] = row[:-1] + (value, )
+					return True
+				if row[-3:-1] < (turn, tick):
+					break
+		return False
+
 	def graph_val_del_time(self, branch, turn, tick):
 		self._flush_graph_val()
 		self.call_one('graph_val_del_time', branch, turn, tick)
@@ -562,9 +1290,10 @@ class QueryEngine(object):
 			it = self.call_one('load_nodes_tick_to_end', pack(graph), branch,
 								turn_from, turn_from, tick_from)
 		else:
-			it = self.call_one('load_nodes_tick_to_tick', pack(graph), branch,
-								turn_from, turn_from, tick_from, turn_to,
-								turn_to, tick_to)
+			it = self.call_window('load_nodes_tick_to_tick', branch,
+									turn_to, tick_to, pack(graph), branch,
+									turn_from, turn_from, tick_from, turn_to,
+									turn_to, tick_to)
 		for (node, turn, tick, extant) in it:
 			yield graph, unpack(node), branch, turn, tick, extant
 
@@ -593,9 +1322,10 @@ class QueryEngine(object):
 			it = self.call_one('load_node_val_tick_to_end', pack(graph),
 								branch, turn_from, turn_from, tick_from)
 		else:
-			it = self.call_one('load_node_val_tick_to_tick', pack(graph),
-								branch, turn_from, turn_from, tick_from,
-								turn_to, turn_to, tick_to)
+			it = self.call_window('load_node_val_tick_to_tick', branch,
+									turn_to, tick_to, pack(graph), branch,
+									turn_from, turn_from, tick_from, turn_to,
+									turn_to, tick_to)
 		for (node, key, turn, tick, value) in it:
 			yield graph, unpack(node), unpack(key), branch, turn, tick, unpack(
 				value)
@@ -649,13 +1379,19 @@ class QueryEngine(object):
 			it = self.call_one('load_edges_tick_to_end', pack(graph), branch,
 								turn_from, turn_from, tick_from)
 		else:
-			it = self.call_one('load_edges_tick_to_tick', pack(graph), branch,
-								turn_from, turn_from, tick_from, turn_to,
-								turn_to, tick_to)
+			it = self.call_window('load_edges_tick_to_tick', branch,
+									turn_to, tick_to, pack(graph), branch,
+									turn_from, turn_from, tick_from, turn_to,
+									turn_to, tick_to)
 		for (orig, dest, idx, turn, tick, extant) in it:
 			yield graph, unpack(orig), unpack(
 				dest), idx, branch, turn, tick, extant
 
+	def _pack_node2set(self, tup):
+		graph, node, branch, turn, tick, extant = tup
+		pack = self.pack
+		return pack(graph), pack(node), branch, turn, tick, bool(extant)
+
 	def _pack_edge2set(self, tup):
 		graph, orig, dest, idx, branch, turn, tick, extant = tup
 		pack = self.pack
@@ -709,13 +1445,25 @@ class QueryEngine(object):
 			it = self.call_one('load_edge_val_tick_to_end', pack(graph),
 								branch, turn_from, turn_from, tick_from)
 		else:
-			it = self.call_one('load_edge_val_tick_to_tick', pack(graph),
-								branch, turn_from, turn_from, tick_from,
-								turn_to, turn_to, tick_to)
+			it = self.call_window('load_edge_val_tick_to_tick', branch,
+									turn_to, tick_to, pack(graph), branch,
+									turn_from, turn_from, tick_from, turn_to,
+									turn_to, tick_to)
 		for (orig, dest, idx, key, turn, tick, value) in it:
 			yield graph, unpack(orig), unpack(dest), idx, unpack(
 				key), branch, turn, tick, unpack(value)
 
+	def _pack_graphval2set(self, tup):
+		graph, key, branch, turn, tick, value = tup
+		pack = self.pack
+		return pack(graph), pack(key), branch, turn, tick, pack(value)
+
+	def _pack_nodeval2set(self, tup):
+		graph, node, key, branch, turn, tick, value = tup
+		pack = self.pack
+		return pack(graph), pack(node), pack(key), branch, turn, tick, pack(
+			value)
+
 	def _pack_edgeval2set(self, tup):
 		graph, orig, dest, idx, key, branch, turn, tick, value = tup
 		pack = self.pack
@@ -761,51 +1509,92 @@ class QueryEngine(object):
 	def plan_ticks_dump(self):
 		return self.call_one('plan_ticks_dump')
 
+	def insert_many(self,
+					nodes=(),
+					node_val=(),
+					edges=(),
+					edge_val=(),
+					graph_val=()):
+		"""Queue lots of rows, each a tuple of arguments to a ``_set`` method
+
+		They go to the database on the next flush, with one
+		``executemany`` per table.
+
+		"""
+		btts = self._btts
+		for rows in (nodes, node_val, edges, edge_val, graph_val):
+			for row in rows:
+				btt = row[-4:-1]
+				if btt in btts:
+					raise TimeError
+				btts.add(btt)
+		self._nodes2set.extend(nodes)
+		self._nodevals2set.extend(node_val)
+		self._edges2set.extend(edges)
+		self._edgevals2set.extend(edge_val)
+		self._graphvals2set.extend(graph_val)
+
 	def flush(self):
-		"""Put all pending changes into the SQL transaction."""
-		pack = self.pack
+		"""Put all pending changes into the SQL transaction.
+
+		If an earlier flush failed on the database thread, raise its
+		exception.
+
+		"""
+		error = self._holder.error
+		if error is not None:
+			self._holder.error = None
+			raise error
 		put = self._inq.put
 		if self._nodes2set:
-			put(('silent', 'many', 'nodes_insert', [
-				(pack(graph), pack(node), branch, turn, tick, bool(extant))
-				for (graph, node, branch, turn, tick,
-						extant) in self._nodes2set
-			]))
+			put(('silent', 'many', 'nodes_insert', self._nodes2set,
+					self._pack_node2set))
 			self._nodes2set = []
 		if self._edges2set:
-			put(('silent', 'many', 'edges_insert',
-					list(map(self._pack_edge2set, self._edges2set))))
+			put(('silent', 'many', 'edges_insert', self._edges2set,
+					self._pack_edge2set))
 			self._edges2set = []
 		if self._graphvals2set:
-			put(('silent', 'many', 'graph_val_insert',
-					[(pack(graph), pack(key), branch, turn, tick, pack(value))
-						for (graph, key, branch, turn, tick,
-								value) in self._graphvals2set]))
+			put(('silent', 'many', 'graph_val_insert', self._graphvals2set,
+					self._pack_graphval2set))
 			self._graphvals2set = []
 		if self._nodevals2set:
-			put(('silent', 'many', 'node_val_insert',
-					[(pack(graph), pack(node), pack(key), branch, turn, tick,
-						pack(value)) for (graph, node, key, branch, turn, tick,
-											value) in self._nodevals2set]))
+			put(('silent', 'many', 'node_val_insert', self._nodevals2set,
+					self._pack_nodeval2set))
 			self._nodevals2set = []
 		if self._edgevals2set:
-			put(('silent', 'many', 'edge_val_insert',
-					list(map(self._pack_edgeval2set, self._edgevals2set))))
+			put(('silent', 'many', 'edge_val_insert', self._edgevals2set,
+					self._pack_edgeval2set))
 			self._edgevals2set = []
+		self._flush_keyframes()
 
-	def commit(self):
-		"""Commit the transaction"""
+	def commit(self) -> Future:
+		"""Commit the transaction
+
+		Return a ``Future`` that will be done when the database is.
+
+		"""
 		self.flush()
-		self._inq.put('commit')
+		fut = Future()
+		# nothing gets written to a branch before its end,
+		# so the windows up to here are done with
+		fut.ends = dict(self._branch_ends)
+		self._inq.put(('commit', fut))
+		return fut
 
 	def close(self):
 		"""Commit the transaction, then close the connection"""
-		self.flush()
-		assert self.echo('flushed') == 'flushed'
-		self._inq.put('shutdown')
-		self._holder.existence_lock.acquire()
-		self._holder.existence_lock.release()
-		self._t.join()
+		try:
+			self.commit().result()
+		finally:
+			self._inq.put('shutdown')
+			self._holder.existence_lock.acquire()
+			self._holder.existence_lock.release()
+			self._t.join()
+			self._keyframe_packq.put(None)
+			self._keyframe_packer.join()
+			if self._readers:
+				self._readers.dispose()
 
 	def initdb(self):
 		with self._holder.lock:
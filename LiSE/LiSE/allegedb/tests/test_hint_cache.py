@@ -0,0 +1,43 @@
+from ..cache import HintCache
+
+
+def test_evict_least_recently_used():
+	hints = HintCache(3)
+	hints['a', 'k', 'trunk', 0, 0] = 1
+	hints['b', 'k', 'trunk', 0, 0] = 2
+	hints['c', 'k', 'trunk', 0, 0] = 3
+	assert hints.get(('a', 'k', 'trunk', 0, 0)) == 1
+	hints['d', 'k', 'trunk', 0, 0] = 4
+	assert len(hints) == 3
+	assert ('b', 'k', 'trunk', 0, 0) not in hints
+	assert ('a', 'k', 'trunk', 0, 0) in hints
+	assert ('d', 'k', 'trunk', 0, 0) in hints
+
+
+def test_hits_and_misses():
+	hints = HintCache(8)
+	hints['a', 'k', 'trunk', 0, 0] = None
+	assert hints.get(('a', 'k', 'trunk', 0, 0), KeyError) is None
+	assert hints.get(('a', 'k', 'trunk', 0, 1), KeyError) is KeyError
+	assert hints.hits == 1
+	assert hints.misses == 1
+
+
+def test_remove_entity_and_branch():
+	hints = HintCache(None)
+	for char in 'abc':
+		for branch in ('trunk', 'other'):
+			for turn in range(5):
+				hints[char, 'k', branch, turn, 0] = turn
+	hints.remove_entity('a')
+	assert not any(k[0] == 'a' for k in hints)
+	assert len(hints) == 20
+	hints.remove_branch('other')
+	assert not any(k[-3] == 'other' for k in hints)
+	assert len(hints) == 10
+	hints.remove_entity('b')
+	assert set(hints) == {('c', 'k', 'trunk', turn, 0) for turn in range(5)}
+	hints.clear()
+	assert not hints
+	assert not hints._by_entity
+	assert not hints._by_branch
@@ -1,7 +1,11 @@
 import pytest
 import os
-from LiSE.allegedb import ORM
+import threading
+from LiSE.allegedb import ORM, query
+from LiSE.allegedb.query import (pack_keyframe_section,
+									unpack_keyframe_section)
 import networkx as nx
+from sqlalchemy import literal_column, select, text
 
 testgraphs = [nx.chvatal_graph()]
 # have to name it after creation because it clears the create_using
@@ -182,3 +186,457 @@ def test_keyframe_unload(tmpdbfile):
 		assert (1, 2) in g.nodes
 		assert ('g', (1, 1), (1, 2)) in orm._edges_cache.keyframe \
                            and 'trunk' in orm._edges_cache.keyframe['g', (1, 1), (1, 2)]
+
+
+def test_snap_keyframe_in_grandchild_branch(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		g = orm.new_digraph('g', nx.path_graph(4))
+		orm.turn = 1
+		g.graph['stat'] = 1
+		orm.branch = 'child'
+		orm.turn = 2
+		g.graph['stat'] = 2
+		orm.branch = 'grandchild'
+		orm.turn = 3
+		del g.node[3]
+		orm.snap_keyframe()
+		btt = orm._btt()
+		assert btt in orm._keyframes_times
+		assert orm._keyframes_times.latest(*btt) == btt[1:]
+		assert ('child', 2, orm._branches['grandchild'][2]
+				) in orm._keyframes_times
+		kf = orm._get_kf(*btt)
+		assert kf['graph_val']['g', ]['stat'] == 2
+		assert 3 not in kf['nodes']['g', ]
+		assert 2 in kf['nodes']['g', ]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 4096])
+def test_keyframe_section_format(chunk_size):
+	from ast import literal_eval
+	nodes = {n: {'n': n, 'half': n / 2} for n in range(10)}
+	nodes['empty'] = {}
+	edges = {0: {1: {'w': 1}, 2: {}}, (3, 3): {'x': {'w': None}}}
+	graph_val = {'name': 'g', 'stuff': [1, 2, 3]}
+	for section, depth in ((nodes, 2), (edges, 3), (graph_val, 1), ({}, 2)):
+		packed = pack_keyframe_section(repr, section, depth, chunk_size)
+		assert unpack_keyframe_section(literal_eval, packed) == section
+	assert unpack_keyframe_section(literal_eval, repr(nodes)) == nodes
+
+
+def test_get_keyframe_section(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		orm.new_digraph('g', nx.path_graph(3))
+		orm.graph['g'].graph['stat'] = 'x'
+		orm.snap_keyframe()
+		btt = orm._btt()
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		assert orm.query.get_keyframe_section('g', *btt,
+												'graph_val') == {
+													'stat': 'x'
+												}
+		assert set(orm.query.get_keyframe_section('g', *btt,
+													'nodes')) == {0, 1, 2}
+		assert orm.query.get_keyframe_section('g', *btt,
+												'edges')[1][2] == {}
+		assert orm.query.get_keyframe_section('nope', *btt, 'nodes') is None
+
+
+def test_delta_keyframes(tmpdbfile):
+	def build(chain):
+		with ORM('sqlite:///' + tmpdbfile) as orm:
+			orm.query.keyframe_delta_chain = chain
+			g = orm.new_digraph('g', nx.path_graph(5))
+			btts = []
+			for turn in range(1, 5):
+				orm.turn = turn
+				g.graph['turn'] = turn
+				del g.node[turn - 1]
+				g.add_node(turn + 10)
+				g.node[turn + 10]['hit'] = turn
+				g.add_edge(turn + 10, 4, weight=turn)
+				orm.snap_keyframe()
+				btts.append(orm._btt())
+			orm.flush()
+			deltas = sum(
+				query.is_keyframe_delta(row[4])
+				for row in orm.query.call_one('keyframes_dump'))
+		with ORM('sqlite:///' + tmpdbfile) as orm:
+			kfs = [orm.query.get_keyframe('g', *btt) for btt in btts]
+		return deltas, kfs
+
+	full_deltas, full = build(0)
+	assert full_deltas == 0
+	os.remove(tmpdbfile)
+	deltas, delta = build(2)
+	assert deltas >= 2
+	for (nodes, edges, graph_val), (dnodes, dedges, dgraph_val) in zip(
+		full, delta):
+		assert dnodes == nodes
+		assert dedges == edges
+		assert dgraph_val == graph_val
+
+
+def test_keyframes_dump_resolves_chain_once(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		orm.query.keyframe_delta_chain = 3
+		g = orm.new_digraph('g', nx.path_graph(5))
+		for turn in range(1, 6):
+			orm.turn = turn
+			g.add_edge(turn + 10, 4, weight=turn)
+			g.graph['turn'] = turn
+			orm.snap_keyframe()
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		expected = {}
+		for (graph, branch, turn, tick,
+				*_) in orm.query.call_one('keyframes_dump'):
+			graph = orm.query.unpack(graph)
+			expected[graph, branch, turn,
+						tick] = orm.query.get_keyframe(graph, branch, turn, tick)
+		looked_up = []
+		get_section = orm.query.get_keyframe_section
+		orm.query.get_keyframe_section = lambda *args: looked_up.append(
+			args) or get_section(*args)
+		dumped = {(graph, branch, turn, tick): (nodes, edges, graph_val)
+					for (graph, branch, turn, tick, nodes, edges,
+							graph_val) in orm.query.keyframes_dump()}
+		assert not looked_up
+		assert dumped == expected
+
+
+def test_keyframe_delta_bases_bounded(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		orm.query.keyframe_delta_bases = 2
+		graphs = [
+			orm.new_digraph(name, nx.path_graph(3)) for name in 'abc'
+		]
+		for turn in range(1, 4):
+			orm.turn = turn
+			for g in graphs:
+				g.graph['turn'] = turn
+			orm.snap_keyframe()
+			orm.flush()
+			assert len(orm.query._keyframe_bases) <= 2
+		assert list(orm.query._keyframe_bases) == ['b', 'c']
+		for g in graphs:
+			assert orm.query.get_keyframe_section(g.name, *orm._btt(),
+													'graph_val') == {
+														'turn': 3
+													}
+
+
+def test_keyframes_packed_in_background(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		g = orm.new_digraph('g', nx.path_graph(3))
+		orm.turn = 1
+		g.node[0]['x'] = 1
+		orm.snap_keyframe()
+		assert not orm._new_keyframes
+		nodes = {0: {'x': 1}}
+		orm.query.keyframes_insert('g', 'trunk', 2, 0, nodes, {}, {})
+		nodes[0]['x'] = 2
+		orm.query._keyframe_packq.join()
+		assert orm.query._keyframes_packed
+		orm.flush()
+		assert not orm.query._keyframes_packed
+		assert orm.query.get_keyframe_section('g', 'trunk', 2, 0,
+												'nodes') == {
+													0: {
+														'x': 1
+													}
+												}
+		assert orm.query.get_keyframe_section('g', *orm._btt(),
+												'nodes')[0]['x'] == 1
+
+
+def test_compiled_statement_cache(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		g = orm.new_digraph('g', {})
+		g.add_nodes_from(range(5))
+		orm.turn = 1
+		g.remove_node(4)
+		orm.flush()
+		orm.query.echo('flushed')  # wait for the statements to run
+		compiled = orm.query._holder._compiled_cache
+		statement, raw = compiled['nodes_insert']
+		assert raw is not None
+		g.add_node(5)
+		orm.flush()
+		orm.query.echo('flushed')  # wait for the statements to run
+		assert compiled['nodes_insert'][0] is statement
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		assert set(orm.graph['g'].node) == {0, 1, 2, 3, 5}
+		orm.turn = 0
+		assert set(orm.graph['g'].node) == {0, 1, 2, 3, 4}
+
+
+def test_native_sqlite(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		assert orm.query.call_one('global_get', orm.query.pack('main_branch'))
+		orm.query.globl['x'] = 1
+		orm.query.globl['x'] = 2  # integrity error on insert, then update
+		assert orm.query.globl['x'] == 2
+		holder = orm.query._holder
+		assert holder._compiled_cache['global_insert'][1] is not None
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		assert orm.query.globl['x'] == 2
+		journal_mode = orm.query.execute(select(
+			literal_column('journal_mode')).select_from(
+				text('pragma_journal_mode')))
+		assert journal_mode == [('wal', )]
+
+
+def test_native_sqlite_fallback(tmpdbfile, monkeypatch):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		holder = orm.query._holder
+		orm.query.echo('ready')
+		monkeypatch.setattr(query, '_bind_processors', lambda statement: None)
+		holder._compiled_cache.clear()
+		orm.query.globl['x'] = 1
+		orm.query.globl['x'] = 2
+		assert orm.query.globl['x'] == 2
+		assert holder._compiled_cache['global_insert'][1] is None
+
+
+def test_flush_packs_on_database_thread(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		assert orm.query._inq.maxsize == orm.query.flush_queue_size
+		packed_in = set()
+		pack = orm.query.pack
+
+		def recording_pack(obj):
+			packed_in.add(threading.current_thread())
+			return pack(obj)
+
+		orm.query.pack = recording_pack
+		g = orm.new_digraph('g', {})
+		g.add_node(0)
+		g.node[0]['x'] = 1
+		packed_in.clear()
+		fut = orm.query.commit()
+		assert threading.current_thread() not in packed_in
+		assert fut.result(timeout=10) is None
+		assert orm.query._t in packed_in
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		assert orm.graph['g'].node[0]['x'] == 1
+
+
+class Unpackable:
+
+	def __repr__(self):
+		raise TypeError("can't pack this")
+
+
+def test_flush_errors_reported(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		g = orm.new_digraph('g', {})
+		g.add_node(0)
+		g.add_node(1)
+		g.node[0]['good'] = 1
+		g.node[1]['bad'] = Unpackable()
+		with pytest.raises(TypeError):
+			orm.commit(unload=False).result(timeout=10)
+		g.node[1]['bad'] = Unpackable()
+		orm.query.flush()
+		orm.query.echo('flushed')
+		with pytest.raises(TypeError):
+			orm.query.flush()
+		assert orm.commit(unload=False).result(timeout=10) is None
+
+
+def test_read_only_connections(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		g = orm.new_digraph('g', {})
+		g.add_node(0)
+		orm.turn = 1
+		g.add_node(1)
+		orm.flush()
+		assert not orm.query._inq.clean
+		assert orm.query._get_readers() is None
+		assert {(node, turn) for (_, node, _, turn, _, _) in orm.query.call_one(
+			'nodes_dump')} == {('0', 0), ('1', 1)}
+		orm.commit(unload=False).result()
+		assert orm.query._inq.clean
+		readers = orm.query._get_readers()
+		assert readers is not None
+		assert len(orm.query.call_one('nodes_dump')) == 2
+		assert readers.pool.checkedin() == 1
+		g.add_node(2)
+		orm.flush()
+		assert orm.query._get_readers() is None
+		assert len(orm.query.call_one('nodes_dump')) == 3
+
+
+def test_committed_windows_read_while_writes_pending(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		g = orm.new_digraph('g', {})
+		g.add_node(0)
+		orm.turn = 1
+		g.add_node(1)
+		g.graph['x'] = 1
+		orm.commit(unload=False).result()
+		orm.turn = 2
+		g.add_node(2)
+		orm.flush()
+		assert not orm.query._inq.clean
+		assert orm.query._get_readers() is None
+		readers = orm.query._reader_engine()
+		assert readers is not None
+		assert {
+			node
+			for (_, node, _, _, _, _) in orm.query.load_nodes(
+				'g', 'trunk', 0, 0, 1, 1)
+		} == {0, 1}
+		assert readers.pool.checkedin() == 1
+		assert not orm.query._inq.clean
+		# this one includes writes that haven't been committed yet
+		assert {
+			node
+			for (_, node, _, _, _, _) in orm.query.load_nodes(
+				'g', 'trunk', 0, 0, 2, orm.tick)
+		} == {0, 1, 2}
+		assert orm.query._inq.clean
+
+
+def test_window_loads_use_indices(tmpdbfile):
+	from LiSE.allegedb.alchemy import explain_query_plans, full_scans
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		engine = orm.query._holder.engine
+		plans = explain_query_plans(engine)
+	for k, details in plans.items():
+		if k.startswith('load_'):
+			assert all('_window_idx' in detail for detail in details), k
+	assert not [
+		k for k in full_scans(plans) if k.startswith(('load_', 'get_'))
+	]
+
+
+def test_stream_rows(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		orm.query.stream_chunk_size = 2
+		g = orm.new_digraph('g', {})
+		g.add_nodes_from(range(5))
+		orm.flush()
+		assert len(list(orm.query.call_stream('nodes_dump'))) == 5
+		stream = orm.query.call_stream('nodes_dump')
+		next(stream)
+		stream.close()  # must not leave the database thread waiting
+		assert len(orm.query.call_one('nodes_dump')) == 5
+
+
+def test_cache_load_stream(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		orm.new_digraph('g', {})
+		orm.branch = 'aaa'  # sorts before trunk
+		orm.turn = 1
+		orm.branch = 'aab'
+		orm.turn = 2
+		orm.branch = 'trunk'
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		cache = orm._graph_val_cache
+
+		def rows():
+			yield 'g', 'k', 'aab', 2, 0, 'grandchild'
+			yield 'g', 'k', 'trunk', 0, 0, 'trunk'
+
+		cache.load(rows())
+		assert cache.retrieve('g', 'k', 'trunk', 0, 0) == 'trunk'
+		assert cache.retrieve('g', 'k', 'aaa', 1, 0) == 'trunk'
+		assert cache.retrieve('g', 'k', 'aab', 2, 0) == 'grandchild'
+
+
+def test_load_rows_of_new_branch(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		orm.new_digraph('g', {})
+		orm.turn = 1
+		orm.branch = 'child'
+		assert 'child' in orm._childbranch['trunk']
+		assert 'trunk' not in orm._childbranch['child']
+		orm.turn = 2
+		cache = orm._graph_val_cache
+		cache.load([('g', 'k', 'trunk', 0, 0, 'trunk'),
+					('g', 'k', 'child', 2, 0, 'child')])
+		assert cache.retrieve('g', 'k', 'child', 1, 0) == 'trunk'
+		assert cache.retrieve('g', 'k', 'child', 2, 0) == 'child'
+
+
+def test_coalescing(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		g = orm.new_digraph('g')
+		g.add_edge(0, 1)
+		orm.turn = 1
+		tick0 = orm.tick
+		with orm.coalescing():
+			for i in range(10):
+				g.nodes[0]['n'] = i
+				g.edges[0, 1]['e'] = i
+				g.graph['g'] = i
+				assert g.nodes[0]['n'] == g.edges[0, 1]['e'] == i
+			assert orm.tick == tick0 + 3
+			g.nodes[1]['n'] = 'x'
+			del g.nodes[1]['n']
+			g.nodes[1]['n'] = 'y'
+		assert orm.tick == tick0 + 6
+		g.nodes[0]['n'] = 'after'
+		assert orm.tick == tick0 + 7
+		delta = orm.get_delta('trunk', 1, tick0, 1, orm.tick)
+		assert delta['g']['node_val'][0]['n'] == 'after'
+		assert delta['g']['edge_val'][0][1]['e'] == 9
+		assert delta['g']['g'] == 9
+		orm.tick = tick0 + 1
+		assert g.nodes[0]['n'] == 9
+		orm.tick = tick0 + 7
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		g = orm.graph['g']
+		assert g.graph['g'] == 9
+		assert g.edges[0, 1]['e'] == 9
+		assert g.nodes[1]['n'] == 'y'
+		assert g.nodes[0]['n'] == 'after'
+		orm.tick = orm.tick - 1
+		assert g.nodes[0]['n'] == 9
+
+
+def test_bulk_add(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		g = orm.new_digraph('g')
+		g.add_node(0, n=-1)
+		orm.turn = 1
+		tick0 = orm.tick
+		g.add_nodes_from([0, (1, {'n': 1}), 2], m=0)
+		# new nodes 1 and 2, then stats n, m, m, m
+		assert orm.tick == tick0 + 6
+		assert g.nodes[0]['n'] == -1
+		assert g.nodes[1]['n'] == 1
+		assert g.nodes[2]['m'] == 0
+		g.add_edges_from([(0, 1), (1, 3, {'e': 1})], f=0)
+		# new node 3, edges 0->1 and 1->3, then stats f, e, f
+		assert orm.tick == tick0 + 12
+		assert set(g.nodes) == {0, 1, 2, 3}
+		assert g.edges[1, 3]['e'] == 1
+		assert 0 in g.pred[1]
+		delta = orm.get_delta('trunk', 1, tick0, 1, orm.tick)
+		assert delta['g']['nodes'] == {1: True, 2: True, 3: True}
+		assert delta['g']['edge_val'][1][3] == {'e': 1, 'f': 0}
+		orm.tick = tick0 + 2
+		assert set(g.nodes) == {0, 1, 2}
+		assert 'm' not in g.nodes[0]
+		orm.tick = tick0 + 12
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		g = orm.graph['g']
+		assert set(g.nodes) == {0, 1, 2, 3}
+		assert dict(g.nodes[0]) == {'n': -1, 'm': 0}
+		assert dict(g.edges[0, 1]) == {'f': 0}
+		assert g.edges[1, 3]['e'] == 1
+
+
+def test_bulk_add_rejects_none(tmpdbfile):
+	with ORM('sqlite:///' + tmpdbfile) as orm:
+		g = orm.new_digraph('g')
+		orm.turn = 1
+		tick0 = orm.tick
+		with pytest.raises(ValueError):
+			g.add_nodes_from([0, (1, {'x': None})])
+		with pytest.raises(ValueError):
+			g.add_edges_from([(0, 1, {'e': 1}), (1, 2, {'e': None})])
+		assert orm.tick == tick0
+		assert not g.nodes
@@ -1,4 +1,5 @@
-from ..window import WindowDict
+from ..window import (WindowDict, ArrayWindowDict, ArrayTurnDict,
+						ArraySettingsTurnDict, KeyframeIndex)
 from .. import HistoricKeyError, ORM
 from itertools import cycle
 import pytest
@@ -19,9 +20,9 @@ for k, v in zip(range(100), cycle(testvs)):
 		testdata.append((k, vv))
 
 
-@pytest.fixture
-def windd():
-	return WindowDict(testdata)
+@pytest.fixture(params=[WindowDict, ArrayWindowDict])
+def windd(request):
+	return request.param(testdata)
 
 
 def test_keys(windd):
@@ -87,8 +88,24 @@ def test_future(windd):
 		assert item[1] not in windd.future().values()
 
 
-def test_empty():
-	empty = WindowDict()
+@pytest.mark.parametrize('cls', [WindowDict, ArrayWindowDict])
+def test_views_follow_seeks(cls):
+	windd = cls({0: 'a', 5: 'b', 10: 'c'})
+	windd[5]
+	past = windd.past()
+	future = windd.future()
+	windd[7] = 'x'
+	assert dict(future) == {10: 'c'}
+	assert list(past) == [7, 5, 0]
+	assert past[7] == 'x'
+	windd[0]
+	assert list(future) == [5, 7, 10]
+	assert len(past) == 1
+
+
+@pytest.mark.parametrize('cls', [WindowDict, ArrayWindowDict])
+def test_empty(cls):
+	empty = cls()
 	items = empty.items()
 	past = empty.past()
 	future = empty.future()
@@ -135,8 +152,9 @@ def test_del(windd):
 		windd[1]
 
 
-def test_set():
-	wd = WindowDict()
+@pytest.mark.parametrize('cls', [WindowDict, ArrayWindowDict])
+def test_set(cls):
+	wd = cls()
 	assert 0 not in wd
 	wd[0] = 'foo'
 	assert 0 in wd
@@ -168,3 +186,44 @@ def test_set():
 		wd[5] = g.node[5]['ham']
 		assert wd[5] == {'spam': 'beans'}
 		assert wd[5] == g.node[5]['ham']
+
+
+def test_array_turn_dicts():
+	turns = ArrayTurnDict()
+	turns[0] = {0: 'a', 1: 'b'}
+	turns[2] = {0: 'c'}
+	assert turns[1][5] == 'b'
+	with pytest.raises(HistoricKeyError):
+		turns[1] = {0: 'z'}
+	with pytest.raises(HistoricKeyError):
+		turns[2][-1] = 'z'
+	settings = ArraySettingsTurnDict()
+	settings.store_at(3, 1, 'x')
+	settings.store_at(3, 5, 'y')
+	settings.store_at(1, 0, 'w')
+	assert settings.retrieve(2, 100) == 'w'
+	assert settings.retrieve(3, 2) == 'x'
+	assert settings.retrieve(4, 0) == 'y'
+	assert settings.retrieve_exact(3, 5) == 'y'
+	with pytest.raises(KeyError):
+		settings.retrieve_exact(3, 2)
+	with pytest.raises(KeyError):
+		settings.retrieve(0, 0)
+
+
+def test_keyframe_index():
+	kfs = KeyframeIndex([('trunk', 5, 0), ('trunk', 0, 0), ('trunk', 5, 3),
+							('branch', 7, 1)])
+	kfs.add(('trunk', 5, 0))
+	assert len(kfs) == 4
+	assert ('trunk', 5, 3) in kfs
+	assert ('trunk', 5, 2) not in kfs
+	assert kfs.times('trunk') == [(0, 0), (5, 0), (5, 3)]
+	assert kfs.latest('trunk', 5, 2) == (5, 0)
+	assert kfs.latest('trunk', 5, 3) == (5, 3)
+	assert kfs.earliest_after('trunk', 5, 0) == (5, 3)
+	assert kfs.earliest_after('trunk', 6, 0) is None
+	assert kfs.latest('branch', 7, 0) is None
+	kfs.discard(('branch', 7, 1))
+	assert set(kfs) == {('trunk', 0, 0), ('trunk', 5, 0), ('trunk', 5, 3)}
+	assert list(kfs.branches()) == ['trunk']
@@ -19,8 +19,13 @@ a key that isn't set will get the highest set key that is lower than the key
 you asked for (and thus, keys must be orderable). It is optimized for retrieval
 of the same key and neighboring ones repeatedly and in sequence.
 
+ArrayWindowDict does the same for integer keys with binary search, for
+when lookups jump around in time.
+
 """
 from abc import abstractmethod, ABC
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import deque
 from collections.abc import Mapping, MutableMapping, KeysView, ItemsView, ValuesView
 from itertools import chain
@@ -795,3 +800,529 @@ class SettingsTurnDict(WindowDict):
 			self[turn][tick] = value
 		else:
 			self[turn] = {tick: value}
+
+
+def _array_span(dic: 'ArrayWindowDict', slic: slice) -> Tuple[int, int]:
+	"""Return the indices in ``dic`` that a stepless slice covers"""
+	revs = dic._revs
+	start, stop = slic.start, slic.stop
+	if start is None:
+		if stop is None:
+			return 0, len(revs)
+		return 0, bisect_left(revs, stop)
+	if stop is None:
+		return bisect_left(revs, start), len(revs)
+	if start < stop:
+		return bisect_left(revs, start), bisect_left(revs, stop)
+	return bisect_right(revs, stop), bisect_right(revs, start)
+
+
+class ArrayWindowDictSlice:
+	"""A slice of an :class:`ArrayWindowDict`, earliest first"""
+	__slots__ = ['dic', 'slic']
+	dic: 'ArrayWindowDict'
+	slic: slice
+
+	def __init__(self, dic: 'ArrayWindowDict', slic: slice):
+		self.dic = dic
+		self.slic = slic
+
+	def __reversed__(self) -> Iterable[Any]:
+		return iter(ArrayWindowDictReverseSlice(self.dic, self.slic))
+
+	def __iter__(self):
+		dic = self.dic
+		if not dic:
+			return
+		slic = self.slic
+		if slic.step is not None:
+			for i in range(slic.start or dic.beginning, slic.stop
+							or dic.end + 1, slic.step):
+				yield dic[i]
+			return
+		if slic.start is not None and slic.start == slic.stop:
+			yield dic[slic.stop]
+			return
+		with dic._lock:
+			lo, hi = _array_span(dic, slic)
+			vals = dic._vals[lo:hi]
+		yield from vals
+
+
+class ArrayWindowDictReverseSlice:
+	"""A slice of an :class:`ArrayWindowDict`, latest first"""
+	__slots__ = ['dict', 'slice']
+
+	def __init__(self, dict: 'ArrayWindowDict', slic: slice):
+		self.dict = dict
+		self.slice = slic
+
+	def __reversed__(self):
+		return iter(ArrayWindowDictSlice(self.dict, self.slice))
+
+	def __iter__(self):
+		dic = self.dict
+		if not dic:
+			return
+		slic = self.slice
+		if slic.step is not None:
+			for i in range(slic.start or dic.end, slic.stop or dic.beginning,
+							slic.step):
+				yield dic[i]
+			return
+		if slic.start is not None and slic.start == slic.stop:
+			yield dic[slic.stop]
+			return
+		with dic._lock:
+			lo, hi = _array_span(dic, slic)
+			vals = dic._vals[lo:hi]
+		yield from reversed(vals)
+
+
+class ArrayWindowDictItemsView(ItemsView):
+	"""Look through the items of an :class:`ArrayWindowDict` or its views"""
+
+	def __iter__(self):
+		return self._mapping._iter_items()
+
+
+class ArrayWindowDictValuesView(ValuesView):
+	"""Look through the values of an :class:`ArrayWindowDict` or its views"""
+
+	def __iter__(self):
+		return self._mapping._iter_values()
+
+
+class ArrayWindowDictPastFutureView(ABC, Mapping):
+	"""Abstract class for historical views on ArrayWindowDict
+
+	Like the views on :class:`WindowDict`, these split the history at
+	whatever revision was last looked up when they're used, not when
+	they were made.
+
+	"""
+	__slots__ = ('_dict', )
+
+	def __init__(self, dic: 'ArrayWindowDict'):
+		self._dict = dic
+
+	@abstractmethod
+	def _span(self) -> Tuple[int, int]:
+		"""Return the indices of the revisions I cover, stop exclusive"""
+
+	@abstractmethod
+	def _indices(self) -> Iterable[int]:
+		pass
+
+	def __len__(self) -> int:
+		start, stop = self._span()
+		return stop - start
+
+	def __iter__(self) -> Iterable[int]:
+		revs = self._dict._revs
+		for i in self._indices():
+			yield revs[i]
+
+	def _iter_items(self):
+		revs = self._dict._revs
+		vals = self._dict._vals
+		for i in self._indices():
+			yield revs[i], vals[i]
+
+	def _iter_values(self):
+		vals = self._dict._vals
+		for i in self._indices():
+			yield vals[i]
+
+	def __getitem__(self, key: int) -> Any:
+		start, stop = self._span()
+		if start >= stop:
+			raise KeyError
+		revs = self._dict._revs
+		i = bisect_left(revs, key, start, stop)
+		if i < stop and revs[i] == key:
+			return self._dict._vals[i]
+		raise KeyError
+
+	def items(self) -> ArrayWindowDictItemsView:
+		return ArrayWindowDictItemsView(self)
+
+	def values(self) -> ArrayWindowDictValuesView:
+		return ArrayWindowDictValuesView(self)
+
+
+class ArrayWindowDictPastView(ArrayWindowDictPastFutureView):
+	"""Read-only mapping of just the past of an ArrayWindowDict
+
+	Iterates latest first, like :class:`WindowDictPastView`.
+
+	"""
+
+	def _span(self) -> Tuple[int, int]:
+		with self._dict._lock:
+			return 0, self._dict._bound()
+
+	def _indices(self) -> Iterable[int]:
+		start, stop = self._span()
+		return range(stop - 1, start - 1, -1)
+
+
+class ArrayWindowDictFutureView(ArrayWindowDictPastFutureView):
+	"""Read-only mapping of just the future of an ArrayWindowDict
+
+	Iterates earliest first, like :class:`WindowDictFutureView`.
+
+	"""
+
+	def _span(self) -> Tuple[int, int]:
+		dic = self._dict
+		with dic._lock:
+			return dic._bound(), len(dic._revs)
+
+	def _indices(self) -> Iterable[int]:
+		return range(*self._span())
+
+
+class ArrayWindowDict(MutableMapping):
+	"""A :class:`WindowDict` for integer revisions, kept in a sorted array.
+
+	Revisions go in an ``array('q')``, with the values in a parallel
+	list. Every lookup is a binary search, so jumping far back or forth
+	in time costs no more than looking up a neighboring revision.
+
+	The interface is the same as :class:`WindowDict`, including the
+	``past`` and ``future`` views and slicing.
+
+	"""
+	__slots__ = ('_revs', '_vals', '_last', '_lock')
+
+	_revs: array
+	_vals: list
+	_last: Optional[int]
+
+	@property
+	def beginning(self) -> Optional[int]:
+		if not self._revs:
+			return None
+		return self._revs[0]
+
+	@property
+	def end(self) -> Optional[int]:
+		if not self._revs:
+			return None
+		return self._revs[-1]
+
+	def _bound(self) -> int:
+		"""Return the index of the first revision after the last looked up"""
+		if self._last is None:
+			return len(self._revs)
+		return bisect_right(self._revs, self._last)
+
+	def future(self, rev: int = None) -> ArrayWindowDictFutureView:
+		"""Return a Mapping of items after the given revision.
+
+		Default revision is the last one looked up.
+
+		"""
+		if rev is not None:
+			with self._lock:
+				self._last = rev
+		return ArrayWindowDictFutureView(self)
+
+	def past(self, rev: int = None) -> ArrayWindowDictPastView:
+		"""Return a Mapping of items at or before the given revision.
+
+		Default revision is the last one looked up.
+
+		"""
+		if rev is not None:
+			with self._lock:
+				self._last = rev
+		return ArrayWindowDictPastView(self)
+
+	def _seek(self, rev: int) -> None:
+		"""Remember ``rev`` as the default for ``past`` and ``future``"""
+		self._last = rev
+
+	def rev_gettable(self, rev: int) -> bool:
+		revs = self._revs
+		return bool(revs) and rev >= revs[0]
+
+	def rev_before(self, rev: int):
+		"""Return the latest past rev on which the value changed."""
+		with self._lock:
+			self._last = rev
+			i = bisect_right(self._revs, rev)
+			if i:
+				return self._revs[i - 1]
+
+	def rev_after(self, rev: int):
+		"""Return the earliest future rev on which the value will change."""
+		with self._lock:
+			self._last = rev
+			revs = self._revs
+			i = bisect_right(revs, rev)
+			if i < len(revs):
+				return revs[i]
+
+	def initial(self) -> Any:
+		"""Return the earliest value we have"""
+		if not self._vals:
+			raise KeyError("No data")
+		return self._vals[0]
+
+	def final(self) -> Any:
+		"""Return the latest value we have"""
+		if not self._vals:
+			raise KeyError("No data")
+		return self._vals[-1]
+
+	def truncate(self, rev: int, direction: Direction = 'forward') -> None:
+		"""Delete everything after the given revision, exclusive.
+
+		With direction='backward', delete everything before the revision,
+		exclusive, instead.
+
+		"""
+		with self._lock:
+			self._last = rev
+			if direction == 'forward':
+				i = bisect_right(self._revs, rev)
+				del self._revs[i:]
+				del self._vals[i:]
+			elif direction == 'backward':
+				i = bisect_left(self._revs, rev)
+				del self._revs[:i]
+				del self._vals[:i]
+			else:
+				raise ValueError("Need direction 'forward' or 'backward'")
+
+	def _iter_items(self):
+		return zip(self._revs, self._vals)
+
+	def _iter_values(self):
+		return iter(self._vals)
+
+	def items(self) -> ArrayWindowDictItemsView:
+		return ArrayWindowDictItemsView(self)
+
+	def values(self) -> ArrayWindowDictValuesView:
+		return ArrayWindowDictValuesView(self)
+
+	def __bool__(self) -> bool:
+		return bool(self._revs)
+
+	def copy(self):
+		with self._lock:
+			empty = self.__class__.__new__(self.__class__)
+			empty._revs = array('q', self._revs)
+			empty._vals = self._vals.copy()
+			empty._last = self._last
+			empty._lock = Lock()
+			return empty
+
+	def __init__(
+			self,
+			data: Union[List[Tuple[int, Any]], Dict[int, Any]] = None) -> None:
+		self._lock = Lock()
+		if not data:
+			data = {}
+		elif not isinstance(data, Mapping):
+			# assume it's a sequence of pairs
+			data = dict(data)
+		revs = sorted(data)
+		self._revs = array('q', revs)
+		self._vals = [data[rev] for rev in revs]
+		self._last = None
+
+	def __iter__(self) -> Iterable[int]:
+		yield from self._revs
+
+	def __contains__(self, item: int) -> bool:
+		revs = self._revs
+		try:
+			i = bisect_left(revs, item)
+		except TypeError:
+			return False
+		return i < len(revs) and revs[i] == item
+
+	def __len__(self) -> int:
+		return len(self._revs)
+
+	def __getitem__(self, rev: int) -> Any:
+		if isinstance(rev, slice):
+			if None not in (rev.start, rev.stop) and rev.start > rev.stop:
+				return ArrayWindowDictReverseSlice(self, rev)
+			return ArrayWindowDictSlice(self, rev)
+		with self._lock:
+			self._last = rev
+			i = bisect_right(self._revs, rev)
+			if not i:
+				raise HistoricKeyError(
+					"Revision {} is before the start of history".format(rev))
+			return self._vals[i - 1]
+
+	def __setitem__(self, rev: int, v: Any) -> None:
+		with self._lock:
+			self._last = rev
+			revs = self._revs
+			i = bisect_left(revs, rev)
+			if i < len(revs) and revs[i] == rev:
+				self._vals[i] = v
+			else:
+				revs.insert(i, rev)
+				self._vals.insert(i, v)
+
+	def __delitem__(self, rev: int) -> None:
+		if not self:
+			raise HistoricKeyError("Tried to delete from an empty WindowDict")
+		if not self.beginning <= rev <= self.end:
+			raise HistoricKeyError("Rev outside of history: {}".format(rev))
+		with self._lock:
+			self._last = rev
+			revs = self._revs
+			i = bisect_left(revs, rev)
+			if i == len(revs) or revs[i] != rev:
+				raise HistoricKeyError("Rev not present: {}".format(rev))
+			del revs[i]
+			del self._vals[i]
+
+	def __repr__(self) -> str:
+		return "{}({})".format(self.__class__.__name__,
+								dict(zip(self._revs, self._vals)))
+
+
+class ArrayFuturistWindowDict(ArrayWindowDict):
+	"""An ArrayWindowDict that does not let you rewrite the past."""
+	__slots__ = ()
+
+	def __setitem__(self, rev: int, v: Any) -> None:
+		if hasattr(v, 'unwrap') and not hasattr(v, 'no_unwrap'):
+			v = v.unwrap()
+		with self._lock:
+			self._last = rev
+			revs = self._revs
+			if not revs or rev > revs[-1]:
+				revs.append(rev)
+				self._vals.append(v)
+			elif rev == revs[-1]:
+				self._vals[-1] = v
+			else:
+				raise HistoricKeyError(
+					"Already have some history after {}".format(rev))
+
+
+class ArrayTurnDict(ArrayFuturistWindowDict):
+	"""Array-backed :class:`TurnDict`"""
+	__slots__ = ()
+	cls = ArrayFuturistWindowDict
+
+	def __setitem__(self, turn: int, value: Any) -> None:
+		if type(value) is not ArrayFuturistWindowDict:
+			value = ArrayFuturistWindowDict(value)
+		ArrayFuturistWindowDict.__setitem__(self, turn, value)
+
+
+class ArraySettingsTurnDict(ArrayWindowDict):
+	"""Array-backed :class:`SettingsTurnDict`"""
+	__slots__ = ()
+	cls = ArrayWindowDict
+
+	def __setitem__(self, turn: int, value: Any) -> None:
+		if type(value) is not ArrayWindowDict:
+			value = ArrayWindowDict(value)
+		ArrayWindowDict.__setitem__(self, turn, value)
+
+	retrieve = SettingsTurnDict.retrieve
+	retrieve_exact = SettingsTurnDict.retrieve_exact
+	store_at = SettingsTurnDict.store_at
+
+
+class KeyframeIndex:
+	"""The times of keyframes, sorted within each branch
+
+	Works like a set of ``(branch, turn, tick)`` triples, but can also
+	find the nearest keyframe before or after a given time with binary
+	search.
+
+	"""
+	__slots__ = ('_times', '_len')
+
+	def __init__(self, data: Iterable[Tuple[str, int, int]] = ()):
+		self._times: Dict[str, List[Tuple[int, int]]] = {}
+		self._len = 0
+		for btt in data:
+			self.add(btt)
+
+	def __contains__(self, btt: Tuple[str, int, int]) -> bool:
+		branch, turn, tick = btt
+		if branch not in self._times:
+			return False
+		times = self._times[branch]
+		i = bisect_left(times, (turn, tick))
+		return i < len(times) and times[i] == (turn, tick)
+
+	def __iter__(self):
+		for branch, times in self._times.items():
+			for turn, tick in times:
+				yield branch, turn, tick
+
+	def __len__(self):
+		return self._len
+
+	def add(self, btt: Tuple[str, int, int]) -> None:
+		branch, turn, tick = btt
+		if branch not in self._times:
+			self._times[branch] = [(turn, tick)]
+			self._len += 1
+			return
+		times = self._times[branch]
+		i = bisect_left(times, (turn, tick))
+		if i < len(times) and times[i] == (turn, tick):
+			return
+		times.insert(i, (turn, tick))
+		self._len += 1
+
+	def discard(self, btt: Tuple[str, int, int]) -> None:
+		branch, turn, tick = btt
+		if branch not in self._times:
+			return
+		times = self._times[branch]
+		i = bisect_left(times, (turn, tick))
+		if i < len(times) and times[i] == (turn, tick):
+			del times[i]
+			self._len -= 1
+			if not times:
+				del self._times[branch]
+
+	def branches(self) -> Iterable[str]:
+		"""Iterate over the branches that have any keyframes"""
+		return iter(self._times)
+
+	def times(self, branch: str) -> List[Tuple[int, int]]:
+		"""Return the sorted ``(turn, tick)`` of keyframes in a branch"""
+		return self._times.get(branch, [])
+
+	def latest(self, branch: str, turn: int,
+				tick: int) -> Optional[Tuple[int, int]]:
+		"""Return the last keyframe time in the branch, up to and including
+		the given one, or ``None``"""
+		times = self._times.get(branch)
+		if not times:
+			return None
+		i = bisect_right(times, (turn, tick))
+		if i == 0:
+			return None
+		return times[i - 1]
+
+	def earliest_after(self, branch: str, turn: int,
+						tick: int) -> Optional[Tuple[int, int]]:
+		"""Return the first keyframe time in the branch after the given
+		one, or ``None``"""
+		times = self._times.get(branch)
+		if not times:
+			return None
+		i = bisect_right(times, (turn, tick))
+		if i == len(times):
+			return None
+		return times[i]
@@ -16,10 +16,10 @@ from functools import partial
 from operator import sub, or_
 
 from .allegedb.cache import (Cache, PickyDefaultDict, StructuredDefaultDict,
-								TurnDict, WindowDict, HistoricKeyError,
+								ArrayTurnDict, ArrayWindowDict,
+								HistoricKeyError,
 								EntitylessCache)
 from .util import singleton_get, sort_set
-from collections import OrderedDict
 
 
 class InitializedCache(Cache):
@@ -60,15 +60,15 @@ class UnitnessCache(Cache):
 
 	def __init__(self, engine):
 		Cache.__init__(self, engine)
-		self.user_order = StructuredDefaultDict(3, TurnDict)
-		self.user_shallow = PickyDefaultDict(TurnDict)
-		self.graphs = StructuredDefaultDict(1, TurnDict)
-		self.graph_units = StructuredDefaultDict(1, TurnDict)
-		self.char_units = StructuredDefaultDict(1, TurnDict)
-		self.solo_unit = StructuredDefaultDict(1, TurnDict)
-		self.unique_unit = StructuredDefaultDict(1, TurnDict)
-		self.unique_graph = StructuredDefaultDict(1, TurnDict)
-		self.users = StructuredDefaultDict(1, TurnDict)
+		self.user_order = StructuredDefaultDict(3, ArrayTurnDict)
+		self.user_shallow = PickyDefaultDict(ArrayTurnDict)
+		self.graphs = StructuredDefaultDict(1, ArrayTurnDict)
+		self.graph_units = StructuredDefaultDict(1, ArrayTurnDict)
+		self.char_units = StructuredDefaultDict(1, ArrayTurnDict)
+		self.solo_unit = StructuredDefaultDict(1, ArrayTurnDict)
+		self.unique_unit = StructuredDefaultDict(1, ArrayTurnDict)
+		self.unique_graph = StructuredDefaultDict(1, ArrayTurnDict)
+		self.users = StructuredDefaultDict(1, ArrayTurnDict)
 
 	def store(self,
 				character,
@@ -213,22 +213,32 @@ class UnitnessCache(Cache):
 			uniqgraph[turn] = {tick: graph}
 
 	def get_char_graph_avs(self, char, graph, branch, turn, tick):
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', (char, graph))
 		return self._valcache_lookup(self.graph_units[(char, graph)], branch,
 										turn, tick) or set()
 
 	def get_char_graph_solo_av(self, char, graph, branch, turn, tick):
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', (char, graph))
 		return self._valcache_lookup(self.solo_unit[(char, graph)], branch,
 										turn, tick)
 
 	def get_char_only_av(self, char, branch, turn, tick):
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', (char, ))
 		return self._valcache_lookup(self.unique_unit[char], branch, turn,
 										tick)
 
 	def get_char_only_graph(self, char, branch, turn, tick):
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', (char, ))
 		return self._valcache_lookup(self.unique_graph[char], branch, turn,
 										tick)
 
 	def get_char_graphs(self, char, branch, turn, tick):
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', (char, ))
 		return self._valcache_lookup(self.graphs[char], branch, turn,
 										tick) or set()
 
@@ -248,6 +258,8 @@ class UnitnessCache(Cache):
 				yield graph, node
 
 	def _slow_iter_users(self, graph, node, branch, turn, tick):
+		if self.db._tracking_reads:
+			self.db._note_read(self, 'keys', ())
 		if graph not in self.user_order:
 			return
 		for character in self.user_order[graph][node]:
@@ -275,7 +287,7 @@ class RulesHandledCache(object):
 	def __init__(self, engine):
 		self.engine = engine
 		self.handled = {}
-		self.handled_deep = StructuredDefaultDict(1, type=WindowDict)
+		self.handled_deep = StructuredDefaultDict(1, type=ArrayWindowDict)
 		self.unhandled = {}
 
 	def get_rulebook(self, *args):
@@ -304,6 +316,26 @@ class RulesHandledCache(object):
 	def retrieve(self, *args):
 		return self.handled[args]
 
+	def truncate_before(self, branch, turn):
+		"""Forget which rules were handled in ``branch`` before ``turn``"""
+		deep = self.handled_deep
+		if branch in deep:
+			turns = deep[branch]
+			for old in [t for t in turns if t < turn]:
+				del turns[old]
+		handled = self.handled
+		for key in [
+			k for k in handled if k[-2] == branch and k[-1] < turn
+		]:
+			del handled[key]
+		for rulebooks in self.unhandled.values():
+			for branches in rulebooks.values():
+				if branch not in branches:
+					continue
+				turns = branches[branch]
+				for old in [t for t in turns if t < turn]:
+					del turns[old]
+
 	def unhandled_rulebook_rules(self, *args):
 		entity = args[:-4]
 		rulebook, branch, turn, tick = args[-4:]
@@ -361,10 +393,12 @@ class UnitRulesHandledCache(RulesHandledCache):
 		for character in sort_set(charm.keys()):
 			rulebook = self.get_rulebook(character, branch, turn, tick)
 			try:
-				prio = self.engine._rulebooks_cache.retrieve(
-					rulebook, branch, turn, tick)[1]
+				rulebook_rules, prio = self.engine._rulebooks_cache.retrieve(
+					rulebook, branch, turn, tick)
 			except KeyError:
 				continue
+			if not rulebook_rules:
+				continue
 			charavm = charm[character].unit
 			for graph in sort_set(charavm.keys()):
 				for avatar in sort_set(charavm[graph].keys()):
@@ -392,10 +426,12 @@ class CharacterThingRulesHandledCache(RulesHandledCache):
 		for character in charm.keys():
 			rulebook = self.get_rulebook(character, branch, turn, tick)
 			try:
-				prio = self.engine._rulebooks_cache.retrieve(
-					rulebook, branch, turn, tick)[1]
+				rulebook_rules, prio = self.engine._rulebooks_cache.retrieve(
+					rulebook, branch, turn, tick)
 			except KeyError:
 				continue
+			if not rulebook_rules:
+				continue
 			for thing in charm[character].thing.keys():
 				try:
 					rules = self.unhandled_rulebook_rules(
@@ -420,10 +456,12 @@ class CharacterPlaceRulesHandledCache(RulesHandledCache):
 		for character in charm.keys():
 			rulebook = self.get_rulebook(character, branch, turn, tick)
 			try:
-				prio = self.engine._rulebooks_cache.retrieve(
-					rulebook, branch, turn, tick)[1]
+				rulebook_rules, prio = self.engine._rulebooks_cache.retrieve(
+					rulebook, branch, turn, tick)
 			except KeyError:
 				continue
+			if not rulebook_rules:
+				continue
 			for place in charm[character].place.keys():
 				try:
 					rules = self.unhandled_rulebook_rules(
@@ -487,18 +525,16 @@ class NodeRulesHandledCache(RulesHandledCache):
 
 	def iter_unhandled_rules(self, branch, turn, tick):
 		charm = self.engine.character
-		nodes_with_rulebook_changed = {
-			(character, node)
-			for (character, node, _, _,
-					_) in self.engine._nodes_rulebooks_cache.shallowest
-		}
+		nodes_with_rulebook_changed = set(
+			self.engine._nodes_rulebooks_cache.branches)
+		# Only rulebooks that have had rules put in them are in the
+		# rulebooks cache, so look for default node rulebooks there,
+		# rather than in every node of every character
 		nodes_with_filled_default_rulebooks = {
-			(character, node)
-			for (_, (character, node)) in (
-				{(None, (character, node))
-					for character in charm
-					for node in charm[character].node}
-				& self.engine._rulebooks_cache.branches.keys())
+			rulebook
+			for (_, rulebook) in self.engine._rulebooks_cache.branches
+			if isinstance(rulebook, tuple) and len(rulebook) == 2
+			and rulebook[0] in charm and rulebook[1] in charm[rulebook[0]].node
 		}
 		for (character, node) in (nodes_with_rulebook_changed
 									| nodes_with_filled_default_rulebooks):
@@ -526,20 +562,14 @@ class PortalRulesHandledCache(RulesHandledCache):
 			return character, orig, dest
 
 	def iter_unhandled_rules(self, branch, turn, tick):
-		portals_with_rulebook_changed = {
-			(character, orig, dest)
-			for (character, orig, dest, _, _,
-					_) in self.engine._portals_rulebooks_cache.shallowest
-		}
-		portals_default_rulebooks = {
-			(None, port)
-			for port in self.engine._edges_cache.keys
-		}
+		portals_with_rulebook_changed = set(
+			self.engine._portals_rulebooks_cache.branches)
+		edges = self.engine._edges_cache.keys
 		portals_with_filled_default_rulebooks = {
-			(character, orig, dest)
-			for (_, (character, orig, dest)) in (
-				portals_default_rulebooks
-				& self.engine._rulebooks_cache.branches.keys())
+			rulebook
+			for (_, rulebook) in self.engine._rulebooks_cache.branches
+			if isinstance(rulebook, tuple) and len(rulebook) == 3
+			and rulebook in edges
 		}
 		for (character, orig,
 				dest) in (portals_with_rulebook_changed
@@ -740,4 +770,4 @@ class NodeContentsCache(Cache):
 				kc.truncate(turn)
 				if not kc:
 					del self.keycache[entity, brnch]
-		self.shallowest = OrderedDict()
+		self.shallowest.clear()
@@ -39,7 +39,7 @@ from typing import Type
 from blinker import Signal
 
 import networkx as nx
-from .allegedb.cache import FuturistWindowDict, PickyDefaultDict
+from .allegedb.cache import ArrayFuturistWindowDict, PickyDefaultDict
 from .allegedb.graph import (DiGraph, GraphNodeMapping,
 								DiGraphSuccessorsMapping,
 								DiGraphPredecessorsMapping)
@@ -698,7 +698,7 @@ class Character(DiGraph, AbstractCharacter, RuleFollower):
 
 	def __init__(self, engine, name, *, init_rulebooks=True):
 		super().__init__(engine, name)
-		self._avatars_cache = PickyDefaultDict(FuturistWindowDict)
+		self._avatars_cache = PickyDefaultDict(ArrayFuturistWindowDict)
 		if not init_rulebooks:
 			return
 		cachemap = {
@@ -1430,11 +1430,17 @@ class Character(DiGraph, AbstractCharacter, RuleFollower):
 		Actually, triples are acceptable too, in which case the third
 		item is a dictionary of stats for the new :class:`Portal`.
 		"""
+		edges = []
 		for tup in seq:
 			orig = tup[0]
 			dest = tup[1]
+			if isinstance(orig, Node):
+				orig = orig.name
+			if isinstance(dest, Node):
+				dest = dest.name
 			kwarrgs = tup[2] if len(tup) > 2 else kwargs
-			self.add_portal(orig, dest, **kwarrgs)
+			edges.append((orig, dest, kwarrgs))
+		super().add_edges_from(edges)
 
 	def add_unit(self, a, b=None):
 		"""Start keeping track of a unit.
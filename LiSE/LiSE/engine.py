@@ -22,14 +22,20 @@ from __future__ import annotations
 import shutil
 import sys
 import os
-from concurrent.futures import ThreadPoolExecutor, wait
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from contextlib import nullcontext
 from functools import partial
+from itertools import groupby
+from operator import itemgetter
+from multiprocessing import get_context
 from collections import defaultdict
+from copy import deepcopy
 from types import FunctionType, ModuleType, MethodType
-from typing import Union, Tuple, Any, Set, List, Type, Optional
+from typing import Union, Tuple, Any, Set, List, Type, Optional, Iterable
 from os import PathLike
 from abc import ABC, abstractmethod
 from random import Random
+from time import perf_counter
 
 from networkx import (Graph, DiGraph, spring_layout, from_dict_of_dicts,
 						from_dict_of_lists)
@@ -124,12 +130,16 @@ class NextTurn(Signal):
 			start_branch,
 			engine.turn,
 			discard_rules=not engine.keep_rules_journal)
+		if (engine.rules_journal_turns is not None
+			and engine.turn >= engine.rules_journal_turns):
+			engine.prune_rules_journal(
+				engine.turn - engine.rules_journal_turns + 1, start_branch)
 		if (engine.flush_interval is not None
 			and engine.turn % engine.flush_interval == 0):
 			engine.query.flush()
 		if (engine.commit_interval is not None
 			and engine.turn % engine.commit_interval == 0):
-			engine.commit()
+			engine.commit().result()
 		self.send(self.engine,
 					branch=engine.branch,
 					turn=engine.turn,
@@ -145,6 +155,89 @@ class NextTurn(Signal):
 		return results, delta
 
 
+class RulesProfile:
+	"""How much each rule and rulebook cost in one turn of simulation
+
+	For each of the phases ``'triggers'``, ``'prereqs'``, and
+	``'actions'``, I count calls, seconds spent, and reads and writes
+	to the engine's caches. Get my findings from :meth:`report`.
+
+	"""
+	__slots__ = ('engine', 'branch', 'turn', 'rules', 'rulebooks')
+	phases = ('triggers', 'prereqs', 'actions')
+
+	def __init__(self, engine: Engine, branch: str, turn: int):
+		self.engine = engine
+		self.branch = branch
+		self.turn = turn
+		self.rules = {}
+		self.rulebooks = {}
+
+	def _cache_traffic(self) -> Tuple[int, int]:
+		reads = writes = 0
+		for cache in self.engine._caches:
+			reads += cache.shallowest.hits + cache.shallowest.misses
+			writes += cache.writes
+		return reads, writes
+
+	def _record(self, phase: str, key: Key, elapsed: float, reads: int,
+				writes: int, where: dict) -> None:
+		if key not in where:
+			where[key] = {
+				ph: {
+					'calls': 0,
+					'time': 0.0,
+					'reads': 0,
+					'writes': 0
+				}
+				for ph in self.phases
+			}
+		rec = where[key][phase]
+		rec['calls'] += 1
+		rec['time'] += elapsed
+		rec['reads'] += reads
+		rec['writes'] += writes
+
+	def wrap(self, phase: str, fun: callable) -> callable:
+		"""Return a version of ``fun`` that I keep track of
+
+		Pass it the rulebook and the rule as the keyword arguments
+		``rulebook`` and ``rule``. It passes them on to ``fun``.
+
+		"""
+
+		def profiled(*args, rulebook, rule, **kwargs):
+			reads, writes = self._cache_traffic()
+			start = perf_counter()
+			try:
+				return fun(*args, rulebook=rulebook, rule=rule, **kwargs)
+			finally:
+				elapsed = perf_counter() - start
+				reads_end, writes_end = self._cache_traffic()
+				self._record(phase, rule.name, elapsed, reads_end - reads,
+								writes_end - writes, self.rules)
+				self._record(phase, rulebook, elapsed, reads_end - reads,
+								writes_end - writes, self.rulebooks)
+
+		return profiled
+
+	def report(self) -> dict:
+		"""Return a dictionary of everything I've recorded
+
+		Keys are ``'branch'`` and ``'turn'``, telling when the rules ran,
+		then ``'rules'`` and ``'rulebooks'``, each mapping names to
+		dictionaries keyed by phase. Those hold ``'calls'``, ``'time'``,
+		``'reads'``, and ``'writes'``.
+
+		"""
+		return {
+			'branch': self.branch,
+			'turn': self.turn,
+			'rules': deepcopy(self.rules),
+			'rulebooks': deepcopy(self.rulebooks)
+		}
+
+
 class AbstractSchema(ABC):
 	"""Base class for schemas describing what changes are permitted to the game world"""
 
@@ -225,6 +318,20 @@ class Engine(AbstractEngine, gORM):
 	:param keep_rules_journal: Boolean; if ``True`` (the default), keep
 		information on the behavior of the rules engine in the database.
 		Makes the database rather large, but useful for debugging.
+	:param rules_journal_turns: How many of the latest turns of that
+		information to keep, in each branch. Older turns get pruned from
+		memory and the database as turns complete. Default ``None``,
+		meaning keep it all.
+	:param coalesce_writes: Whether to keep only the final value when a
+		rule's actions set the same stat several times. Default ``False``.
+		See :meth:`LiSE.allegedb.ORM.coalescing`.
+	:param watch_triggers: Whether to remember what each trigger read
+		from the world when it last ran on an entity, and reuse its
+		result on later turns if none of that has changed since.
+		Default ``False``. Only use this if your triggers depend on
+		nothing but the state of the world -- not the time, nor random
+		numbers, nor anything outside LiSE. Has no effect with
+		``trigger_processes``.
 	:param keyframe_on_close: Whether to snap a keyframe when closing the
 		engine, default ``True``. This is usually what you want, as it will
 		make future startups faster, but could cause database bloat if
@@ -239,6 +346,36 @@ class Engine(AbstractEngine, gORM):
 		time travelling to a point after the time that's been simulated.
 		Default ``True``. You normally want this, but it could cause problems
 		if you're not using the rules engine.
+	:param trigger_processes: How many worker processes to check triggers
+		in. Default ``None``, meaning triggers run in threads, in this
+		process. With worker processes, triggers only see a read-only
+		snapshot of the world, taken at the start of each turn, so they
+		must not change anything; any randomness they use is seeded
+		separately for each trigger and entity.
+	:param parallel_actions: Whether to run the actions of rules with the
+		same priority in the ``trigger_processes`` as well, when they
+		change different characters. Default ``False``. Each rule changes
+		only the character of the entity it runs on, unless its
+		:attr:`LiSE.rule.Rule.writes` says otherwise. Rules that might
+		change the same character run one after another in the same
+		process; their changes are then made in the engine in the order
+		the rules came up. Actions see a snapshot of the world from the
+		start of their priority, with only their own process's changes
+		on top, and get randomness seeded separately for each rule and
+		entity. The seeds come from the engine's own random number
+		generator, one per rule, so turning this on changes what random
+		numbers the rest of the turn gets, compared to running the same
+		rules serially. A rule that changes something it didn't say it would,
+		or raises an exception, gets run again in this process instead.
+		Has no effect without ``trigger_processes``.
+	:param lazy: Whether to put off loading each character until it's first
+		looked up in ``character``. Default ``False``. Speeds up startup
+		for worlds with many characters, few of them in play at once. Rules
+		on an unloaded character's nodes and portals don't get followed
+		until something loads the character, and snapping a keyframe loads
+		every character.
+	:param preload: Names of characters to load at startup, even when
+		``lazy``.
 
 	"""
 	char_cls = Character
@@ -275,9 +412,16 @@ class Engine(AbstractEngine, gORM):
 					logfun: FunctionType = None,
 					clear: bool = False,
 					keep_rules_journal: bool = True,
+					rules_journal_turns: Optional[int] = None,
+					coalesce_writes: bool = False,
+					watch_triggers: bool = False,
 					keyframe_on_close: bool = True,
 					cache_arranger: bool = False,
-					enforce_end_of_time: bool = True):
+					enforce_end_of_time: bool = True,
+					trigger_processes: Optional[int] = None,
+					parallel_actions: bool = False,
+					lazy: bool = False,
+					preload: Iterable[Key] = ()):
 		if logfun is None:
 			from logging import getLogger
 			logger = getLogger("Life Sim Engine")
@@ -294,6 +438,11 @@ class Engine(AbstractEngine, gORM):
 		if not os.path.isdir(prefix):
 			raise FileExistsError("Need a directory")
 		self.keep_rules_journal = keep_rules_journal
+		self.rules_journal_turns = rules_journal_turns
+		self._coalesce_writes = coalesce_writes
+		self._watch_triggers = watch_triggers
+		self._trigger_watch = {}
+		self._trigger_watch_time: Optional[Tuple[str, int, int]] = None
 		self._keyframe_on_close = keyframe_on_close
 		if string:
 			self.string = string
@@ -341,11 +490,18 @@ class Engine(AbstractEngine, gORM):
 							connect_args=connect_args,
 							cache_arranger=cache_arranger,
 							main_branch=main_branch,
-							enforce_end_of_time=enforce_end_of_time)
+							enforce_end_of_time=enforce_end_of_time,
+							lazy=lazy,
+							preload=preload)
 		self._things_cache.setdb = self.query.set_thing_loc
 		self._universal_cache.setdb = self.query.universal_set
 		self._rulebooks_cache.setdb = self.query.rulebook_set
 		self.eternal = self.query.globl
+		self._batch_triggers = set(self.eternal.get('batch_triggers', ()))
+		self._rule_writes = {
+			rule: tuple(chars)
+			for (rule, chars) in self.eternal.get('rule_writes', {}).items()
+		}
 		if hasattr(self, '_string_prefix'):
 			self.string = StringStore(
 				self.query, self._string_prefix,
@@ -356,6 +512,13 @@ class Engine(AbstractEngine, gORM):
 		self.query.snap_keyframe = self.snap_keyframe
 		self.flush_interval = flush_interval
 		self._trigger_pool = ThreadPoolExecutor()
+		self._trigger_processes = trigger_processes
+		self._parallel_actions = parallel_actions
+		if trigger_processes:
+			self._trigger_process_pool = ProcessPoolExecutor(
+				trigger_processes, mp_context=get_context('spawn'))
+		self._rules_profiling = False
+		self._rules_profile: Optional[RulesProfile] = None
 		self._rules_iter = self._follow_rules()
 		self._rando = Random()
 		if 'rando_state' in self.universal:
@@ -462,16 +625,16 @@ class Engine(AbstractEngine, gORM):
 		load_things = self.query.load_things
 		if latest_past_keyframe is None:
 			# Load thing data from the beginning of time to now
-			for graph in self.graph:
+			for graph in self._graphs_to_load():
 				build_thingrows(
 					graph,
-					self._build_loading_windows(self.eternal["main_branch"], 0,
+					self._build_loading_windows(self.query.globl["main_branch"], 0,
 												0, branch, turn, tick))
 		else:
 			past_branch, past_turn, past_tick = latest_past_keyframe
 			if earliest_future_keyframe is None:
 				# Load thing data from the keyframe to now
-				for graph in self.graph:
+				for graph in self._graphs_to_load():
 					build_thingrows(
 						graph,
 						self._build_loading_windows(past_branch, past_turn,
@@ -482,7 +645,7 @@ class Engine(AbstractEngine, gORM):
 				(future_branch, future_turn,
 					future_tick) = earliest_future_keyframe
 
-				for graph in self.graph:
+				for graph in self._graphs_to_load():
 					build_thingrows(
 						graph,
 						self._build_loading_windows(past_branch, past_turn,
@@ -496,6 +659,18 @@ class Engine(AbstractEngine, gORM):
 		else:
 			self.debug(f"No thing data at {branch, turn, tick}")
 
+	def _load_graph_windows(self, graph: Key, windows: list) -> None:
+		super()._load_graph_windows(graph, windows)
+		thingrows = []
+		for window in windows:
+			thingrows.extend(self.query.load_things(graph, *window))
+		if thingrows:
+			with self.batch():
+				self._things_cache.load(thingrows)
+			updload = self._updload
+			for chara, thing, branch, turn, tick, loc in thingrows:
+				updload(branch, turn, tick)
+
 	def _init_caches(self) -> None:
 		from .xcollections import (FunctionStore, CharacterMapping,
 									UniversalMapping)
@@ -573,6 +748,11 @@ class Engine(AbstractEngine, gORM):
 			self.function = FunctionStore(self._function_file)
 		if hasattr(self, '_method_file'):
 			self.method = FunctionStore(self._method_file)
+		self._rule_funcs_cache = {}
+		self._rule_funcs_version = 0
+		for store in (self.trigger, self.prereq, self.action):
+			if isinstance(store, Signal):
+				store.connect(self._forget_rule_funcs)
 		self.rule = AllRules(self)
 		self.rulebook = AllRuleBooks(self)
 		self._caches += [
@@ -983,6 +1163,29 @@ class Engine(AbstractEngine, gORM):
 				set_turn_completed(branch, turn_late)
 		self._turns_completed_previous = turns_completed.copy()
 
+	@world_locked
+	def prune_rules_journal(self, turn: int, branch: str = None) -> None:
+		"""Forget which rules were handled before ``turn``
+
+		In ``branch``, or the current branch if not given. This only
+		works for turns whose rules have all been followed.
+
+		"""
+		if branch is None:
+			branch = self.branch
+		if turn > self._turns_completed[branch] + 1:
+			raise ValueError(
+				"Can't prune the rules journal of turns not yet completed")
+		for cache in (self._character_rules_handled_cache,
+						self._unit_rules_handled_cache,
+						self._character_thing_rules_handled_cache,
+						self._character_place_rules_handled_cache,
+						self._character_portal_rules_handled_cache,
+						self._node_rules_handled_cache,
+						self._portal_rules_handled_cache):
+			cache.truncate_before(branch, turn)
+		self.query.rules_handled_delete_before(branch, turn)
+
 	def close(self) -> None:
 		"""Commit changes and close the database
 
@@ -1007,8 +1210,12 @@ class Engine(AbstractEngine, gORM):
 			modname = filename[:-3]
 			if modname in sys.modules:
 				del sys.modules[modname]
-		self.commit()
-		self.query.close()
+		try:
+			self.commit().result()
+		finally:
+			if hasattr(self, '_trigger_process_pool'):
+				self._trigger_process_pool.shutdown()
+			self.query.close()
 		self._closed = True
 
 	def _snap_keyframe_from_delta(self, then: Tuple[str, int, int],
@@ -1312,20 +1519,248 @@ class Engine(AbstractEngine, gORM):
 		self.query.handled_portal_rule(character, orig, dest, rulebook, rule,
 										branch, turn, tick)
 
+	def profile_rules(self, enable: bool = True) -> None:
+		"""Start or stop keeping a :class:`RulesProfile` of each turn
+
+		While profiling, triggers are checked one at a time in this
+		thread, so that their cost can be told apart.
+
+		"""
+		self._rules_profiling = enable
+
+	def rules_profile(self) -> Optional[dict]:
+		"""Report on the rules in the latest turn simulated while profiling
+
+		See :meth:`RulesProfile.report`. ``None`` if I haven't profiled
+		any turn yet.
+
+		"""
+		if self._rules_profile is None:
+			return None
+		return self._rules_profile.report()
+
+	def _trigger_entity_ref(self, entity) -> tuple:
+		if isinstance(entity, self.char_cls):
+			return 'character', entity.name
+		elif hasattr(entity, 'name'):
+			return 'node', entity.character.name, entity.name
+		else:
+			return ('portal', entity.character.name, entity.origin.name,
+					entity.destination.name)
+
+	def _trigger_snapshot(self) -> bytes:
+		"""Pack the present state of the world for worker processes
+
+		It's shaped like a keyframe, but isn't stored as one.
+
+		"""
+		kf = {
+			'graph_val': {},
+			'nodes': {},
+			'node_val': {},
+			'edges': {},
+			'edge_val': {},
+			'universal': dict(self.universal)
+		}
+		units = {}
+		for charn, char in self.character.items():
+			nodes = char._nodes_state()
+			kf['graph_val'][charn, ] = char._val_state()
+			kf['nodes'][charn, ] = {node: True for node in nodes}
+			for node, stats in nodes.items():
+				kf['node_val'][charn, node] = stats
+			for orig, dests in char._edges_state().items():
+				for dest, stats in dests.items():
+					kf['edges'][charn, orig, dest] = {0: True}
+					kf['edge_val'][charn, orig, dest, 0] = stats
+			units[charn] = {
+				graph: list(avs)
+				for (graph, avs) in char.unit.items()
+			}
+		return self.pack({
+			'btt': self._btt(),
+			'kf': kf,
+			'eternal': {
+				k: v.unwrap() if hasattr(v, 'unwrap') else v
+				for (k, v) in self.eternal.items()
+			},
+			'units': units
+		})
+
+	@staticmethod
+	def _trigger_store_spec(store) -> str:
+		if hasattr(store, '_filename'):
+			if store._need_save:
+				store.save()
+			return store._filename
+		return store.__name__
+
+	def _check_triggers_in_processes(self, jobs: List[tuple]) -> List[bool]:
+		"""Check triggers in my worker processes
+
+		``jobs`` is a list of pairs of a rule name and an entity reference.
+		Return whether each rule was triggered.
+
+		"""
+		from .proxy import check_triggers_in_snapshot
+		stores = {
+			name: self._trigger_store_spec(getattr(self, name))
+			for name in ('trigger', 'function', 'method')
+		}
+		snapshot = self._trigger_snapshot()
+		seed = self.getrandbits(64)
+		rulemap = self.rule
+		todo = []
+		for rulename, ref in jobs:
+			try:
+				trigger_names = rulemap[rulename].triggers._get()
+			except KeyError:
+				trigger_names = ()
+			todo.append((repr((seed, rulename, ref)), ref, trigger_names))
+		n = self._trigger_processes
+		chunksize = -(-len(todo) // n)
+		futs = [
+			self._trigger_process_pool.submit(check_triggers_in_snapshot,
+												stores, snapshot,
+												todo[i:i + chunksize])
+			for i in range(0, len(todo), chunksize)
+		]
+		ret = []
+		for fut in futs:
+			ret.extend(fut.result())
+		return ret
+
+	def _run_actions_in_processes(self, groups: List[list]) -> List[list]:
+		"""Follow rules in my worker processes, one group per process
+
+		Each group is a list of jobs for
+		:func:`LiSE.proxy.run_actions_in_snapshot`. Return its results
+		for each group, or an empty list for a group whose process
+		failed.
+
+		"""
+		from .proxy import run_actions_in_snapshot
+		stores = {
+			name: self._trigger_store_spec(getattr(self, name))
+			for name in ('prereq', 'action', 'function', 'method')
+		}
+		snapshot = self._trigger_snapshot()
+		futs = [
+			self._trigger_process_pool.submit(run_actions_in_snapshot,
+												stores, snapshot, group)
+			for group in groups
+		]
+		ret = []
+		for fut in futs:
+			try:
+				ret.append(fut.result())
+			except Exception as ex:
+				self.warning(
+					f"Worker process failed to run actions, running them here "
+					f"instead: {ex!r}")
+				ret.append([])
+		return ret
+
+	def _replay_commands(self, commands: List[dict]) -> None:
+		"""Make changes recorded by a :class:`LiSE.proxy.EngineProxy`"""
+		if not hasattr(self, '_action_handle'):
+			from .handle import EngineHandle
+			self._action_handle = EngineHandle(engine=self)
+		handle = self._action_handle
+		for command in commands:
+			kwargs = dict(command)
+			cmd = kwargs.pop('command')
+			kwargs.pop('branching', None)
+			kwargs.pop('silent', None)
+			getattr(handle, cmd)(**kwargs)
+
+	def _forget_rule_funcs(self, *args, **kwargs):
+		self._rule_funcs_cache.clear()
+		self._rule_funcs_version += 1
+
+	def _get_rule_funcs(self, rule: str, branch: str, turn: int,
+						tick: int) -> Tuple[tuple, tuple, tuple]:
+		"""Return a rule's trigger, prereq, and action functions
+
+		The names of the functions are looked up at the given time,
+		but the functions themselves are kept until the code in a
+		function store changes.
+
+		"""
+		names = (tuple(self._triggers_cache.retrieve(rule, branch, turn,
+														tick)),
+					tuple(self._prereqs_cache.retrieve(rule, branch, turn,
+														tick)),
+					tuple(self._actions_cache.retrieve(rule, branch, turn,
+														tick)))
+		cache = self._rule_funcs_cache
+		if names not in cache:
+			triggers, prereqs, actions = names
+			trigger, prereq, action = self.trigger, self.prereq, self.action
+			cache[names] = (tuple(getattr(trigger, fn) for fn in triggers),
+							tuple(getattr(prereq, fn) for fn in prereqs),
+							tuple(getattr(action, fn) for fn in actions))
+		return cache[names]
+
 	def _follow_rules(self):
 		# TODO: roll back changes done by rules that raise an exception
 		# TODO: if there's a paradox while following some rule,
 		#  start a new branch, copying handled rules
 		from collections import defaultdict
+		from .rule import TriggerBatch
 		branch, turn, tick = self._btt()
 		charmap = self.character
 		rulemap = self.rule
 		pool = self._trigger_pool
 		todo = defaultdict(list)
+		coalescing = self.coalescing if self._coalesce_writes else nullcontext
+		watching = self._watch_triggers and not self._trigger_processes
+		if watching:
+			if self._trigger_watch_time is None:
+				changed = None
+			else:
+				changed = self._changes_since(*self._trigger_watch_time)
+			watched = self._trigger_watch if changed is not None else {}
+			rewatched = {}
+			recording_reads = self._recording_reads
+			entity_ref = self._trigger_entity_ref
+			self._trigger_watch_time = (branch, turn, tick)
+
+		get_rule_funcs = self._get_rule_funcs
+		funcs_caches = (self._triggers_cache, self._prereqs_cache,
+						self._actions_cache)
+		rule_funcs_memo = {}
+
+		def rule_funcs(rule):
+			# only look the functions up again if some rule changed
+			stamp = (sum(cache.writes for cache in funcs_caches),
+						self._rule_funcs_version)
+			if rule.name in rule_funcs_memo:
+				memo_stamp, funcs = rule_funcs_memo[rule.name]
+				if memo_stamp == stamp:
+					return funcs
+			funcs = get_rule_funcs(rule.name, *self._btt())
+			rule_funcs_memo[rule.name] = stamp, funcs
+			return funcs
+
+		def watch_trigger(trigger, entity):
+			key = (trigger, entity_ref(entity))
+			if key in watched:
+				res, reads = watched[key]
+				if changed.isdisjoint(reads):
+					rewatched[key] = res, reads
+					return res
+			with recording_reads() as reads:
+				res = trigger(entity)
+			rewatched[key] = res, reads
+			return res
 
 		def check_triggers(prio, rulebook, rule, handled_fun, entity):
-			for trigger in rule.triggers:
-				res = trigger(entity)
+			for trigger in rule_funcs(rule)[0]:
+				if watching:
+					res = watch_trigger(trigger, entity)
+				else:
+					res = trigger(entity)
 				if res:
 					todo[prio, rulebook].append((rule, handled_fun, entity))
 					return True
@@ -1333,28 +1768,95 @@ class Engine(AbstractEngine, gORM):
 				handled_fun(self.tick)
 				return False
 
-		def check_prereqs(rule, handled_fun, entity):
+		def check_batch_triggers(prio, rulebook, rule, candidates):
+			for trigger in rule_funcs(rule)[0]:
+				if not candidates:
+					break
+				if trigger.__name__ in batch_triggers:
+					mask = trigger(
+						TriggerBatch([entity for (_, entity) in candidates]))
+					if len(mask) != len(candidates):
+						raise ValueError(
+							f"Batch trigger {trigger.__name__} returned "
+							f"{len(mask)} results for {len(candidates)} "
+							"entities")
+				else:
+					mask = [trigger(entity) for (_, entity) in candidates]
+				remaining = []
+				for (handled_fun, entity), res in zip(candidates, mask):
+					if res:
+						todo[prio, rulebook].append(
+							(rule, handled_fun, entity))
+					else:
+						remaining.append((handled_fun, entity))
+				candidates = remaining
+			for handled_fun, _ in candidates:
+				handled_fun(self.tick)
+
+		def check_prereqs(rulebook, rule, handled_fun, entity):
 			if not entity:
 				return False
-			for prereq in rule.prereqs:
+			for prereq in rule_funcs(rule)[1]:
 				res = prereq(entity)
 				if not res:
 					handled_fun(self.tick)
 					return False
 			return True
 
-		def do_actions(rule, handled_fun, entity):
+		def do_actions(rulebook, rule, handled_fun, entity):
 			actres = []
-			for action in rule.actions:
-				res = action(entity)
-				if res:
-					actres.append(res)
-				if not entity:
-					break
+			with coalescing():
+				for action in rule_funcs(rule)[2]:
+					res = action(entity)
+					if res:
+						actres.append(res)
+					if not entity:
+						break
 			handled_fun(self.tick)
 			return actres
 
+		if self._rules_profiling:
+			profile = self._rules_profile = RulesProfile(self, branch, turn)
+			check_triggers = profile.wrap('triggers', check_triggers)
+			check_batch_triggers = profile.wrap('triggers',
+												check_batch_triggers)
+			check_prereqs = profile.wrap('prereqs', check_prereqs)
+			do_actions = profile.wrap('actions', do_actions)
+		else:
+			profile = None
+
 		trig_futs = []
+		trig_jobs = []
+		self._tracking_reads = watching
+		batch_triggers = self._batch_triggers
+		batches = defaultdict(list)
+		batching = {}
+		submitted = {}
+
+		def submit_triggers(prio, rulebook, rule, handled_fun, entity):
+			submitted[handled_fun] = len(submitted)
+			if batch_triggers:
+				if rule.name not in batching:
+					batching[rule.name] = any(
+						trigger.__name__ in batch_triggers
+						for trigger in rule_funcs(rule)[0])
+				if batching[rule.name]:
+					batches[prio, rulebook, rule.name].append(
+						(handled_fun, entity))
+					return
+			if profile is not None:
+				check_triggers(prio,
+								rulebook=rulebook,
+								rule=rule,
+								handled_fun=handled_fun,
+								entity=entity)
+			elif self._trigger_processes:
+				trig_jobs.append((prio, rulebook, rule, handled_fun, entity))
+			else:
+				trig_futs.append(
+					pool.submit(check_triggers, prio, rulebook, rule,
+								handled_fun, entity))
+
 		for (prio, charactername, rulebook, rulename
 				) in self._character_rules_handled_cache.iter_unhandled_rules(
 					branch, turn, tick):
@@ -1364,9 +1866,7 @@ class Engine(AbstractEngine, gORM):
 			handled = partial(self._handled_char, charactername, rulebook,
 								rulename, branch, turn)
 			entity = charmap[charactername]
-			trig_futs.append(
-				pool.submit(check_triggers, prio, rulebook, rule, handled,
-							entity))
+			submit_triggers(prio, rulebook, rule, handled, entity)
 
 		avcache_retr = self._unitness_cache._base_retrieve
 		node_exists = self._node_exists
@@ -1403,9 +1903,7 @@ class Engine(AbstractEngine, gORM):
 			handled = partial(self._handled_av, charn, graphn, avn, rulebook,
 								rulen, branch, turn)
 			entity = get_node(graphn, avn)
-			trig_futs.append(
-				pool.submit(check_triggers, prio, rulebook, rule, handled,
-							entity))
+			submit_triggers(prio, rulebook, rule, handled, entity)
 		is_thing = self._is_thing
 		handled_char_thing = self._handled_char_thing
 		for (
@@ -1418,9 +1916,7 @@ class Engine(AbstractEngine, gORM):
 			handled = partial(handled_char_thing, charn, thingn, rulebook,
 								rulen, branch, turn)
 			entity = get_thing(charn, thingn)
-			trig_futs.append(
-				pool.submit(check_triggers, prio, rulebook, rule, handled,
-							entity))
+			submit_triggers(prio, rulebook, rule, handled, entity)
 		handled_char_place = self._handled_char_place
 		for (
 			prio, charn, placen, rulebook, rulen
@@ -1432,9 +1928,7 @@ class Engine(AbstractEngine, gORM):
 			handled = partial(handled_char_place, charn, placen, rulebook,
 								rulen, branch, turn)
 			entity = get_place(charn, placen)
-			trig_futs.append(
-				pool.submit(check_triggers, prio, rulebook, rule, handled,
-							entity))
+			submit_triggers(prio, rulebook, rule, handled, entity)
 		edge_exists = self._edge_exists
 		get_edge = self._get_edge
 		handled_char_port = self._handled_char_port
@@ -1448,9 +1942,7 @@ class Engine(AbstractEngine, gORM):
 			handled = partial(handled_char_port, charn, orign, destn, rulebook,
 								rulen, branch, turn)
 			entity = get_edge(charn, orign, destn)
-			trig_futs.append(
-				pool.submit(check_triggers, prio, rulebook, rule, handled,
-							entity))
+			submit_triggers(prio, rulebook, rule, handled, entity)
 		handled_node = self._handled_node
 		for (prio, charn, noden, rulebook,
 				rulen) in self._node_rules_handled_cache.iter_unhandled_rules(
@@ -1461,9 +1953,7 @@ class Engine(AbstractEngine, gORM):
 			handled = partial(handled_node, charn, noden, rulebook, rulen,
 								branch, turn)
 			entity = get_node(charn, noden)
-			trig_futs.append(
-				pool.submit(check_triggers, prio, rulebook, rule, handled,
-							entity))
+			submit_triggers(prio, rulebook, rule, handled, entity)
 		handled_portal = self._handled_portal
 		for (
 			prio, charn, orign, destn, rulebook,
@@ -1475,10 +1965,27 @@ class Engine(AbstractEngine, gORM):
 			handled = partial(handled_portal, charn, orign, destn, rulebook,
 								rulen, branch, turn)
 			entity = get_edge(charn, orign, destn)
-			trig_futs.append(
-				pool.submit(check_triggers, prio, rulebook, rule, handled,
-							entity))
+			submit_triggers(prio, rulebook, rule, handled, entity)
+		if trig_jobs:
+			fired = self._check_triggers_in_processes([
+				(rule.name, self._trigger_entity_ref(entity))
+				for (_, _, rule, _, entity) in trig_jobs
+			])
+			for (prio, rulebook, rule, handled,
+					entity), res in zip(trig_jobs, fired):
+				if res:
+					todo[prio, rulebook].append((rule, handled, entity))
+				else:
+					handled(self.tick)
 		wait(trig_futs)
+		if watching:
+			self._tracking_reads = False
+			self._trigger_watch = rewatched
+		for (prio, rulebook, rulen), candidates in batches.items():
+			check_batch_triggers(prio,
+									rulebook=rulebook,
+									rule=rulemap[rulen],
+									candidates=candidates)
 
 		def fmtent(entity):
 			if isinstance(entity, self.char_cls):
@@ -1489,24 +1996,106 @@ class Engine(AbstractEngine, gORM):
 				return (f"{entity.character.name}.portal"
 						f"[{entity.origin.name}][{entity.destination.name}]")
 
-		for prio_rulebook in sort_set(todo.keys()):
-			for rule, handled, entity in todo[prio_rulebook]:
+		def follow(rulebook, rule, handled, entity):
+			if not entity:
+				return
+			self.debug(
+				f"checking prereqs for rule {rule.name} on entity {fmtent(entity)}"
+			)
+			if check_prereqs(rulebook=rulebook,
+								rule=rule,
+								handled_fun=handled,
+								entity=entity):
+				self.debug(f"prereqs for rule {rule} on entity "
+							f"{fmtent(entity)} satisfied, will run actions")
+				try:
+					yield do_actions(rulebook=rulebook,
+										rule=rule,
+										handled_fun=handled,
+										entity=entity)
+					self.debug(f"actions for rule {rule} on entity "
+								f"{fmtent(entity)} have run without incident")
+				except StopIteration:
+					raise InnerStopIteration
+
+		def follow_in_processes(band):
+			from .handle import EngineHandle
+			# rules that might change the same character go in the same
+			# group, to run one after another in the same process
+			groups = []
+			jobs = {}
+			writes = {}
+			for i, (rulebook, rule, handled, entity) in enumerate(band):
 				if not entity:
 					continue
-				self.debug(
-					f"checking prereqs for rule {rule.name} on entity {fmtent(entity)}"
-				)
-				if check_prereqs(rule, handled, entity):
-					self.debug(
-						f"prereqs for rule {rule} on entity "
-						f"{fmtent(entity)} satisfied, will run actions")
-					try:
-						yield do_actions(rule, handled, entity)
-						self.debug(
-							f"actions for rule {rule} on entity "
-							f"{fmtent(entity)} have run without incident")
-					except StopIteration:
-						raise InnerStopIteration
+				ref = self._trigger_entity_ref(entity)
+				chars = writes[i] = frozenset(
+					(ref[1], ) if rule.writes is None else rule.writes)
+				_, prereqs, actions = rule_funcs(rule)
+				# this draws from my RNG even for rules that end up
+				# running here, so the random stream isn't the same as
+				# when parallel_actions is off
+				jobs[i] = (self.getrandbits(64), ref,
+							[prereq.__name__ for prereq in prereqs],
+							[action.__name__ for action in actions])
+				group_chars = set(chars)
+				group = [i]
+				apart = []
+				for other_chars, other in groups:
+					if chars.isdisjoint(other_chars):
+						apart.append((other_chars, other))
+					else:
+						group_chars.update(other_chars)
+						group.extend(other)
+				group.sort()
+				groups = apart + [(group_chars, group)]
+			done = {}
+			for (_, group), results in zip(
+				groups,
+				self._run_actions_in_processes(
+					[[jobs[i] for i in group] for (_, group) in groups])):
+				for i, result in zip(group, results):
+					if not all(
+						command.get('char') in writes[i]
+						and hasattr(EngineHandle, command['command'])
+						for command in result[1]):
+						# later rules in the group saw what this one did,
+						# so they have to run again too
+						break
+					done[i] = result
+			# make the changes in the order the rules came up
+			for i, job in enumerate(band):
+				if i not in done:
+					yield from follow(*job)
+					continue
+				rulebook, rule, handled, entity = job
+				prereqs_passed, commands, actres = done[i]
+				if prereqs_passed is None:
+					continue
+				if prereqs_passed:
+					with coalescing():
+						self._replay_commands(commands)
+				handled(self.tick)
+				if prereqs_passed:
+					yield actres
+
+		parallel = (self._parallel_actions and self._trigger_processes
+					and profile is None)
+		for prio, prio_rulebooks in groupby(sort_set(todo.keys()),
+											key=itemgetter(0)):
+			band = []
+			for prio_rulebook in prio_rulebooks:
+				rulebook = prio_rulebook[1]
+				# triggers finish in whatever order the threads get to them,
+				# but actions should run in the order the rules came up
+				todo[prio_rulebook].sort(key=lambda job: submitted[job[1]])
+				band.extend((rulebook, rule, handled, entity)
+							for (rule, handled, entity) in todo[prio_rulebook])
+			if parallel and len(band) > 1:
+				yield from follow_in_processes(band)
+			else:
+				for job in band:
+					yield from follow(*job)
 
 	def _advance(self) -> Any:
 		"""Follow the next rule if available.
@@ -17,7 +17,6 @@ ordinary method calls.
 
 """
 from logging import DEBUG, INFO, WARNING, ERROR, CRITICAL
-from operator import itemgetter
 from re import match
 from functools import partial
 from importlib import import_module
@@ -139,6 +138,62 @@ def set_delta(old: Set[bytes], new: Set[bytes]) -> FormerAndCurrentType:
 	return former, current
 
 
+def _kf_val_columns(
+		kf_val: Dict[tuple, Dict[Key, Any]],
+		pack: Callable) -> Tuple[List[tuple], List[bytes], np.ndarray,
+									np.ndarray]:
+	"""Lay out stats from a keyframe as columns of packed keys and values
+
+	Return the unpacked keys and the packed values as lists, and then
+	both again as numpy arrays, with ``\\xc1`` appended for the same
+	reason as in :func:`_packed_dict_delta`.
+
+	"""
+	keys = []
+	vals = []
+	for entity, stats in kf_val.items():
+		for k, v in stats.items():
+			keys.append(entity + (k, ))
+			vals.append(pack(v))
+	key_col = np.array([pack(k) + b'\xc1' for k in keys], dtype=np.bytes_)
+	val_col = np.array([v + b'\xc1' for v in vals], dtype=np.bytes_)
+	return keys, vals, key_col, val_col
+
+
+def columnar_kf_val_delta(
+		kf_val_from: Dict[tuple, Dict[Key, Any]],
+		kf_val_to: Dict[tuple, Dict[Key, Any]],
+		pack: Callable) -> Iterable[Tuple[tuple, bytes]]:
+	"""Compare the stats in two keyframes, yielding those that differ
+
+	``kf_val_from`` and ``kf_val_to`` are like the ``graph_val``,
+	``node_val``, or ``edge_val`` of a keyframe: dictionaries
+	of stats keyed by an entity tuple.
+
+	Yield pairs of the entity tuple with the stat's key appended,
+	and the packed value in ``kf_val_to``. Stats that were removed
+	get the value ``NONE``.
+
+	Both sides get laid out as columns of packed keys and values, and
+	then numpy does the sorting and comparing.
+
+	"""
+	keys_from, _, key_col_from, val_col_from = _kf_val_columns(
+		kf_val_from, pack)
+	keys_to, vals_to, key_col_to, val_col_to = _kf_val_columns(
+		kf_val_to, pack)
+	_, idx_from, idx_to = np.intersect1d(key_col_from,
+											key_col_to,
+											assume_unique=True,
+											return_indices=True)
+	for i in idx_to[val_col_from[idx_from] != val_col_to[idx_to]]:
+		yield keys_to[i], vals_to[i]
+	for i in np.flatnonzero(np.isin(key_col_to, key_col_from, invert=True)):
+		yield keys_to[i], vals_to[i]
+	for i in np.flatnonzero(np.isin(key_col_from, key_col_to, invert=True)):
+		yield keys_from[i], NONE
+
+
 def concat_d(r: Dict[bytes, bytes]) -> bytes:
 	"""Pack a dictionary of msgpack-encoded keys and values into msgpack bytes"""
 	resp = msgpack.Packer().pack_map_header(len(r))
@@ -192,7 +247,12 @@ class EngineHandle(object):
 	"""
 	_after_ret: Callable
 
-	def __init__(self, args=(), kwargs=None, logq=None, loglevel=None):
+	def __init__(self,
+					args=(),
+					kwargs=None,
+					logq=None,
+					loglevel=None,
+					engine: Engine = None):
 		"""Instantiate an engine with the positional arguments ``args`` and
 		the keyword arguments ``kwargs``.
 
@@ -202,13 +262,18 @@ class EngineHandle(object):
 		(or the constants from the `logging` module, or an integer)
 		and controls what messages will be logged.
 
+		To wrap an engine that's already running, pass it as ``engine``.
+
 		"""
-		if kwargs is None:
-			kwargs = {}
-		kwargs.setdefault('logfun', self.log)
 		self._logq = logq
 		self._loglevel = loglevel
-		self._real = Engine(*args, cache_arranger=False, **kwargs)
+		if engine is not None:
+			self._real = engine
+		else:
+			if kwargs is None:
+				kwargs = {}
+			kwargs.setdefault('logfun', self.log)
+			self._real = Engine(*args, cache_arranger=False, **kwargs)
 		self.pack = pack = self._real.pack
 
 		def pack_pair(pair):
@@ -491,6 +556,12 @@ class EngineHandle(object):
 				*self._real._btt()))
 		return pack(ret), packed_delta
 
+	def profile_rules(self, enable: bool = True) -> None:
+		self._real.profile_rules(enable)
+
+	def rules_profile(self) -> Optional[dict]:
+		return self._real.rules_profile()
+
 	def _get_slow_delta(
 			self,
 			btt_from: Tuple[str, int, int] = None,
@@ -509,77 +580,44 @@ class EngineHandle(object):
 		self._real.snap_keyframe()
 		kf_to = self._real._get_kf(*btt_to)
 		self._real._set_btt(*now)
-		keys = []
-		values_from = []
-		values_to = []
-		# assemble the whole world state into three big arrays,
-		# use numpy to compare keys and values,
-		# then turn it all back into a dictionary of the right form
-		for graph in kf_from['graph_val'].keys() | kf_to['graph_val'].keys():
-			a = kf_from['graph_val'].get(graph, {})
-			b = kf_to['graph_val'].get(graph, {})
-			for k in a.keys() | b.keys():
-				keys.append(('graph', graph[0], k))
-				values_from.append(pack(a.get(k)) + b'\xc1')
-				values_to.append(pack(b.get(k)) + b'\xc1')
-		for graph, node in kf_from['node_val'].keys() | kf_to['node_val'].keys(
-		):
-			a = kf_from['node_val'].get((graph, node), {})
-			b = kf_to['node_val'].get((graph, node), {})
-			for k in a.keys() | b.keys():
-				keys.append(('node', graph, node, k))
-				values_from.append(pack(a.get(k)) + b'\xc1')
-				values_to.append(pack(b.get(k)) + b'\xc1')
-		for graph, orig, dest, i in kf_from['edge_val'].keys(
-		) | kf_to['edge_val'].keys():
-			a = kf_from['edge_val'].get((graph, orig, dest, i), {})
-			b = kf_to['edge_val'].get((graph, orig, dest, i), {})
-			for k in a.keys() | b.keys():
-				keys.append(('edge', graph, orig, dest, k))
-				values_from.append(pack(a.get(k)) + b'\xc1')
-				values_to.append(pack(b.get(k)) + b'\xc1')
-		values_changed = np.array(values_from) != np.array(values_to)
 		delta = {}
-		for k, v, _ in filter(itemgetter(2),
-								zip(keys, values_to, values_changed)):
-			v = v[:-1]
-			if k[0] == 'node':
-				_, graph, node, key = k
-				graph, node, key = map(pack, (graph, node, key))
-				if graph not in delta:
-					delta[graph] = {NODE_VAL: {node: {key: v}}, EDGE_VAL: {}}
-				elif node not in delta[graph][NODE_VAL]:
-					delta[graph][NODE_VAL][node] = {key: v}
-				else:
-					delta[graph][NODE_VAL][node][key] = v
-			elif k[0] == 'edge':
-				_, graph, orig, dest, key = k
-				graph, orig, dest, key = map(pack, (graph, orig, dest, key))
-				if graph not in delta:
-					delta[graph] = {
-						EDGE_VAL: {
-							orig: {
-								dest: {
-									key: v
-								}
+		for k, v in columnar_kf_val_delta(kf_from['graph_val'],
+											kf_to['graph_val'], pack):
+			graph, key = map(pack, k)
+			if graph in delta:
+				delta[graph][key] = v
+			else:
+				delta[graph] = {key: v, NODE_VAL: {}, EDGE_VAL: {}}
+		for k, v in columnar_kf_val_delta(kf_from['node_val'],
+											kf_to['node_val'], pack):
+			graph, node, key = map(pack, k)
+			if graph not in delta:
+				delta[graph] = {NODE_VAL: {node: {key: v}}, EDGE_VAL: {}}
+			elif node not in delta[graph][NODE_VAL]:
+				delta[graph][NODE_VAL][node] = {key: v}
+			else:
+				delta[graph][NODE_VAL][node][key] = v
+		for (graph, orig, dest, _,
+				key), v in columnar_kf_val_delta(kf_from['edge_val'],
+												kf_to['edge_val'], pack):
+			graph, orig, dest, key = map(pack, (graph, orig, dest, key))
+			if graph not in delta:
+				delta[graph] = {
+					EDGE_VAL: {
+						orig: {
+							dest: {
+								key: v
 							}
-						},
-						NODE_VAL: {}
-					}
-				elif orig not in delta[graph][EDGE_VAL]:
-					delta[graph][EDGE_VAL][orig] = {dest: {key: v}}
-				elif dest not in delta[graph][EDGE_VAL][orig]:
-					delta[graph][EDGE_VAL][orig][dest] = {key: v}
-				else:
-					delta[graph][EDGE_VAL][orig][dest][key] = v
+						}
+					},
+					NODE_VAL: {}
+				}
+			elif orig not in delta[graph][EDGE_VAL]:
+				delta[graph][EDGE_VAL][orig] = {dest: {key: v}}
+			elif dest not in delta[graph][EDGE_VAL][orig]:
+				delta[graph][EDGE_VAL][orig][dest] = {key: v}
 			else:
-				assert k[0] == 'graph'
-				_, graph, key = k
-				graph, key = map(pack, (graph, key))
-				if graph in delta:
-					delta[graph][key] = v
-				else:
-					delta[graph] = {key: v, NODE_VAL: {}, EDGE_VAL: {}}
+				delta[graph][EDGE_VAL][orig][dest][key] = v
 		for graph in kf_from['nodes'].keys() & kf_to['nodes'].keys():
 			for node in kf_from['nodes'][graph].keys(
 			) - kf_to['nodes'][graph].keys():
@@ -722,7 +760,7 @@ class EngineHandle(object):
 				character.add_portal(orig, dest, **stats)
 
 	def commit(self):
-		self._real.commit()
+		self._real.commit().result()
 
 	def close(self):
 		self._real.close()
@@ -24,8 +24,10 @@ call its ``start`` method with the same arguments you'd give a real
 ``Engine`` for most purposes.
 
 """
+import os
 import sys
 import logging
+import importlib
 from abc import abstractmethod
 from random import Random
 from collections.abc import (Mapping, MutableMapping, MutableSequence)
@@ -35,6 +37,7 @@ from multiprocessing import Process, Pipe, Queue, ProcessError
 from concurrent.futures import ThreadPoolExecutor
 from queue import Empty
 from time import monotonic
+from types import MappingProxyType, MethodType
 from typing import Hashable, Tuple, Optional
 
 from blinker import Signal
@@ -47,7 +50,7 @@ from .allegedb.wrap import DictWrapper, ListWrapper, SetWrapper, UnwrappingDict
 from .character import Facade
 from .util import getatt, AbstractEngine, MsgpackExtensionType, AbstractCharacter
 from .handle import EngineHandle
-from .xcollections import AbstractLanguageDescriptor
+from .xcollections import AbstractLanguageDescriptor, FunctionStore
 from .node import NodeContent, UserMapping, Place, Thing
 from .portal import Portal
 
@@ -2479,6 +2482,12 @@ class EngineProxy(AbstractEngine):
 			raise TypeError("Uncallable callback")
 		return self.handle('next_turn', cb=partial(self._upd_and_cb, cb))
 
+	def profile_rules(self, enable=True):
+		self.handle('profile_rules', enable=enable)
+
+	def rules_profile(self):
+		return self.handle('rules_profile')
+
 	def time_travel(self, branch, turn, tick=None, cb=None):
 		"""Move to a different point in the timestream
 
@@ -2786,3 +2795,214 @@ class EngineProcessManager(object):
 		self.engine_proxy.close()
 		self._p.join()
 		del self.engine_proxy
+
+
+class ReadOnlySnapshotError(ProcessError):
+	"""Tried to change the world from a process that only has a snapshot"""
+
+
+class SnapshotEngineProxy(EngineProxy):
+	"""A read-only view on the world as it was at one moment
+
+	Made in worker processes, from a snapshot that the engine packed for
+	them, so that triggers can run there. There's no core to talk to,
+	so anything that would change the world raises
+	:class:`ReadOnlySnapshotError`, unless I have a ``_write_buffer``
+	list to put the commands in instead. My randomizer is seeded fresh
+	for each trigger, rather than saving its state.
+
+	"""
+
+	def __init__(self, stores: dict, snapshot: bytes, logger=None):
+		self.closed = False
+		self._write_buffer = None
+		self.logger = logger or logging.getLogger(__name__)
+		self._planning = False
+		self._rando = Random()
+		for name, store in stores.items():
+			setattr(self, name, store)
+		self.character = self.graph = CharacterMapProxy(self)
+		self.rulebook = AllRuleBooksProxy(self)
+		self.rule = AllRulesProxy(self)
+		self._character_rulebooks_cache = StructuredDefaultDict(
+			1,
+			RuleBookProxy,
+			kwargs_munger=lambda inst, k: {
+				'engine': self,
+				'bookname': (inst.key, k)
+			})
+		self._char_node_rulebooks_cache = StructuredDefaultDict(
+			1,
+			RuleBookProxy,
+			kwargs_munger=lambda inst, k: {
+				'engine': self,
+				'bookname': (inst.key, k)
+			})
+		self._char_port_rulebooks_cache = StructuredDefaultDict(
+			2,
+			RuleBookProxy,
+			kwargs_munger=lambda inst, k: {
+				'engine': self,
+				'bookname': (inst.parent.key, inst.key, k)
+			})
+		self._character_units_cache = PickyDefaultDict(dict)
+		self._unit_characters_cache = PickyDefaultDict(dict)
+		self._rule_obj_cache = {}
+		self._rulebook_obj_cache = {}
+		self._rules_cache = {}
+		self._rulebooks_cache = {}
+		snap = self.unpack(snapshot)
+		self._branch, self._turn, self._tick = snap['btt']
+		self._branches = {}
+		self._eternal_cache = snap['eternal']
+		self.eternal = MappingProxyType(self._eternal_cache)
+		self._replace_state_with_kf(snap['kf'])
+		self.universal = MappingProxyType(self._universal_cache)
+		for char, graphs in snap['units'].items():
+			for graph, nodes in graphs.items():
+				self._character_units_cache[char][graph] = set(nodes)
+				self._unit_characters_cache[graph][char] = set(nodes)
+
+	def __getattr__(self, item):
+		meth = getattr(super().__getattribute__('method'), item)
+		return MethodType(meth, self)
+
+	def handle(self, cmd=None, **kwargs):
+		if self._write_buffer is None:
+			raise ReadOnlySnapshotError(
+				f"Can't {kwargs.get('command', cmd)} from a snapshot of the world"
+			)
+		if cmd is not None:
+			kwargs['command'] = cmd
+		self._write_buffer.append(kwargs)
+
+	def entity(self, ref: tuple):
+		"""Get an entity from a reference made by the engine
+
+		That's a tuple of a kind, ``'character'``, ``'node'``, or
+		``'portal'``, followed by the names needed to find it.
+
+		"""
+		kind, charn, *names = ref
+		char = self.character[charn]
+		if kind == 'character':
+			return char
+		elif kind == 'node':
+			return char.node[names[0]]
+		elif kind == 'portal':
+			return char.portal[names[0]][names[1]]
+		raise ValueError(f"Unknown kind of entity: {kind}")
+
+	betavariate = getatt('_rando.betavariate')
+	choice = getatt('_rando.choice')
+	expovariate = getatt('_rando.expovariate')
+	gammavariate = getatt('_rando.gammavariate')
+	gauss = getatt('_rando.gauss')
+	getrandbits = getatt('_rando.getrandbits')
+	lognormvariate = getatt('_rando.lognormvariate')
+	normalvariate = getatt('_rando.normalvariate')
+	paretovariate = getatt('_rando.paretovariate')
+	randint = getatt('_rando.randint')
+	random = getatt('_rando.random')
+	randrange = getatt('_rando.randrange')
+	sample = getatt('_rando.sample')
+	shuffle = getatt('_rando.shuffle')
+	triangular = getatt('_rando.triangular')
+	uniform = getatt('_rando.uniform')
+	vonmisesvariate = getatt('_rando.vonmisesvariate')
+	weibullvariate = getatt('_rando.weibullvariate')
+
+
+_snapshot_stores = {}
+
+
+def _load_snapshot_store(spec: str):
+	if not spec.endswith('.py'):
+		return importlib.import_module(spec)
+	mtime = os.path.getmtime(spec) if os.path.exists(spec) else None
+	if spec in _snapshot_stores and _snapshot_stores[spec][0] == mtime:
+		return _snapshot_stores[spec][1]
+	modname = os.path.basename(spec)[:-3]
+	if modname in sys.modules:
+		del sys.modules[modname]
+	store = FunctionStore(spec)
+	_snapshot_stores[spec] = mtime, store
+	return store
+
+
+def check_triggers_in_snapshot(stores: dict, snapshot: bytes,
+								jobs: list) -> list:
+	"""Run triggers in a worker process, against a snapshot of the world
+
+	``stores`` maps the names of the function stores that triggers might
+	use to either the path of their source file, or the name of their
+	module. Each job is a tuple of a seed for the randomizer, a
+	reference to an entity for :meth:`SnapshotEngineProxy.entity`, and
+	the names of the triggers to try on it.
+
+	Return a list of booleans: whether any trigger fired, for each job.
+
+	"""
+	engine = SnapshotEngineProxy(
+		{
+			name: _load_snapshot_store(spec)
+			for (name, spec) in stores.items()
+		}, snapshot)
+	ret = []
+	for seed, ref, trigger_names in jobs:
+		engine._rando.seed(seed)
+		entity = engine.entity(ref)
+		for trigger_name in trigger_names:
+			if getattr(engine.trigger, trigger_name)(entity):
+				ret.append(True)
+				break
+		else:
+			ret.append(False)
+	return ret
+
+
+def run_actions_in_snapshot(stores: dict, snapshot: bytes,
+							jobs: list) -> list:
+	"""Follow rules in a worker process, against a snapshot of the world
+
+	``stores`` is as for :func:`check_triggers_in_snapshot`. Each job is
+	a tuple of a seed for the randomizer, a reference to an entity, and
+	the names of a rule's prereqs and actions. The jobs run in order,
+	each seeing what the ones before it changed.
+
+	Return a list with a triple for each job: whether its prereqs
+	passed, or ``None`` if its entity was gone; the commands that would
+	make its changes in the engine; and what its actions returned. If a
+	job raises an exception, stop, and leave it and the rest out.
+
+	"""
+	engine = SnapshotEngineProxy(
+		{
+			name: _load_snapshot_store(spec)
+			for (name, spec) in stores.items()
+		}, snapshot)
+	ret = []
+	for seed, ref, prereq_names, action_names in jobs:
+		engine._rando.seed(seed)
+		engine._write_buffer = buffer = []
+		try:
+			entity = engine.entity(ref)
+			if not entity:
+				ret.append((None, buffer, []))
+				continue
+			for prereq_name in prereq_names:
+				if not getattr(engine.prereq, prereq_name)(entity):
+					ret.append((False, buffer, []))
+					break
+			else:
+				actres = []
+				for action_name in action_names:
+					res = getattr(engine.action, action_name)(entity)
+					if res:
+						actres.append(res)
+					if not entity:
+						break
+				ret.append((True, buffer, actres))
+		except Exception:
+			break
+	return ret
@@ -905,6 +905,7 @@ class ConnectionHolder(query.ConnectionHolder):
 				pass
 			except Exception as ex:
 				return ex
+		self.init_indices()
 
 
 class QueryEngine(query.QueryEngine):
@@ -965,6 +966,20 @@ class QueryEngine(query.QueryEngine):
 								value)
 		self._increc()
 
+	def insert_many(self,
+					nodes=(),
+					node_val=(),
+					edges=(),
+					edge_val=(),
+					graph_val=()):
+		super().insert_many(nodes, node_val, edges, edge_val, graph_val)
+		before = self._records
+		self._records += len(nodes) + len(node_val) + len(edges) + len(
+			edge_val) + len(graph_val)
+		interval = self.keyframe_interval
+		if interval is not None and before // interval != self._records // interval:
+			self.snap_keyframe()
+
 	def flush(self):
 		super().flush()
 		put = self._inq.put
@@ -991,28 +1006,27 @@ class QueryEngine(query.QueryEngine):
 				'character_place_rules_handled_insert'),
 			('_char_portal_rules_handled',
 				'character_portal_rules_handled_insert'),
-			('_node_rules_handled', '_node_rules_handled_insert'),
+			('_node_rules_handled', 'node_rules_handled_insert'),
 			('_portal_rules_handled', 'portal_rules_handled_insert')
 		]:
 			if getattr(self, attr):
 				put(('silent', 'many', cmd, getattr(self, attr)))
 			setattr(self, attr, [])
-		assert self.echo('flushed') == 'flushed'
 
 	def universals_dump(self):
 		unpack = self.unpack
-		for key, branch, turn, tick, value in self.call_one('universals_dump'):
+		for key, branch, turn, tick, value in self.call_stream('universals_dump'):
 			yield unpack(key), branch, turn, tick, unpack(value)
 
 	def rulebooks_dump(self):
 		unpack = self.unpack
-		for rulebook, branch, turn, tick, rules, prio in self.call_one(
+		for rulebook, branch, turn, tick, rules, prio in self.call_stream(
 			'rulebooks_dump'):
 			yield unpack(rulebook), branch, turn, tick, (unpack(rules), prio)
 
 	def _rule_dump(self, typ):
 		unpack = self.unpack
-		for rule, branch, turn, tick, lst in self.call_one(
+		for rule, branch, turn, tick, lst in self.call_stream(
 			'rule_{}_dump'.format(typ)):
 			yield rule, branch, turn, tick, unpack(lst)
 
@@ -1029,21 +1043,21 @@ class QueryEngine(query.QueryEngine):
 
 	def node_rulebook_dump(self):
 		unpack = self.unpack
-		for character, node, branch, turn, tick, rulebook in self.call_one(
+		for character, node, branch, turn, tick, rulebook in self.call_stream(
 			'node_rulebook_dump'):
 			yield unpack(character), unpack(node), branch, turn, tick, unpack(
 				rulebook)
 
 	def portal_rulebook_dump(self):
 		unpack = self.unpack
-		for character, orig, dest, branch, turn, tick, rulebook in self.call_one(
+		for character, orig, dest, branch, turn, tick, rulebook in self.call_stream(
 			'portal_rulebook_dump'):
 			yield (unpack(character), unpack(orig), unpack(dest), branch, turn,
 					tick, unpack(rulebook))
 
 	def _charactery_rulebook_dump(self, qry):
 		unpack = self.unpack
-		for character, branch, turn, tick, rulebook in self.call_one(
+		for character, branch, turn, tick, rulebook in self.call_stream(
 			qry + '_rulebook_dump'):
 			yield unpack(character), branch, turn, tick, unpack(rulebook)
 
@@ -1059,7 +1073,7 @@ class QueryEngine(query.QueryEngine):
 
 	def character_rules_handled_dump(self):
 		unpack = self.unpack
-		for character, rulebook, rule, branch, turn, tick in self.call_one(
+		for character, rulebook, rule, branch, turn, tick in self.call_stream(
 			'character_rules_handled_dump'):
 			yield unpack(character), unpack(rulebook), rule, branch, turn, tick
 
@@ -1072,7 +1086,7 @@ class QueryEngine(query.QueryEngine):
 
 	def unit_rules_handled_dump(self):
 		unpack = self.unpack
-		for character, graph, unit, rulebook, rule, branch, turn, tick in self.call_one(
+		for character, graph, unit, rulebook, rule, branch, turn, tick in self.call_stream(
 			'unit_rules_handled_dump'):
 			yield (unpack(character), unpack(graph), unpack(unit),
 					unpack(rulebook), rule, branch, turn, tick)
@@ -1087,7 +1101,7 @@ class QueryEngine(query.QueryEngine):
 
 	def character_thing_rules_handled_dump(self):
 		unpack = self.unpack
-		for character, thing, rulebook, rule, branch, turn, tick in self.call_one(
+		for character, thing, rulebook, rule, branch, turn, tick in self.call_stream(
 			'character_thing_rules_handled_dump'):
 			yield unpack(character), unpack(thing), unpack(
 				rulebook), rule, branch, turn, tick
@@ -1102,7 +1116,7 @@ class QueryEngine(query.QueryEngine):
 
 	def character_place_rules_handled_dump(self):
 		unpack = self.unpack
-		for character, place, rulebook, rule, branch, turn, tick in self.call_one(
+		for character, place, rulebook, rule, branch, turn, tick in self.call_stream(
 			'character_place_rules_handled_dump'):
 			yield unpack(character), unpack(place), unpack(
 				rulebook), rule, branch, turn, tick
@@ -1117,7 +1131,7 @@ class QueryEngine(query.QueryEngine):
 
 	def character_portal_rules_handled_dump(self):
 		unpack = self.unpack
-		for character, rulebook, rule, orig, dest, branch, turn, tick in self.call_one(
+		for character, rulebook, rule, orig, dest, branch, turn, tick in self.call_stream(
 			'character_portal_rules_handled_dump'):
 			yield (unpack(character), unpack(rulebook), unpack(orig),
 					unpack(dest), rule, branch, turn, tick)
@@ -1131,7 +1145,7 @@ class QueryEngine(query.QueryEngine):
 					branch, turn, tick, handled_branch, handled_turn)
 
 	def node_rules_handled_dump(self):
-		for character, node, rulebook, rule, branch, turn, tick in self.call_one(
+		for character, node, rulebook, rule, branch, turn, tick in self.call_stream(
 			'node_rules_handled_dump'):
 			yield self.unpack(character), self.unpack(node), self.unpack(
 				rulebook), rule, branch, turn, tick
@@ -1146,7 +1160,7 @@ class QueryEngine(query.QueryEngine):
 
 	def portal_rules_handled_dump(self):
 		unpack = self.unpack
-		for character, orig, dest, rulebook, rule, branch, turn, tick in self.call_one(
+		for character, orig, dest, rulebook, rule, branch, turn, tick in self.call_stream(
 			'portal_rules_handled_dump'):
 			yield (unpack(character), unpack(orig), unpack(dest),
 					unpack(rulebook), rule, branch, turn, tick)
@@ -1192,15 +1206,16 @@ class QueryEngine(query.QueryEngine):
 		else:
 			if tick_to is None:
 				raise ValueError("Need both or neither of turn_to, tick_to")
-			for thing, turn, tick, location in self.call_one(
-				'load_things_tick_to_tick', pack(character), branch, turn_from,
-				turn_from, tick_from, turn_to, turn_to, tick_to):
+			for thing, turn, tick, location in self.call_window(
+				'load_things_tick_to_tick', branch, turn_to, tick_to,
+				pack(character), branch, turn_from, turn_from, tick_from,
+				turn_to, turn_to, tick_to):
 				yield character, unpack(thing), branch, turn, tick, unpack(
 					location)
 
 	def units_dump(self):
 		unpack = self.unpack
-		for character_graph, unit_graph, unit_node, branch, turn, tick, is_av in self.call_one(
+		for character_graph, unit_graph, unit_node, branch, turn, tick, is_av in self.call_stream(
 			'units_dump'):
 			yield (unpack(character_graph), unpack(unit_graph),
 					unpack(unit_node), branch, turn, tick, is_av)
@@ -1494,6 +1509,30 @@ class QueryEngine(query.QueryEngine):
 			self._portal_rules_handled = []
 
 
+	def rules_handled_delete_before(self, branch, turn):
+		"""Delete the rules journal for turns before ``turn`` in ``branch``
+
+		Including what's still waiting to be flushed.
+
+		"""
+		for attr, tab in [
+			('_char_rules_handled', 'character_rules_handled'),
+			('_unit_rules_handled', 'unit_rules_handled'),
+			('_char_thing_rules_handled', 'character_thing_rules_handled'),
+			('_char_place_rules_handled', 'character_place_rules_handled'),
+			('_char_portal_rules_handled', 'character_portal_rules_handled'),
+			('_node_rules_handled', 'node_rules_handled'),
+			('_portal_rules_handled', 'portal_rules_handled')
+		]:
+			setattr(self, attr, [
+				row for row in getattr(self, attr)
+				if row[-3] != branch or row[-2] >= turn
+			])
+			self._inq.put(
+				('silent', 'one', 'del_{}_before'.format(tab), (branch, turn),
+					{}))
+
+
 class QueryEngineProxy:
 
 	def __init__(self,
@@ -86,6 +86,7 @@ from typing import Callable
 
 from astunparse import unparse
 from blinker import Signal
+import numpy as np
 
 from .util import dedent_source, AbstractEngine
 from .xcollections import FunctionStore
@@ -249,6 +250,71 @@ class RuleFuncListDescriptor(object):
 		raise TypeError("Rules must have their function lists")
 
 
+def _column(values: list) -> np.ndarray:
+	"""Make a one-dimensional array of the values
+
+	Bools or numbers all of one type get the matching dtype. Anything
+	else is kept as Python objects, so tuples and strings come through
+	as they are.
+
+	"""
+	kinds = set(map(type, values))
+	if len(kinds) == 1 and kinds.pop() in (bool, int, float):
+		return np.array(values)
+	ret = np.empty(len(values), dtype=object)
+	for i, v in enumerate(values):
+		ret[i] = v
+	return ret
+
+
+class TriggerBatch:
+	"""Columns of stats for all the entities a batch trigger is checking
+
+	Look up a stat to get an array of its value for each entity, in the
+	same order as ``entities``, with ``None`` where an entity lacks it.
+
+	"""
+	__slots__ = ('entities', '_columns')
+
+	def __init__(self, entities: list):
+		self.entities = entities
+		self._columns = {}
+
+	def __len__(self):
+		return len(self.entities)
+
+	def __getitem__(self, stat) -> np.ndarray:
+		if stat not in self._columns:
+			self._columns[stat] = _column(
+				[entity.get(stat) for entity in self.entities])
+		return self._columns[stat]
+
+	@property
+	def names(self) -> np.ndarray:
+		"""Names of the entities; for portals, pairs of origin and
+		destination"""
+		return _column([
+			entity.name if hasattr(entity, 'name') else
+			(entity.origin.name, entity.destination.name)
+			for entity in self.entities
+		])
+
+	@property
+	def location(self) -> "TriggerBatch":
+		"""The locations of the entities, which must all be things"""
+		return TriggerBatch([entity.location for entity in self.entities])
+
+	@property
+	def origin(self) -> "TriggerBatch":
+		"""The origins of the entities, which must all be portals"""
+		return TriggerBatch([entity.origin for entity in self.entities])
+
+	@property
+	def destination(self) -> "TriggerBatch":
+		"""The destinations of the entities, which must all be portals"""
+		return TriggerBatch([entity.destination for entity in self.entities])
+
+
 class Rule(object):
 	"""Stuff that might happen in the simulation under some conditions
 
@@ -330,6 +396,44 @@ class Rule(object):
 		self.triggers.append(fun)
 		return fun
 
+	def batch_trigger(self, fun):
+		"""Decorator to append the function to my triggers list, as a batch
+
+		A batch trigger is called once for all the entities I might run on,
+		rather than once for each. It gets a :class:`TriggerBatch` of them,
+		and returns a sequence of booleans, one for each entity, saying
+		whether to run me on it.
+
+		"""
+		self.triggers.append(fun)
+		batch = self.engine._batch_triggers
+		if fun.__name__ not in batch:
+			batch.add(fun.__name__)
+			self.engine.eternal['batch_triggers'] = sorted(batch)
+		return fun
+
+	@property
+	def writes(self):
+		"""Names of the characters my actions might change
+
+		Only matters to engines with ``parallel_actions``. ``None``, the
+		default, means just the character of the entity I run on.
+
+		"""
+		return self.engine._rule_writes.get(self.name)
+
+	@writes.setter
+	def writes(self, v):
+		rule_writes = self.engine._rule_writes
+		if v is None:
+			rule_writes.pop(self.name, None)
+		else:
+			rule_writes[self.name] = tuple(v)
+		self.engine.eternal['rule_writes'] = {
+			rule: list(chars)
+			for (rule, chars) in rule_writes.items()
+		}
+
 	def prereq(self, fun):
 		"""Decorator to append the function to my prereqs list."""
 		self.prereqs.append(fun)
@@ -117,3 +117,70 @@ def test_keyframe_load_unload(tempdir):
 		eng.snap_keyframe()
 		eng.unload()
 		assert not eng._time_is_loaded('trunk')
+
+
+def test_lazy_load(tempdir):
+	"""Characters load when first looked up, or at startup if preloaded"""
+	with Engine(tempdir, keyframe_on_close=False) as eng:
+		for name in ('physical', 'other'):
+			char = eng.new_character(name)
+			char.add_place(1, color='red')
+			char.add_place(2)
+			char.add_portal(1, 2)
+		eng.next_turn()
+		eng.character['physical'].add_thing('kobold', 1)
+		eng.character['other'].add_thing('pebble', 2)
+	# first without any keyframes, then with the one snapped on close
+	for keyframed in (False, True):
+		with Engine(tempdir, lazy=True, preload=['other']) as eng:
+			assert eng._graphs_loaded == {'other'}
+			assert bool(eng._keyframes_times) is keyframed
+			assert ('physical', ) not in eng._nodes_cache.keys
+			other = eng.character['other']
+			assert other.place[1]['color'] == 'red'
+			assert other.thing['pebble'].location.name == 2
+			physical = eng.character['physical']
+			assert eng._graphs_loaded == {'other', 'physical'}
+			assert physical.place[1]['color'] == 'red'
+			assert physical.thing['kobold'].location.name == 1
+			assert 2 in physical.portal[1]
+
+			def load_graph(graph):
+				raise AssertionError(f"{graph} was already loaded")
+
+			# loaded graphs get looked up without taking the world lock
+			eng._load_graph = load_graph
+			assert eng.character['physical'] is physical
+			assert eng.graph['other'] is other
+			del eng._load_graph
+
+
+def test_lazy_keyframes(tempdir):
+	"""Keyframes don't load characters that were never looked up"""
+	with Engine(tempdir) as eng:
+		for i in range(5):
+			char = eng.new_character(f'c{i}')
+			char.add_place(0, n=i)
+			char.add_place(1)
+			char.add_portal(0, 1)
+		eng.next_turn()
+	with Engine(tempdir, lazy=True, keyframe_interval=3) as eng:
+		char = eng.character['c0']
+		for i in range(10):
+			char.place[0]['n'] = i
+		eng.next_turn()
+		char.place[1]['m'] = 1
+		assert eng._graphs_loaded == {'c0'}
+	assert eng._graphs_loaded == {'c0'}
+	with Engine(tempdir, lazy=True) as eng:
+		# the keyframe snapped on close has the untouched characters too
+		kf = eng._keyframes_times.latest(*eng._btt())
+		assert kf[0] == eng.turn
+		assert eng.query.get_keyframe('c3', eng.branch, *kf) is not None
+		assert eng.character['c3'].place[0]['n'] == 3
+		assert 1 in eng.character['c4'].portal[0]
+		assert eng.character['c0'].place[0]['n'] == 9
+	with Engine(tempdir) as eng:
+		for i in range(1, 5):
+			assert eng.character[f'c{i}'].place[0]['n'] == i
+		assert eng.character['c0'].place[1]['m'] == 1
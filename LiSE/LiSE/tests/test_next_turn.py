@@ -210,3 +210,143 @@ def test_post_time_travel_increment(engy):
 	assert engy.tick == 2
 	engy.next_turn()
 	assert engy.tick == 2
+
+
+def test_trigger_processes(tempdir):
+	"""Test that triggers checked in worker processes see the world"""
+	from LiSE import Engine
+	with Engine(tempdir, random_seed=69105, enforce_end_of_time=False,
+				trigger_processes=2) as eng:
+		char = eng.new_character('char')
+		for i in range(6):
+			char.new_place(i, hot=i % 2 == 0)
+		char.add_portal(0, 1, hot=True)
+		char.add_portal(1, 2, hot=False)
+		char.stat['hot'] = True
+		user = eng.new_character('user')
+		user.add_unit(char.place[4])
+
+		@char.place.rule
+		def warm(plac):
+			plac['warmed'] = True
+
+		@warm.trigger
+		def is_hot(ent):
+			return ent['hot']
+
+		@char.portal.rule
+		def warm_portal(portl):
+			portl['warmed'] = True
+
+		warm_portal.trigger(is_hot)
+
+		@char.rule
+		def warm_char(chara):
+			chara.stat['warmed'] = True
+
+		@warm_char.trigger
+		def stat_is_hot(chara):
+			return chara.stat['hot']
+
+		@user.unit.rule
+		def warm_unit(unit):
+			unit['unit_warmed'] = True
+
+		@warm_unit.trigger
+		def has_user(unit):
+			return 'user' in unit.user
+
+		eng.next_turn()
+		for i in range(6):
+			assert char.place[i].get('warmed', False) == (i % 2 == 0)
+		assert char.portal[0][1]['warmed']
+		assert 'warmed' not in char.portal[1][2]
+		assert char.stat['warmed']
+		assert char.place[4]['unit_warmed']
+
+
+def test_parallel_actions(tempdir):
+	"""Test that rules changing different characters run in processes"""
+	import os
+	from LiSE import Engine
+	with Engine(tempdir, random_seed=69105, enforce_end_of_time=False,
+				trigger_processes=2, parallel_actions=True) as eng:
+		for name in ('north', 'south'):
+			char = eng.new_character(name)
+			char.stat['log'] = []
+			for i in range(3):
+				char.new_place(i)
+
+		@eng.rule(always=True)
+		def note_pid(node):
+			import os
+			node['pid'] = os.getpid()
+
+		@eng.rule(always=True)
+		def log_first(chara):
+			chara.stat['log'] = list(chara.stat['log']) + ['first']
+
+		@eng.rule(always=True)
+		def log_second(chara):
+			chara.stat['log'] = list(chara.stat['log']) + ['second']
+
+		@eng.rule(always=True)
+		def touch_south(chara):
+			import os
+			chara.engine.character['south'].stat['touched'] = os.getpid()
+
+		for name in ('north', 'south'):
+			char = eng.character[name]
+			char.rule(log_first)
+			char.rule(log_second)
+			char.place.rule(note_pid)
+		eng.character['north'].rule(touch_south)
+		eng.next_turn()
+		for name in ('north', 'south'):
+			assert eng.character[name].stat['log'] == ['first', 'second']
+		# touch_south didn't say it would change the south, so it had to
+		# run again here, and so did the north's rules that came after it
+		assert eng.character['south'].stat['touched'] == os.getpid()
+		for i in range(3):
+			assert eng.character['north'].place[i]['pid'] == os.getpid()
+			assert eng.character['south'].place[i]['pid'] != os.getpid()
+		touch_south.writes = ['north', 'south']
+		assert eng.eternal['rule_writes'] == {'touch_south': ['north', 'south']}
+		eng.next_turn()
+		assert eng.character['south'].stat['touched'] != os.getpid()
+		for name in ('north', 'south'):
+			char = eng.character[name]
+			assert char.stat['log'] == ['first', 'second'] * 2
+			for i in range(3):
+				assert char.place[i]['pid'] != os.getpid()
+
+
+def test_rules_profile(engy):
+	"""Test that profiling counts the phases of each rule"""
+	char = engy.new_character('char')
+	for i in range(3):
+		char.new_place(i, hot=i == 0)
+
+	@char.place.rule
+	def warm(plac):
+		plac['warmed'] = True
+
+	@warm.trigger
+	def is_hot(plac):
+		return plac['hot']
+
+	assert engy.rules_profile() is None
+	engy.profile_rules()
+	engy.next_turn()
+	report = engy.rules_profile()
+	assert report['turn'] == engy.turn
+	warmed = report['rules']['warm']
+	assert warmed['triggers']['calls'] == 3
+	assert warmed['triggers']['reads'] > 0
+	assert warmed['prereqs']['calls'] == 1
+	assert warmed['actions']['calls'] == 1
+	assert warmed['actions']['writes'] > 0
+	assert report['rulebooks'][char.place.rulebook.name] == warmed
+	engy.profile_rules(False)
+	engy.next_turn()
+	assert engy.rules_profile() == report
@@ -108,6 +108,40 @@ def test_fast_delta(handle_initialized):
 	assert hand.unpack(diff4) == slowd4, "Fast delta differs from slow delta"
 
 
+def test_columnar_kf_val_delta():
+	from LiSE.handle import columnar_kf_val_delta, NONE
+	from msgpack import packb
+	kf_from = {
+		('g', 0): {
+			'same': 1,
+			'changed': 'a',
+			'removed': [1, 2]
+		},
+		('g', 1): {
+			'gone': 0
+		}
+	}
+	kf_to = {
+		('g', 0): {
+			'same': 1,
+			'changed': 'b',
+			'added': None
+		},
+		('g', 2): {
+			'new': 0
+		}
+	}
+	assert dict(columnar_kf_val_delta(kf_from, kf_to, packb)) == {
+		('g', 0, 'changed'): packb('b'),
+		('g', 0, 'removed'): NONE,
+		('g', 0, 'added'): NONE,
+		('g', 1, 'gone'): NONE,
+		('g', 2, 'new'): packb(0)
+	}
+	assert not dict(columnar_kf_val_delta(kf_from, kf_from, packb))
+	assert not dict(columnar_kf_val_delta({}, {}, packb))
+
+
 @pytest.mark.slow
 def test_serialize_deleted(engy):
 	eng = engy
@@ -173,3 +173,223 @@ def test_rule_priority(engy):
 	engy.next_turn()
 
 	assert engy.universal['list'] == ['first', 'second', 'second', 'first']
+
+
+def test_prune_rules_journal(tempdir):
+	"""Only the latest turns of the rules journal are kept, if you like"""
+	with Engine(tempdir, rules_journal_turns=2) as eng:
+		char = eng.new_character('physical')
+		char.add_place(0)
+
+		@char.rule(always=True)
+		def charrule(ch):
+			pass
+
+		@char.place[0].rule(always=True)
+		def placerule(place):
+			pass
+
+		for _ in range(5):
+			eng.next_turn()
+		for cache in (eng._character_rules_handled_cache,
+						eng._node_rules_handled_cache):
+			assert set(cache.handled_deep['trunk']) == {4, 5}
+			assert {k[-1] for k in cache.handled} == {4, 5}
+		eng.query.flush()
+		assert {
+			turn
+			for (*_, turn, tick) in eng.query.character_rules_handled_dump()
+		} == {4, 5}
+		assert {
+			turn
+			for (*_, turn, tick) in eng.query.node_rules_handled_dump()
+		} == {4, 5}
+		with pytest.raises(ValueError):
+			eng.prune_rules_journal(7)
+		eng.prune_rules_journal(6)
+		assert not eng._character_rules_handled_cache.handled_deep['trunk']
+
+
+def test_coalesce_writes(tempdir):
+	"""With coalesce_writes, a rule setting one stat repeatedly takes one tick"""
+	with Engine(tempdir, coalesce_writes=True) as eng:
+		char = eng.new_character('physical')
+		char.add_place(0, count=0)
+
+		@char.rule(always=True)
+		def count_up(ch):
+			for _ in range(100):
+				ch.place[0]['count'] += 1
+
+		eng.next_turn()
+		assert char.place[0]['count'] == 100
+		assert list(eng._node_val_cache.settings['trunk'][1].values()) == [
+			('physical', 0, 'count', 100)
+		]
+	with Engine(tempdir) as eng:
+		assert eng.character['physical'].place[0]['count'] == 100
+
+
+def test_unhandled_rules_only_for_subscribers(tempdir):
+	"""Only entities whose rulebooks have rules get polled for them"""
+	with Engine(tempdir) as eng:
+		char = eng.new_character('physical')
+		char.add_places_from(range(100))
+		char.add_portals_from((i, i + 1) for i in range(99))
+
+		@char.place[5].rule(always=True)
+		def placerule(place):
+			place['ran'] = True
+
+		@char.portal[5][6].rule(always=True)
+		def portalrule(portal):
+			portal['ran'] = True
+
+		btt = eng._btt()
+		assert [
+			(charn, node) for (_, charn, node, _, _) in
+			eng._node_rules_handled_cache.iter_unhandled_rules(*btt)
+		] == [('physical', 5)]
+		assert [(charn, orig, dest) for (
+			_, charn, orig, dest, _,
+			_) in eng._portal_rules_handled_cache.iter_unhandled_rules(*btt)
+				] == [('physical', 5, 6)]
+		assert not list(
+			eng._character_place_rules_handled_cache.iter_unhandled_rules(
+				*btt))
+		eng.next_turn()
+		assert char.place[5]['ran']
+		assert char.portal[5][6]['ran']
+		del char.place[5]
+		assert not list(
+			eng._node_rules_handled_cache.iter_unhandled_rules(*eng._btt()))
+
+
+def test_watch_triggers(tempdir):
+	"""With watch_triggers, triggers only rerun when what they read changes"""
+	with Engine(tempdir, watch_triggers=True) as eng:
+		char = eng.new_character('physical')
+		char.add_places_from(range(10), bare=True)
+
+		@char.place.rule
+		def grow(place):
+			place['grown'] = place.get('grown', 0) + 1
+
+		@grow.trigger
+		def grass_here(place):
+			return not place['bare']
+
+		def reads():
+			# the set of reads is replaced whenever the trigger runs again
+			return {
+				ref[2]: reads
+				for ((_, ref), (_, reads)) in eng._trigger_watch.items()
+			}
+
+		eng.next_turn()
+		first = reads()
+		assert set(first) == set(range(10))
+		eng.next_turn()
+		second = reads()
+		assert all(second[i] is first[i] for i in range(10))
+		char.place[3]['bare'] = False
+		eng.next_turn()
+		third = reads()
+		assert [i for i in range(10) if third[i] is not second[i]] == [3]
+		assert char.place[3]['grown'] == 1
+		eng.next_turn()
+		# the rule wrote to 'grown', which the trigger doesn't read
+		assert all(reads()[i] is third[i] for i in range(10))
+		assert char.place[3]['grown'] == 2
+		eng.turn = 1
+		eng.branch = 'other'
+		eng.next_turn()
+		assert not any(reads()[i] is third[i] for i in range(10))
+		assert 'grown' not in char.place[3]
+
+
+def test_batch_trigger(tempdir):
+	"""A batch trigger checks all of a rule's entities in one call"""
+	with Engine(tempdir) as eng:
+		char = eng.new_character('physical')
+		char.add_place('bare', bare=True)
+		char.add_place('grassy', bare=False)
+		for i in range(6):
+			char.add_thing(i, 'bare' if i % 2 else 'grassy', hungry=i < 4)
+
+		@char.thing.rule
+		def eat(thing):
+			thing['ate'] = True
+
+		@eat.batch_trigger
+		def grass_here(batch):
+			return ~batch.location['bare'] & batch['hungry']
+
+		@eat.trigger
+		def five(thing):
+			return thing.name == 5
+
+		eng.next_turn()
+		assert {thing.name
+				for thing in char.thing.values() if thing.get('ate')
+				} == {0, 2, 5}
+	with Engine(tempdir) as eng:
+		assert eng._batch_triggers == {'grass_here'}
+		char = eng.character['physical']
+		char.thing[4]['hungry'] = True
+		eng.profile_rules()
+		eng.next_turn()
+		assert char.thing[4]['ate']
+		# all the things got checked in one call
+		assert eng.rules_profile()['rules']['eat']['triggers']['calls'] == 1
+
+
+def test_actions_run_in_rule_order(tempdir):
+	"""Actions run in the order their rules came up, however fast the triggers"""
+	with Engine(tempdir) as eng:
+		char = eng.new_character('physical', log=())
+		char.add_places_from(range(20))
+
+		@char.place.rule
+		def log_name(place):
+			place.character.stat['log'] += (place.name, )
+
+		@log_name.trigger
+		def slow_for_some(place):
+			from time import sleep
+			sleep(0.01 * (place.name % 3))
+			return True
+
+		order = list(char.place)
+		eng.next_turn()
+		assert char.stat['log'] == tuple(order)
+
+
+def test_rule_funcs_cached(tempdir):
+	"""Rules' functions are looked up once, until the code changes"""
+	with Engine(tempdir) as eng:
+		char = eng.new_character('physical', count=0)
+
+		@char.rule
+		def count(ch):
+			ch.stat['count'] += 1
+
+		@count.trigger
+		def go(ch):
+			return True
+
+		eng.next_turn()
+		assert char.stat['count'] == 1
+		cached = dict(eng._rule_funcs_cache)
+		assert len(cached) == 1
+		eng.next_turn()
+		assert char.stat['count'] == 2
+		assert eng._rule_funcs_cache == cached
+
+		def go(ch):
+			return False
+
+		eng.trigger.go = go
+		assert not eng._rule_funcs_cache
+		eng.next_turn()
+		assert char.stat['count'] == 2
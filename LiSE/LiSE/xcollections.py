@@ -351,6 +351,9 @@ class CharacterMapping(GraphsMapping, Signal):
 		from .character import Character
 		if name not in self:
 			raise KeyError("No such character")
+		graphs_loaded = self.engine._graphs_loaded
+		if graphs_loaded is not None and name not in graphs_loaded:
+			self.engine._load_graph(name)
 		cache = self.engine._graph_objs
 		if name not in cache:
 			cache[name] = Character(self.engine,